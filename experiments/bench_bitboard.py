@@ -0,0 +1,52 @@
+"""Checks that the negamax on plain integers searches the same tree as
+the State based one, i.e., the same moves, node counts and table hits,
+on random positions and compares their times.
+
+Run from the repository root: python -m experiments.bench_bitboard
+"""
+import io
+import time
+import random
+import contextlib
+from xo import board_utils
+from xo.models import Game
+from xo.minimax import minimax, bitboard
+from xo.minimax.transposition_table import get_ttable
+
+
+def search(engine, game, depth, pvs):
+    get_ttable(game.n_rows, game.n_cols, game.n_connects).clear()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        move, stats = engine.get_best_move(game, pvs=pvs, max_depth=depth, time_limit=600)
+    took = time.perf_counter() - start
+    return (move, stats.n_nodes, stats.n_tt_hits), took
+
+
+if __name__ == '__main__':
+    rng = random.Random(123)
+    configs = [(3, 3, 3), (4, 4, 3), (4, 4, 4), (5, 5, 4)]
+    depths = {(3, 3, 3): 9, (4, 4, 3): 6, (4, 4, 4): 6, (5, 5, 4): 5}
+
+    for n_rows, n_cols, n_connects in configs:
+        n_same, n_nodes, took_minimax, took_bitboard = 0, 0, 0., 0.
+        n_positions = 10
+        for _ in range(n_positions):
+            game = Game(n_rows=n_rows, n_cols=n_cols, n_connects=n_connects)
+            for _ in range(rng.randint(0, 3)):
+                game.play(rng.choice(game.empty_indexes))
+            depth = depths[(n_rows, n_cols, n_connects)]
+            pvs = rng.random() < 0.5
+
+            expected, took = search(minimax, game, depth, pvs)
+            took_minimax += took
+            result, took = search(bitboard, game, depth, pvs)
+            took_bitboard += took
+            n_same += expected == result
+            n_nodes += result[1]
+
+        info_msg = '({}, {}, {}): {}/{} same searches, {} nodes, minimax {:.0f} nps, bitboard {:.0f} nps, {:.1f}x'
+        info_msg = info_msg.format(n_rows, n_cols, n_connects, n_same, n_positions, n_nodes,
+                                   n_nodes / took_minimax, n_nodes / took_bitboard,
+                                   took_minimax / took_bitboard)
+        print(info_msg)
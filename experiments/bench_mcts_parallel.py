@@ -0,0 +1,39 @@
+"""Compares the flat array MCTS on one core with the root-parallel one
+over the process pool: the time to the same number of rollouts and the
+rollouts in the same time, on the empty 5x5 board.
+
+The pool has XO_SEARCH_WORKERS processes, all the cores by default.
+
+Run from the repository root: python -m experiments.bench_mcts_parallel
+"""
+import io
+import time
+import contextlib
+from xo import pool
+from xo.models import Game
+from xo.mcts import parallel, tree
+
+
+N_ROLLOUTS = 20000
+TIME_LIMIT = 2
+
+
+def run(engine, game, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, stats = engine.get_best_move(game, **kwargs)
+    return stats, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    game = Game(n_rows=5, n_cols=5, n_connects=4)
+    # the processes of the pool are started before the timings
+    run(parallel, game, time_limit=0.1)
+    for name, engine in (('tree', tree), ('parallel', parallel)):
+        stats, took = run(engine, game, time_limit=None, max_rollouts=N_ROLLOUTS)
+        timed_stats, _ = run(engine, game, time_limit=TIME_LIMIT)
+        info_msg = '{} on {} workers: {} rollouts in {:.2f}s, {} rollouts in {}s'
+        info_msg = info_msg.format(name, pool.get_n_workers() if engine is parallel else 1,
+                                   stats.n_rollouts, took, timed_stats.n_rollouts, TIME_LIMIT)
+        print(info_msg)
+    pool.shutdown_pool()
@@ -0,0 +1,42 @@
+"""Plays the flat array MCTS against itself with the same rollouts per
+move, keeping the trees between the moves and starting each search from
+scratch, and compares the visits of the root at the time of the
+decision.
+
+Run from the repository root: python -m experiments.bench_mcts_reuse
+"""
+import io
+import contextlib
+from xo.models import Game
+from xo.mcts import cache, tree
+
+
+N_ROLLOUTS = 2000
+N_GAMES = 5
+
+
+def play(n_rows, n_cols, n_connects, reuse):
+    root_visits = list()
+    for game_id in range(1, N_GAMES + 1):
+        game = Game(n_rows=n_rows, n_cols=n_cols, n_connects=n_connects)
+        # never saved, but kept under an id
+        game.pk = game_id
+        while not game.is_game_over:
+            if not reuse:
+                cache.clear()
+            with contextlib.redirect_stdout(io.StringIO()):
+                move, _ = tree.get_best_move(game, time_limit=600, max_rollouts=N_ROLLOUTS)
+            kept_tree, root = cache.tree_cache[('mcts_tree', game.pk)]
+            root_visits.append(int(kept_tree.n_selected[root]))
+            game.play(move)
+    cache.clear()
+    return sum(root_visits) / len(root_visits)
+
+
+if __name__ == '__main__':
+    for n_rows, n_cols, n_connects in ((4, 4, 3), (5, 5, 4)):
+        for reuse in (False, True):
+            info_msg = '({}, {}, {}) reuse={}: {:.0f} root visits per decision for {} rollouts'
+            info_msg = info_msg.format(n_rows, n_cols, n_connects, reuse,
+                                       play(n_rows, n_cols, n_connects, reuse), N_ROLLOUTS)
+            print(info_msg)
@@ -0,0 +1,70 @@
+"""Compares the rollouts of one game at a time of the flat array MCTS with
+the batched rollouts of mcts.rollouts: rollouts per second of the kernel
+alone and of the search, and the moves of the two searches in the same
+time against each other from the empty board.
+
+Run from the repository root: python -m experiments.bench_mcts_rollouts
+"""
+import io
+import time
+import contextlib
+from xo import board_utils
+from xo.models import Game
+from xo.mcts import rollouts, tree
+
+
+N_ROWS, N_COLS, N_CONNECTS = 5, 5, 4
+TIME_LIMIT = 1
+N_GAMES = 10
+
+
+def get_kernel_rate(batch_size, n_rollouts=20000):
+    t = tree.Tree(N_ROWS, N_COLS, N_CONNECTS)
+    root = t.add_root(0, 0)
+    start = time.perf_counter()
+    for _ in range(n_rollouts // batch_size):
+        if batch_size > 1:
+            t.simulate_batch(root, batch_size)
+        else:
+            t.simulate(root)
+    return n_rollouts / (time.perf_counter() - start)
+
+
+def play(batch_sizes):
+    """Wins of the first and of the second of batch_sizes with the first
+    playing X in half of the games, and draws.
+    """
+    counts = [0, 0, 0]
+    for game_id in range(N_GAMES):
+        swap = game_id % 2
+        game = Game(n_rows=N_ROWS, n_cols=N_COLS, n_connects=N_CONNECTS)
+        while not game.is_game_over:
+            is_x = game.next_player == board_utils.MARKER_X
+            batch_size = batch_sizes[is_x == bool(swap)]
+            with contextlib.redirect_stdout(io.StringIO()):
+                move, _ = tree.get_best_move(game, time_limit=TIME_LIMIT,
+                                             batch_size=batch_size)
+            game.play(move)
+        if game.is_game_over == ' ':
+            counts[2] += 1
+        else:
+            first_is_x = not swap
+            counts[(game.is_game_over == board_utils.MARKER_X) != first_is_x] += 1
+    return counts
+
+
+if __name__ == '__main__':
+    game = Game(n_rows=N_ROWS, n_cols=N_COLS, n_connects=N_CONNECTS)
+    for batch_size in (1, rollouts.ROLLOUT_BATCH_SIZE):
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, stats = tree.get_best_move(game, time_limit=TIME_LIMIT, batch_size=batch_size)
+        info_msg = 'batch_size={}: kernel {:.0f} rollouts/s, search {} rollouts in {} iterations in {}s'
+        info_msg = info_msg.format(batch_size, get_kernel_rate(batch_size), stats.n_rollouts,
+                                   stats.n_iterations, TIME_LIMIT)
+        print(info_msg)
+
+    n_batched_wins, n_single_wins, n_draws = play((rollouts.ROLLOUT_BATCH_SIZE, 1))
+    info_msg = 'batch_size={} against 1 at {}s per move: {} wins, {} losses, {} draws'
+    info_msg = info_msg.format(rollouts.ROLLOUT_BATCH_SIZE, TIME_LIMIT,
+                               n_batched_wins, n_single_wins, n_draws)
+    print(info_msg)
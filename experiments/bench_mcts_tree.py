@@ -0,0 +1,63 @@
+"""Compares the MCTS on Node objects with the one on the flat array tree
+of mcts.tree: rollouts in the same time, the time spent in the garbage
+collector and the peak memory of the search per rollout, the node
+counts of the two are not counted the same way.
+
+Run from the repository root: python -m experiments.bench_mcts_tree
+"""
+import gc
+import io
+import time
+import contextlib
+import tracemalloc
+from xo.models import Game
+from xo.mcts import algorithm, tree
+
+
+TIME_LIMIT = 5
+
+
+class GCTimer:
+    def __init__(self):
+        self.took = 0.
+        self.n_collections = 0
+        self.start = None
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self.start = time.perf_counter()
+        else:
+            self.took += time.perf_counter() - self.start
+            self.n_collections += 1
+
+
+def run(engine, game):
+    gc.collect()
+    timer = GCTimer()
+    gc.callbacks.append(timer)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, stats = engine.get_best_move(game, time_limit=TIME_LIMIT)
+    finally:
+        gc.callbacks.remove(timer)
+
+    # again under tracemalloc, which slows the search, for the peak
+    gc.collect()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, traced_stats = engine.get_best_move(game, time_limit=TIME_LIMIT)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return stats, timer, peak, peak / traced_stats.n_rollouts
+
+
+if __name__ == '__main__':
+    for n_rows, n_cols, n_connects in ((4, 4, 3), (5, 5, 4)):
+        game = Game(n_rows=n_rows, n_cols=n_cols, n_connects=n_connects)
+        for name, engine in (('node', algorithm), ('tree', tree)):
+            stats, timer, peak, peak_per_rollout = run(engine, game)
+            info_msg = '({}, {}, {}) {}: {} rollouts, gc {:.3f}s in {} collections, peak {:.1f}MB, {:.0f} bytes per rollout'
+            info_msg = info_msg.format(n_rows, n_cols, n_connects, name, stats.n_rollouts,
+                                       timer.took, timer.n_collections,
+                                       peak / (1 << 20), peak_per_rollout)
+            print(info_msg)
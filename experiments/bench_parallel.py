@@ -0,0 +1,51 @@
+"""Times the serial and the root-split parallel minimax to the same depth
+on 5x5 boards, with the transposition tables cleared before each search.
+The number of workers is the XO_SEARCH_WORKERS setting.
+
+Run from the repository root: python -m experiments.bench_parallel
+"""
+import time
+from xo import pool
+from xo.models import Game
+from xo.minimax import minimax, parallel
+from xo.minimax.transposition_table import get_ttable
+
+
+def time_search(get_best_move, game, depth):
+    get_ttable(game.n_rows, game.n_cols, game.n_connects).clear()
+    start = time.monotonic()
+    move, _ = get_best_move(game, max_depth=depth, time_limit=600)
+    return move, time.monotonic() - start
+
+
+if __name__ == '__main__':
+    configs = [
+        # (n_rows, n_cols, n_connects, crosses, circles, depth)
+        (5, 5, 4, [12], [], 6),
+        (5, 5, 4, [12], [6], 6),
+        (5, 5, 4, [12, 7], [6, 18], 6),
+    ]
+
+    # start the pool outside of the timings
+    pool.get_pool()
+
+    results = list()
+    for n_rows, n_cols, n_connects, crosses, circles, depth in configs:
+        game = Game(n_rows=n_rows, n_cols=n_cols, n_connects=n_connects)
+        for index in crosses:
+            game.add_cross(index)
+        for index in circles:
+            game.add_circle(index)
+
+        serial = time_search(minimax.get_best_move, game, depth)
+        parallel_ = time_search(parallel.get_best_move, game, depth)
+        results.append((game, depth, serial, parallel_))
+
+    info_msg = '{} workers'.format(pool.get_n_workers())
+    print(info_msg)
+    for game, depth, serial, parallel_ in results:
+        info_msg = '{} at depth {}: serial move {} took {:.3f}s, parallel move {} took {:.3f}s'
+        info_msg = info_msg.format(game, depth, serial[0], serial[1], parallel_[0], parallel_[1])
+        print(info_msg)
+
+    pool.shutdown_pool()
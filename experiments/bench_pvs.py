@@ -0,0 +1,61 @@
+"""Compares the nodes searched by plain alpha-beta and by principal
+variation search with aspiration windows at fixed depths. The
+transposition table is cleared before each search so that neither of
+them gets the other's work.
+
+Run from the repository root: python -m experiments.bench_pvs
+"""
+import time
+from collections import namedtuple
+from xo import board_utils
+from xo.minimax import minimax, zobrist
+from xo.minimax.transposition_table import State, get_ttable
+
+
+Game = namedtuple('Game', ['n_rows', 'n_cols', 'n_connects', 'n_cells', 
+                           'board_x', 'board_o'])
+
+
+def search(game, depth, pvs):
+    ttable = get_ttable(game.n_rows, game.n_cols, game.n_connects)
+    ttable.clear()
+    # no snapshot either
+    ttable.snapshot = None
+
+    keys = zobrist.compute_keys(game.board_x, game.board_o,
+                                game.n_rows, game.n_cols, game.n_connects)
+    state = State(game.n_rows, game.n_cols, game.n_connects,
+                  game.board_x, game.board_o, keys)
+    marker = board_utils.get_next_player(game.board_x, game.board_o, game.n_cells)
+    color = 1 if marker == board_utils.MARKER_X else -1
+    context = minimax.SearchContext(ttable, game.n_cells, pvs)
+
+    start = time.time()
+    utility = None
+    for d in range(1, depth + 1):
+        utility, best_move, _ = minimax.get_root_negamax(
+            state, marker, d, color, context, utility)
+    took = time.time() - start
+    return utility, best_move, context.stats.n_nodes, took
+
+
+if __name__ == '__main__':
+    configs = [
+        # (n_rows, n_cols, n_connects, board_x, board_o, depth)
+        (3, 3, 3, 0, 0, 9),
+        (4, 4, 3, 0, 0, 6),
+        (4, 4, 4, 0b0000001000000000, 0b0000000000100000, 6),
+        (5, 5, 4, 0, 0, 4),
+    ]
+
+    for n_rows, n_cols, n_connects, board_x, board_o, depth in configs:
+        n_cells = n_rows * n_cols
+        game = Game(n_rows, n_cols, n_connects, n_cells, board_x, board_o)
+        info_msg = '({}, {}, {}) at depth {}'.format(n_rows, n_cols, n_connects, depth)
+        print(info_msg)
+        for pvs in (False, True):
+            utility, best_move, n_nodes, took = search(game, depth, pvs)
+            info_msg = '  {:<10} value {:>4} move {:>2} nodes {:>8} took {:.3f}s'
+            info_msg = info_msg.format('pvs' if pvs else 'alpha-beta', 
+                                       utility, best_move, n_nodes, took)
+            print(info_msg)
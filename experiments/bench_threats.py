@@ -0,0 +1,81 @@
+"""Plays out random 5x5 positions with a forced win by continuous fours
+for the player to move, the attacker searching to a fixed depth with
+and without the threat-space search against the same plain defender, and
+counts the wins that the attacker converts and the nodes it takes.
+
+Run from the repository root: python -m experiments.bench_threats
+"""
+import io
+import time
+import random
+import contextlib
+from xo import board_utils, win_state_utils
+from xo.models import Game
+from xo.minimax import bitboard, threats
+from xo.minimax.transposition_table import get_ttable
+
+
+N_ROWS, N_COLS, N_CONNECTS = 5, 5, 4
+ATTACKER_DEPTH = 3
+DEFENDER_DEPTH = 3
+
+
+def get_vcf_positions(rng, n_positions):
+    wins = win_state_utils.get_board_wins(N_ROWS, N_COLS, N_CONNECTS)
+    n_cells = N_ROWS * N_COLS
+    full = (1 << n_cells) - 1
+    positions = list()
+    while len(positions) < n_positions:
+        game = Game(n_rows=N_ROWS, n_cols=N_COLS, n_connects=N_CONNECTS)
+        for _ in range(2 * rng.randint(3, 5)):
+            game.play(rng.choice(game.empty_indexes))
+        if game.is_game_over:
+            continue
+        fours, _ = threats.get_threat_cells(game.board_x, game.board_o, wins)
+        other_fours, _ = threats.get_threat_cells(game.board_o, game.board_x, wins)
+        if fours or other_fours:
+            continue
+        # longer than the attacker's horizon
+        if threats.find_vcf(game.board_x, game.board_o, wins, full, 1) is not None:
+            continue
+        if threats.find_vcf(game.board_x, game.board_o, wins, full, n_cells) is None:
+            continue
+        positions.append((game.board_x, game.board_o))
+    return positions
+
+
+def play_out(board_x, board_o, threat_search):
+    game = Game(n_rows=N_ROWS, n_cols=N_COLS, n_connects=N_CONNECTS,
+                board_x=board_x, board_o=board_o)
+    get_ttable(N_ROWS, N_COLS, N_CONNECTS).clear()
+    n_nodes, took = 0, 0.
+    while not game.is_game_over:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if game.next_player == board_utils.MARKER_X:
+                start = time.perf_counter()
+                move, stats = bitboard.get_best_move(game, max_depth=ATTACKER_DEPTH,
+                                                     time_limit=600,
+                                                     threat_search=threat_search)
+                took += time.perf_counter() - start
+                n_nodes += stats.n_nodes + stats.n_threat_nodes
+            else:
+                move, _ = bitboard.get_best_move(game, max_depth=DEFENDER_DEPTH,
+                                                 time_limit=600)
+        game.play(move)
+    return game.is_game_over, n_nodes, took
+
+
+if __name__ == '__main__':
+    rng = random.Random(123)
+    positions = get_vcf_positions(rng, 20)
+    for threat_search in (False, True):
+        n_wins, n_nodes, took = 0, 0, 0.
+        for board_x, board_o in positions:
+            result, nodes, seconds = play_out(board_x, board_o, threat_search)
+            n_wins += result == board_utils.MARKER_X
+            n_nodes += nodes
+            took += seconds
+
+        info_msg = 'threat_search={}: {}/{} forced wins converted, {} attacker nodes in {:.2f}s'
+        info_msg = info_msg.format(threat_search, n_wins, len(positions), n_nodes, took)
+        print(info_msg)
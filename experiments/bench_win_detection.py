@@ -0,0 +1,69 @@
+"""Checks that the shift-and win detection in board_utils.is_game_over
+gives the same results as the win mask loop on all reachable positions
+and times both of them.
+
+Run from the repository root: python -m experiments.bench_win_detection
+"""
+import time
+from xo import board_utils
+
+
+def get_reachable_positions(n_rows, n_cols, n_connects):
+    """All positions that can come up in a game, i.e., the game stops at
+    the first win. Positions are packed as board_x | board_o << n_cells
+    to keep the memory down on 4x4 boards.
+    """
+    n_cells = n_rows * n_cols
+    cell_mask = (1 << n_cells) - 1
+    to_visit = [0]
+    visited = {0}
+    while to_visit:
+        packed = to_visit.pop()
+        board_x, board_o = packed & cell_mask, packed >> n_cells
+        if board_utils.is_game_over_by_masks(
+                board_x, board_o, n_rows, n_cols, n_connects) is not None:
+            continue
+        is_x = bin(board_x).count('1') == bin(board_o).count('1')
+        for index in range(n_cells):
+            flag = 1 << index
+            if (board_x | board_o) & flag:
+                continue
+            child = packed | (flag if is_x else flag << n_cells)
+            if child not in visited:
+                visited.add(child)
+                to_visit.append(child)
+    return [(p & cell_mask, p >> n_cells) for p in visited]
+
+
+def time_func(func, positions, n_rows, n_cols, n_connects):
+    start = time.time()
+    results = [func(x, o, n_rows, n_cols, n_connects) for x, o in positions]
+    took = time.time() - start
+    return results, took
+
+
+if __name__ == '__main__':
+    configs = [
+        (3, 3, 3),
+        (4, 4, 3),
+        (4, 4, 4),
+    ]
+
+    for n_rows, n_cols, n_connects in configs:
+        positions = get_reachable_positions(n_rows, n_cols, n_connects)
+        info_msg = '({}, {}, {}): {} reachable positions'
+        info_msg = info_msg.format(n_rows, n_cols, n_connects, len(positions))
+        print(info_msg)
+
+        expected, took_masks = time_func(board_utils.is_game_over_by_masks,
+                                         positions, n_rows, n_cols, n_connects)
+        results, took_shifts = time_func(board_utils.is_game_over,
+                                         positions, n_rows, n_cols, n_connects)
+
+        n_diff = sum(1 for e, r in zip(expected, results) if e != r)
+        assert_msg = '{} positions with different results'.format(n_diff)
+        assert n_diff == 0, assert_msg
+
+        info_msg = 'win masks: {:.3f}s, shift-and: {:.3f}s, speedup: {:.2f}x'
+        info_msg = info_msg.format(took_masks, took_shifts, took_masks / took_shifts)
+        print(info_msg)
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class XoConfig(AppConfig):
     name = 'xo'
+
+    def ready(self):
+        # map the transposition table snapshots once per worker
+        from .minimax import snapshot
+        snapshot.load_snapshots()
+        # and the tablebases
+        from . import tablebase
+        tablebase.load_tablebases()
@@ -1,5 +1,5 @@
 import numpy as np
-from xo import win_state_utils
+from xo import win_state_utils, symmetry
 from collections import namedtuple
 
 
@@ -112,8 +112,51 @@ def is_filled(board_x, board_o, full_state):
     return filled
 
 
+def has_connects(board, n_rows, n_cols, n_connects):
+    """Checks for n_connects in a row with a fixed number of shift-and
+    steps per direction. Runs can only start at the cells in the start 
+    mask of the direction so that shifts never wrap around to the next 
+    row.
+    """
+    directions = win_state_utils.get_win_directions(n_rows, n_cols, n_connects)
+    for start_mask, shifts in directions:
+        run = board
+        for shift in shifts:
+            run &= run >> shift
+        if run & start_mask:
+            return True
+    return False
+
+
 def is_game_over(board_x, board_o, n_rows, n_cols, n_connects):
-    # check for drawn first
+    # check both boards in one pass of shift-and steps
+    offset, directions = win_state_utils.get_win_directions_xo(
+        n_rows, n_cols, n_connects)
+    board = board_x | board_o << offset
+    wins = 0
+    for start_mask, shifts in directions:
+        run = board
+        for shift in shifts:
+            run &= run >> shift
+        wins |= run & start_mask
+
+    n_cells = n_rows * n_cols
+    full_state = (1 << n_cells) - 1
+    # None for ongoing
+    result = None
+    if wins & full_state:
+        result = 'X'
+    elif wins:
+        result = 'O'
+    elif is_filled(board_x, board_o, full_state):
+        result = ' '
+    return result
+
+
+def is_game_over_by_masks(board_x, board_o, n_rows, n_cols, n_connects):
+    """Reference implementation of is_game_over which checks every win
+    mask of the board.
+    """
     board_win = win_state_utils.get_board_wins(n_rows, n_cols, n_connects)
     # None for ongoing
     result = None
@@ -134,6 +177,32 @@ def is_game_over(board_x, board_o, n_rows, n_cols, n_connects):
     return result
 
 
+def is_game_over_at(board_x, board_o, index, n_rows, n_cols, n_connects):
+    """Same as is_game_over but assumes that the game was ongoing before
+    the move at index so only the wins through that cell are checked.
+    """
+    flag = 1 << index
+    if board_x & flag:
+        board, marker = board_x, MARKER_X
+    elif board_o & flag:
+        board, marker = board_o, MARKER_O
+    else:
+        err_msg = 'Cell is empty at index {}'
+        err_msg = err_msg.format(index)
+        raise ValueError(err_msg)
+
+    cell_wins = win_state_utils.get_cell_wins(n_rows, n_cols, n_connects)
+    for win in cell_wins[index]:
+        if (board & win) == win:
+            return marker
+
+    n_cells = n_rows * n_cols
+    full_state = (1 << n_cells) - 1
+    if is_filled(board_x, board_o, full_state):
+        return ' '
+    return None
+
+
 def is_empty(board_x, board_o, index):
     flag = 1 << index
     has_x = board_x & flag
@@ -142,38 +211,8 @@ def is_empty(board_x, board_o, index):
 
 
 def reflect_y(board, n_rows, n_cols):
-    n_cells = n_rows * n_cols
-    reflected = 0
-
-    for ind in range(n_cells):
-        row_ind = ind // n_cols
-        col_ind = ind % n_cols
-        col_ind_r = n_cols - (col_ind + 1)
-        ind_r = row_ind * n_cols + col_ind_r
-
-        flag = 1 << ind
-        flag_r = 1 << ind_r
-        if (board & flag) == flag:
-            reflected |= flag_r
-
-    return reflected
+    return symmetry.apply_transform(board, symmetry.REFLECT_Y, n_rows, n_cols)
 
 
 def reflect_x(board, n_rows, n_cols):
-    n_cells = n_rows * n_cols
-    reflected = 0
-
-    for ind in range(n_cells):
-        row_ind = ind // n_cols
-        col_ind = ind % n_cols
-
-        # same column but different row
-        row_ind_r = n_rows - (row_ind + 1)
-        ind_r = row_ind_r * n_cols + col_ind
-
-        flag = 1 << ind
-        flag_r = 1 << ind_r
-        if (board & flag) == flag:
-            reflected |= flag_r
-
-    return reflected
+    return symmetry.apply_transform(board, symmetry.REFLECT_X, n_rows, n_cols)
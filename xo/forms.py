@@ -22,7 +22,15 @@ PLAYER_TYPES = [
     ('human', 'Human'),
     ('xo.players.RandomPlayer', 'Random player'),
     ('xo.players.MinimaxPlayer', 'Minimax player'),
+    ('xo.players.PVSMinimaxPlayer', 'Minimax player (PVS)'),
+    ('xo.players.ParallelMinimaxPlayer', 'Minimax player (parallel)'),
+    ('xo.players.BitboardMinimaxPlayer', 'Minimax player (bitboard)'),
+    ('xo.players.OpenLinesMinimaxPlayer', 'Minimax player (open lines)'),
+    ('xo.players.ThreatSpaceMinimaxPlayer', 'Minimax player (threat space)'),
     ('xo.players.MCTSPlayer', 'MCTS player'),
+    ('xo.players.CompactMCTSPlayer', 'MCTS player (compact tree)'),
+    ('xo.players.ParallelMCTSPlayer', 'MCTS player (parallel)'),
+    ('xo.players.BatchedMCTSPlayer', 'MCTS player (batched rollouts)'),
 
 ]
 
@@ -0,0 +1,175 @@
+"""Dense indexes of positions, i.e., perfect hashes of (board_x, board_o)
+pairs onto 0..size - 1 and back, so that per position data can live in
+flat numpy arrays.
+
+Base3Indexer reads the board as a base-3 number with a digit per cell,
+0 for empty, 1 for X and 2 for O. It covers every assignment of markers
+to cells and is the simplest, but 3^n_cells gets large fast, e.g., 43M
+for 4x4 and 847G for 5x5.
+
+CombinatorialIndexer only covers the boards where X has as many or one
+more marker than O, as in a game where X starts. The boards are grouped
+by their number of markers k, and within a group a board is ranked by
+the combination of its k marked cells and then by the combination of
+the O cells among them, e.g., 10M for 4x4 and 162G for 5x5.
+
+Both work on numpy arrays of boards and of indexes, the loops are over
+the cells rather than over the boards.
+"""
+import numpy as np
+
+
+INDEX_DTYPE = np.int64
+
+
+def compute_binomials(n):
+    """Table of C(i, j) for 0 <= i, j <= n, zero where j > i.
+    """
+    binomials = np.zeros((n + 1, n + 2), dtype=INDEX_DTYPE)
+    for i in range(n + 1):
+        binomials[i, 0] = 1
+        for j in range(1, i + 1):
+            binomials[i, j] = binomials[i - 1, j - 1] + binomials[i - 1, j]
+    return binomials
+
+
+def get_piece_counts(n_marked):
+    """Number of X and O markers on a board with n_marked markers.
+    """
+    n_o = n_marked // 2
+    return n_marked - n_o, n_o
+
+
+class Base3Indexer:
+    def __init__(self, n_cells):
+        self.n_cells = n_cells
+        self.size = 3 ** n_cells
+        self.powers = 3 ** np.arange(n_cells, dtype=INDEX_DTYPE)
+
+    def __repr__(self):
+        return '{}({} cells, {} indexes)'.format(Base3Indexer.__name__, self.n_cells, self.size)
+
+    def rank(self, board_x, board_o):
+        board_x = np.asarray(board_x, dtype=INDEX_DTYPE)
+        board_o = np.asarray(board_o, dtype=INDEX_DTYPE)
+        index = np.zeros(np.broadcast(board_x, board_o).shape, dtype=INDEX_DTYPE)
+        for i in range(self.n_cells):
+            digit = (board_x >> i & 1) + 2 * (board_o >> i & 1)
+            index += digit * self.powers[i]
+        return index
+
+    def unrank(self, index):
+        index = np.array(index, dtype=INDEX_DTYPE)
+        board_x = np.zeros_like(index)
+        board_o = np.zeros_like(index)
+        for i in range(self.n_cells):
+            index, digit = np.divmod(index, 3)
+            board_x |= (digit == 1).astype(INDEX_DTYPE) << i
+            board_o |= (digit == 2).astype(INDEX_DTYPE) << i
+        return board_x, board_o
+
+
+class CombinatorialIndexer:
+    def __init__(self, n_cells):
+        self.n_cells = n_cells
+        self.binomials = compute_binomials(n_cells)
+
+        # first index of the boards with k markers
+        sizes = list()
+        for n_marked in range(n_cells + 1):
+            _, n_o = get_piece_counts(n_marked)
+            n_boards = self.binomials[n_cells, n_marked] * self.binomials[n_marked, n_o]
+            sizes.append(n_boards)
+        self.group_sizes = np.array(sizes, dtype=INDEX_DTYPE)
+        self.offsets = np.concatenate([[0], np.cumsum(self.group_sizes)]).astype(INDEX_DTYPE)
+        self.size = int(self.offsets[-1])
+
+    def __repr__(self):
+        return '{}({} cells, {} indexes)'.format(CombinatorialIndexer.__name__, self.n_cells, self.size)
+
+    def rank(self, board_x, board_o):
+        board_x = np.asarray(board_x, dtype=INDEX_DTYPE)
+        board_o = np.asarray(board_o, dtype=INDEX_DTYPE)
+        shape = np.broadcast(board_x, board_o).shape
+        board = board_x | board_o
+
+        # colex ranks of the marked cells among all the cells and of the
+        # O cells among the marked cells
+        rank_marked = np.zeros(shape, dtype=INDEX_DTYPE)
+        rank_o = np.zeros(shape, dtype=INDEX_DTYPE)
+        n_marked = np.zeros(shape, dtype=INDEX_DTYPE)
+        n_o = np.zeros(shape, dtype=INDEX_DTYPE)
+        for i in range(self.n_cells):
+            is_marked = board >> i & 1
+            is_o = board_o >> i & 1
+            rank_marked += is_marked * self.binomials[i, n_marked + 1]
+            rank_o += is_o * self.binomials[n_marked, n_o + 1]
+            n_marked += is_marked
+            n_o += is_o
+
+        n_x = n_marked - n_o
+        if np.any((board_x & board_o) != 0) or np.any((n_x != n_o) & (n_x != n_o + 1)):
+            err_msg = 'Only boards with as many or one more X than O can be ranked'
+            raise ValueError(err_msg)
+
+        return (self.offsets[n_marked]
+                + rank_marked * self.binomials[n_marked, n_o]
+                + rank_o)
+
+    def unrank(self, index):
+        index = np.array(index, dtype=INDEX_DTYPE)
+        if np.any((index < 0) | (index >= self.size)):
+            err_msg = 'Indexes have to be in [0, {})'.format(self.size)
+            raise ValueError(err_msg)
+
+        n_marked = np.searchsorted(self.offsets, index, side='right') - 1
+        n_o = n_marked // 2
+        index = index - self.offsets[n_marked]
+        rank_marked, rank_o = np.divmod(index, self.binomials[n_marked, n_o])
+
+        # greedy colex unranking from the last cell down, j is the
+        # number of marked cells still to place
+        board = np.zeros_like(index)
+        board_o = np.zeros_like(index)
+        j = n_marked.astype(INDEX_DTYPE)
+        for i in range(self.n_cells - 1, -1, -1):
+            is_marked = (j > 0) & (rank_marked >= self.binomials[i, j])
+            rank_marked -= np.where(is_marked, self.binomials[i, j], 0)
+            board |= is_marked.astype(INDEX_DTYPE) << i
+            j -= is_marked
+
+        # the marked cells in order from the last one, m is the number
+        # of O still to place
+        m = n_o.astype(INDEX_DTYPE)
+        j = n_marked.astype(INDEX_DTYPE)
+        for i in range(self.n_cells - 1, -1, -1):
+            is_marked = (board >> i & 1).astype(bool)
+            # position of the cell among the marked cells
+            pos = j - 1
+            is_o = is_marked & (m > 0) & (rank_o >= self.binomials[np.maximum(pos, 0), m])
+            rank_o -= np.where(is_o, self.binomials[np.maximum(pos, 0), m], 0)
+            board_o |= is_o.astype(INDEX_DTYPE) << i
+            m -= is_o
+            j -= is_marked
+
+        return np.asarray(board & ~board_o), board_o
+
+
+# process-wide indexers keyed by (n_rows, n_cols)
+indexer_registry = dict()
+
+# boards with up to this many cells get a base-3 indexer
+MAX_BASE3_CELLS = 12
+
+
+def get_indexer(n_rows, n_cols):
+    key = (n_rows, n_cols)
+    indexer = indexer_registry.get(key, None)
+    if indexer is None:
+        n_cells = n_rows * n_cols
+        if n_cells <= MAX_BASE3_CELLS:
+            indexer = Base3Indexer(n_cells)
+        else:
+            indexer = CombinatorialIndexer(n_cells)
+        indexer = indexer_registry.setdefault(key, indexer)
+    return indexer
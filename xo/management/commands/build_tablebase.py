@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from xo import tablebase
+
+
+class Command(BaseCommand):
+    help = 'Solves all the positions of a board configuration and writes them as a tablebase'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=3)
+        parser.add_argument('--cols', type=int, default=3)
+        parser.add_argument('--connects', type=int, default=3)
+        parser.add_argument('--output', default=None,
+                            help='Tablebase path, defaults to the XO_TABLEBASE_DIR setting')
+
+    def handle(self, *args, **options):
+        n_rows = options['rows']
+        n_cols = options['cols']
+        n_connects = options['connects']
+        if n_rows * n_cols > 32:
+            raise CommandError('Tablebases are limited to boards of up to 32 cells')
+
+        path = options['output']
+        if path is None:
+            tablebase_dir = tablebase.get_tablebase_dir()
+            if tablebase_dir is None:
+                raise CommandError('No --output and no XO_TABLEBASE_DIR setting')
+            os.makedirs(tablebase_dir, exist_ok=True)
+            fname = tablebase.get_tablebase_fname(n_rows, n_cols, n_connects)
+            path = os.path.join(tablebase_dir, fname)
+
+        start = time.time()
+        keys, values, distances = tablebase.solve(n_rows, n_cols, n_connects)
+        tablebase.dump_tablebase(path, n_rows, n_cols, n_connects, keys, values, distances)
+        took = time.time() - start
+
+        # the empty board has key 0, the first of the sorted keys
+        value, distance = values[0], distances[0]
+        msg = 'Solved {} positions of ({}, {}, {}) in {:.1f}s, the first player gets {} in {} moves'
+        msg = msg.format(len(keys), n_rows, n_cols, n_connects, took, 
+                         {1: 'a win', 0: 'a draw', -1: 'a loss'}[int(value)], distance)
+        self.stdout.write(msg)
+        msg = 'Wrote {}'.format(path)
+        self.stdout.write(self.style.SUCCESS(msg))
@@ -0,0 +1,66 @@
+import os
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from xo.models import Game
+from xo.players import get_player
+from xo.minimax import snapshot
+from xo.minimax.transposition_table import get_ttable
+
+
+class Command(BaseCommand):
+    help = 'Plays a batch of AI games and dumps the transposition table as a snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=3)
+        parser.add_argument('--cols', type=int, default=3)
+        parser.add_argument('--connects', type=int, default=3)
+        parser.add_argument('--games', type=int, default=10,
+                            help='Number of games to play before dumping')
+        parser.add_argument('--random-moves', type=int, default=1,
+                            help='Number of random opening moves per game')
+        parser.add_argument('--player', default='xo.players.MinimaxPlayer')
+        parser.add_argument('--output', default=None,
+                            help='Snapshot path, defaults to the XO_TTABLE_SNAPSHOT_DIR setting')
+
+    def handle(self, *args, **options):
+        n_rows = options['rows']
+        n_cols = options['cols']
+        n_connects = options['connects']
+
+        path = options['output']
+        if path is None:
+            snapshot_dir = snapshot.get_snapshot_dir()
+            if snapshot_dir is None:
+                raise CommandError('No --output and no XO_TTABLE_SNAPSHOT_DIR setting')
+            os.makedirs(snapshot_dir, exist_ok=True)
+            fname = snapshot.get_snapshot_fname(n_rows, n_cols, n_connects)
+            path = os.path.join(snapshot_dir, fname)
+
+        # start from the existing snapshot so that knowledge adds up
+        # across batches
+        snapshot.load_snapshots(os.path.dirname(os.path.abspath(path)))
+        player = get_player(options['player'])
+
+        for i in range(options['games']):
+            # the games are not saved
+            game = Game(n_rows=n_rows, n_cols=n_cols, n_connects=n_connects)
+            result = None
+            n_moves = 0
+            while result is None:
+                if n_moves < options['random_moves']:
+                    index = random.choice(game.empty_indexes)
+                else:
+                    index = player.play(game)
+                result = game.play(index)
+                n_moves += 1
+
+            msg = 'Game {}: "{}" ended with "{}"'
+            msg = msg.format(i + 1, game.board_str, result)
+            self.stdout.write(msg)
+
+        ttable = get_ttable(n_rows, n_cols, n_connects)
+        n_entries = snapshot.dump_snapshot(ttable, path, n_rows, n_cols, n_connects)
+        msg = 'Dumped {} entries of {} to {}'.format(n_entries, ttable, path)
+        self.stdout.write(self.style.SUCCESS(msg))
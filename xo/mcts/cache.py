@@ -0,0 +1,107 @@
+"""Search trees kept from one move of a game to the next.
+
+After a move the tree of the search is kept for the game, with the
+trees of the least recently used games dropped once all of them take
+more than XO_MCTS_TREE_CACHE_MB megabytes. The next
+search of the game looks for the new position up to two plies below the
+old root, i.e., after its own move and the opponent's reply, and starts
+from that subtree with all its visits rather than from a new root.
+
+Children are one per class of symmetric moves, so the reply may be in
+the tree as a symmetric position rather than as the same one. Positions
+are matched by their canonical form and the move of the search is mapped
+back through the transforms.
+"""
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .. import symmetry
+
+
+# megabytes of kept trees, per process
+TREE_CACHE_MB = 64
+# plies from the old root to the position of the next search
+REUSE_PLIES = 2
+
+
+# trees and their sizes in bytes by key, least recently used first
+tree_cache = OrderedDict()
+tree_cache_nbytes = dict()
+tree_cache_lock = threading.Lock()
+
+
+def get_cache_nbytes():
+    return int(getattr(settings, 'XO_MCTS_TREE_CACHE_MB', TREE_CACHE_MB) * (1 << 20))
+
+
+def get_key(engine, game):
+    """None for the games that are not saved.
+    """
+    if game.pk is None or get_cache_nbytes() == 0:
+        return None
+    return (engine, game.pk)
+
+
+def pop_tree(key):
+    """Takes the tree of key out of the cache, so that a concurrent search
+    of the same game does not share it, None if there is none.
+    """
+    if key is None:
+        return None
+    with tree_cache_lock:
+        tree_cache_nbytes.pop(key, None)
+        return tree_cache.pop(key, None)
+
+
+def put_tree(key, tree, nbytes):
+    """Keeps the tree of nbytes bytes under key, a tree larger than the
+    whole cache is not kept.
+    """
+    if key is None:
+        return
+    max_nbytes = get_cache_nbytes()
+    with tree_cache_lock:
+        tree_cache.pop(key, None)
+        tree_cache_nbytes.pop(key, None)
+        if nbytes > max_nbytes:
+            return
+        tree_cache[key] = tree
+        tree_cache_nbytes[key] = nbytes
+        while sum(tree_cache_nbytes.values()) > max_nbytes:
+            old_key, _ = tree_cache.popitem(last=False)
+            tree_cache_nbytes.pop(old_key)
+
+
+def get_n_plies(board_x, board_o, node_x, node_o):
+    """Number of moves from the node to the position, if it can be below
+    the node at all.
+    """
+    return bin(board_x | board_o).count('1') - bin(node_x | node_o).count('1')
+
+
+def match(board_x, board_o, node_x, node_o, n_rows, n_cols):
+    """The transforms of the position and of the node to their common
+    canonical form or None if they are not symmetric to each other.
+    """
+    canonical_x, canonical_o, transform = symmetry.canonicalize(board_x, board_o,
+                                                                n_rows, n_cols)
+    node_canonical_x, node_canonical_o, node_transform = symmetry.canonicalize(
+        node_x, node_o, n_rows, n_cols)
+    if (canonical_x, canonical_o) != (node_canonical_x, node_canonical_o):
+        return None
+    return transform, node_transform
+
+
+def to_game_move(index, transforms, n_rows, n_cols):
+    """Maps the index of a move at the node to the same move in the frame
+    of the position.
+    """
+    transform, node_transform = transforms
+    index = symmetry.transform_index(index, node_transform, n_rows, n_cols)
+    return symmetry.transform_index(index, symmetry.get_inverse(transform), n_rows, n_cols)
+
+
+def clear():
+    with tree_cache_lock:
+        tree_cache.clear()
+        tree_cache_nbytes.clear()
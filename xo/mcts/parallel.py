@@ -0,0 +1,117 @@
+"""Root-parallel MCTS over the process pool.
+
+Each process of the pool grows its own tree from the same root with its
+own random stream for the same budget, and only the counters of the
+children of the root come back. They are summed per move and the move is
+chosen on the sums as on a single tree. The trees stay in the processes,
+so they are not kept for the next move of the game as in cache.
+"""
+import time
+import numpy as np
+from concurrent.futures import wait
+from .. import board_utils, pool, symmetry
+from ..stats import SearchStats
+from ..utils import make_logger
+from . import tree as mcts_tree
+from .algorithm import SEC_LIMIT_PER_MOVE, UCB_CONSTANT
+
+
+logger = make_logger('mcts.parallel.py')
+
+
+def search_tree(config, board_x, board_o, seed, time_limit, max_rollouts, batch_size=1):
+    """Runs in a process of the pool. Returns the moves of the children
+    of the root, their wins and rollouts, and the SearchStats of the task.
+    """
+    start = time.monotonic()
+    # the rollouts and the order of the children use the global stream
+    np.random.seed(seed)
+    stats = SearchStats('mcts_tree')
+    tree = mcts_tree.Tree(*config)
+    root = tree.add_root(board_x, board_o)
+    while tree.has_next_child(root):
+        tree.add_next_child(root)
+    deadline = start + time_limit if time_limit is not None else None
+    stats.add_time('setup', time.monotonic() - start)
+    mcts_tree.run(tree, root, deadline, max_rollouts, stats, batch_size)
+
+    children = tree.get_children(root)
+    return tree.action[children], tree.n_wins[children], tree.n_selected[children], stats
+
+
+def get_n_task_rollouts(max_rollouts, n_tasks):
+    """max_rollouts split over the tasks, the first ones take the rest.
+    """
+    if max_rollouts is None:
+        return [None] * n_tasks
+    n_rollouts, n_rest = divmod(max_rollouts, n_tasks)
+    return [n_rollouts + (task < n_rest) for task in range(n_tasks)]
+
+
+def get_best_move(game, time_limit=SEC_LIMIT_PER_MOVE, max_rollouts=None, batch_size=1):
+    """Same as tree.get_best_move with one tree per process of the pool,
+    each for time_limit seconds, and max_rollouts over all of them.
+    Returns the move and the SearchStats.
+    """
+    start = time.monotonic()
+    n_cells = game.n_rows * game.n_cols
+    if board_utils.is_game_over(game.board_x, game.board_o, game.n_rows,
+                                game.n_cols, game.n_connects) is not None:
+        err_msg = 'Game already over for {}, no more moves.'
+        err_msg = err_msg.format(game)
+        logger.error(err_msg)
+        raise ValueError(err_msg)
+
+    executor = pool.get_pool()
+    n_tasks = pool.get_n_workers()
+    marker = board_utils.get_next_player(game.board_x, game.board_o, n_cells)
+    info_msg = 'Getting best move for Player {} at {} within {} seconds on {} workers'
+    info_msg = info_msg.format(marker, game, time_limit, n_tasks)
+    logger.info(info_msg)
+
+    config = (game.n_rows, game.n_cols, game.n_connects)
+    # independent streams for the tasks, different at every move
+    seeds = [int(seed.generate_state(1)[0])
+             for seed in np.random.SeedSequence().spawn(n_tasks)]
+    stats = SearchStats('parallel_mcts')
+    search_start = time.monotonic()
+    stats.add_time('setup', search_start - start)
+    futures = [executor.submit(search_tree, config, game.board_x, game.board_o,
+                               seed, time_limit, n_rollouts, batch_size)
+               for seed, n_rollouts in zip(seeds, get_n_task_rollouts(max_rollouts, n_tasks))]
+    wait(futures)
+
+    # the trees pick their own move of each class of symmetric moves,
+    # the counters are summed on the lowest index of the class
+    stabilizer = np.array(symmetry.get_stabilizer(game.board_x, game.board_o,
+                                                  game.n_rows, game.n_cols))
+    n_wins = np.zeros(n_cells, dtype=np.int64)
+    n_selected = np.zeros(n_cells, dtype=np.int64)
+    for future in futures:
+        actions, task_wins, task_selected, task_stats = future.result()
+        actions = stabilizer[:, actions].min(axis=0)
+        n_wins[actions] += task_wins
+        n_selected[actions] += task_selected
+        stats.n_nodes += task_stats.n_nodes
+        stats.n_iterations += task_stats.n_iterations
+        stats.n_rollouts += task_stats.n_rollouts
+        stats.max_depth = max(stats.max_depth, task_stats.max_depth)
+    stats.max_ply = stats.max_depth
+    stats.add_time('search', time.monotonic() - search_start)
+
+    # the ucb of Tree.select_child_by_ucb on the sums, over the children
+    # with rollouts
+    if n_selected.any():
+        actions = np.flatnonzero(n_selected)
+        ucb = (n_wins[actions] / n_selected[actions]
+               + UCB_CONSTANT * np.sqrt(np.log(stats.n_rollouts + 1) / n_selected[actions]))
+        best_move = int(actions[np.argmax(ucb)])
+    else:
+        # not a single rollout within the budget
+        best_move = int(stabilizer[:, futures[0].result()[0][0]].min())
+
+    info_msg = 'Parallel MCTS move for Player {} is index {} with {}/{} wins over {} rollouts'
+    info_msg = info_msg.format(marker, best_move, n_wins[best_move],
+                               n_selected[best_move], stats.n_rollouts)
+    logger.info(info_msg)
+    return best_move, stats
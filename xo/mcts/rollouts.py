@@ -0,0 +1,75 @@
+"""Random rollouts played in batches on numpy arrays.
+
+A batch of rollouts from the same position is a random order of its
+empty cells per rollout, the player to move taking the even moves and
+the other player the odd ones. The boards of the two players after each
+move are the running bitwise or of their moves, and each rollout ends at
+the first of them that covers one of the wins of
+win_state_utils.get_board_wins_array, or in a draw if neither does. So
+a batch plays the same random games as the rollouts of one move at a
+time, all the moves of all of them in a few array operations, and only
+the counts of the results come back for a single update of the tree.
+"""
+import numpy as np
+from .. import board_utils, win_state_utils
+
+
+# rollouts per selected leaf of the batched searches
+ROLLOUT_BATCH_SIZE = 32
+
+
+def get_win_steps(boards, wins):
+    """The first move of each row of boards at which it covers a win, or
+    the number of moves if it never does.
+    """
+    covers = ((boards[:, :, np.newaxis] & wins) == wins).any(axis=2)
+    return np.where(covers.any(axis=1), covers.argmax(axis=1), boards.shape[1])
+
+
+def get_rollout_counts(board_x, board_o, n_rollouts, n_rows, n_cols, n_connects):
+    """Plays n_rollouts random games from the position, which is not over.
+    Returns the number of wins of X, of wins of O and of draws.
+    """
+    n_cells = n_rows * n_cols
+    if n_cells > 64:
+        err_msg = 'Batched rollouts need boards of at most 64 cells, not {}x{}'
+        err_msg = err_msg.format(n_rows, n_cols)
+        raise ValueError(err_msg)
+
+    wins = win_state_utils.get_board_wins_array(n_rows, n_cols, n_connects)
+    empty_indexes = board_utils.get_empty_indexes(board_x, board_o, n_cells)
+    n_empty = len(empty_indexes)
+    marker = board_utils.get_next_player(board_x, board_o, n_cells)
+    if marker == board_utils.MARKER_X:
+        board, other_board = board_x, board_o
+    else:
+        board, other_board = board_o, board_x
+
+    # a random order of the empty cells per rollout
+    order = np.random.random((n_rollouts, n_empty)).argsort(axis=1)
+    cells = np.array(empty_indexes, dtype=np.uint64)[order]
+    moves = np.left_shift(np.uint64(1), cells)
+    is_own = np.arange(n_empty) % 2 == 0
+    own_boards = np.bitwise_or.accumulate(np.where(is_own, moves, np.uint64(0)), axis=1)
+    own_boards |= np.uint64(board)
+    other_boards = np.bitwise_or.accumulate(np.where(is_own, np.uint64(0), moves), axis=1)
+    other_boards |= np.uint64(other_board)
+
+    # the boards only grow, so the first of the two to cover a win ends
+    # the rollout
+    own_steps = get_win_steps(own_boards, wins)
+    other_steps = get_win_steps(other_boards, wins)
+    n_own_wins = int(np.count_nonzero(own_steps < other_steps))
+    n_other_wins = int(np.count_nonzero(other_steps < own_steps))
+    n_draws = n_rollouts - n_own_wins - n_other_wins
+    if marker == board_utils.MARKER_X:
+        return n_own_wins, n_other_wins, n_draws
+    return n_other_wins, n_own_wins, n_draws
+
+
+def get_result_counts(result, n_rollouts):
+    """The counts of n_rollouts games that all end in result.
+    """
+    return (n_rollouts * (result == board_utils.MARKER_X),
+            n_rollouts * (result == board_utils.MARKER_O),
+            n_rollouts * (result == ' '))
@@ -0,0 +1,435 @@
+"""Same search as algorithm.get_best_move on a tree of flat arrays.
+
+A node is an id into preallocated numpy arrays of its boards, counters
+and links rather than a Node object, so a search of hundreds of
+thousands of nodes is a dozen arrays instead of as many objects for the
+garbage collector to go over. The arrays double in size when they fill.
+
+The children of a node are a run of consecutive slots, reserved all at
+once when the node is first expanded, that hold the move of each child
+and the id of the child once it is made. So a node only keeps its first
+slot, e.g., for the UCB of all of its children at once, and the moves
+that are never tried only take a slot rather than a node. Rollouts do
+not make nodes, they play a random order of the empty cells, one at a
+time or in batches, see rollouts.
+"""
+import time
+import numpy as np
+from .. import board_utils, symmetry
+from ..stats import SearchStats
+from ..utils import make_logger
+from .algorithm import SEC_LIMIT_PER_MOVE, UCB_CONSTANT
+from . import cache, rollouts
+
+
+logger = make_logger('mcts.tree.py')
+
+
+NO_NODE = -1
+INITIAL_CAPACITY = 1 << 12
+
+# game results of the nodes
+ONGOING = 0
+X_WINS = 1
+O_WINS = 2
+DRAW = 3
+RESULTS = (None, board_utils.MARKER_X, board_utils.MARKER_O, ' ')
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+# 33 bytes per node, boards of up to 5x5 fit in 32 bits
+NODE_FIELDS = (
+    ('board_x', np.int32),
+    ('board_o', np.int32),
+    ('parent', np.int32),
+    # first slot of the children, NO_NODE until the node is expanded
+    ('first_slot', np.int32),
+    # children made so far out of the n_actions slots
+    ('n_children', np.int16),
+    ('n_actions', np.int16),
+    ('action', np.int8),
+    # 0 if X made the move that led to the node, 1 if O did
+    ('side', np.int8),
+    ('result', np.int8),
+    # position in Tree.stabilizers, the subgroups of the symmetries of
+    # the square are few
+    ('stabilizer', np.int8),
+    ('depth', np.int8),
+    ('n_wins', np.int32),
+    ('n_selected', np.int32),
+)
+# 5 bytes per slot
+SLOT_FIELDS = (
+    ('slot_action', np.int8),
+    ('slot_node', np.int32),
+)
+
+
+def grow(obj, fields, size, capacity, needed):
+    """Doubles the capacity of the arrays of fields of obj until needed
+    items fit, the first size items are kept. Returns the new capacity.
+    """
+    if needed <= capacity:
+        return capacity
+    while capacity < needed:
+        capacity *= 2
+    for name, _ in fields:
+        array = getattr(obj, name)
+        grown = np.zeros(capacity, dtype=array.dtype)
+        grown[:size] = array[:size]
+        setattr(obj, name, grown)
+    return capacity
+
+
+class Tree:
+    def __init__(self, n_rows, n_cols, n_connects, capacity=INITIAL_CAPACITY):
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+        self.n_connects = n_connects
+        self.n_cells = n_rows * n_cols
+        self.n_nodes = 0
+        self.node_capacity = capacity
+        for name, dtype in NODE_FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.n_slots = 0
+        self.slot_capacity = capacity
+        for name, dtype in SLOT_FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        # the distinct stabilizers of the nodes, see symmetry.get_stabilizer
+        self.stabilizers = list()
+        self.stabilizer_ids = dict()
+
+    def __repr__(self):
+        repr_ = '{}(({}, {}, {}), {} nodes, {} slots, {:.1f}MB)'
+        repr_ = repr_.format(Tree.__name__, self.n_rows, self.n_cols, self.n_connects,
+                             self.n_nodes, self.n_slots, self.nbytes / (1 << 20))
+        return repr_
+
+    @property
+    def nbytes(self):
+        fields = NODE_FIELDS + SLOT_FIELDS
+        return sum(getattr(self, name).nbytes for name, _ in fields)
+
+    def new_node(self):
+        self.node_capacity = grow(self, NODE_FIELDS, self.n_nodes,
+                                  self.node_capacity, self.n_nodes + 1)
+        node = self.n_nodes
+        self.n_nodes += 1
+        self.first_slot[node] = NO_NODE
+        return node
+
+    def get_stabilizer_id(self, stabilizer):
+        stabilizer_id = self.stabilizer_ids.get(stabilizer, None)
+        if stabilizer_id is None:
+            stabilizer_id = len(self.stabilizers)
+            self.stabilizers.append(stabilizer)
+            self.stabilizer_ids[stabilizer] = stabilizer_id
+        return stabilizer_id
+
+    def add_root(self, board_x, board_o):
+        root = self.new_node()
+        cur_player = board_utils.get_cur_player(board_x, board_o, self.n_cells)
+        result = board_utils.is_game_over(board_x, board_o, self.n_rows,
+                                          self.n_cols, self.n_connects)
+        stabilizer = symmetry.get_stabilizer(board_x, board_o, self.n_rows, self.n_cols)
+
+        self.board_x[root] = board_x
+        self.board_o[root] = board_o
+        self.parent[root] = NO_NODE
+        self.side[root] = 0 if cur_player == board_utils.MARKER_X else 1
+        self.action[root] = NO_NODE
+        self.result[root] = RESULT_CODES[result]
+        self.stabilizer[root] = self.get_stabilizer_id(stabilizer)
+        return root
+
+    def reserve_children(self, node):
+        """Takes the slots of the children of node, one per class of
+        symmetric moves in random order.
+        """
+        board_x = int(self.board_x[node])
+        board_o = int(self.board_o[node])
+        actions = board_utils.get_empty_indexes(board_x, board_o, self.n_cells)
+        np.random.shuffle(actions)
+        actions = symmetry.get_unique_moves(actions, self.stabilizers[self.stabilizer[node]])
+
+        n_actions = len(actions)
+        first = self.n_slots
+        self.slot_capacity = grow(self, SLOT_FIELDS, first, self.slot_capacity,
+                                  first + n_actions)
+        self.n_slots += n_actions
+        self.slot_action[first:first + n_actions] = actions
+        self.first_slot[node] = first
+        self.n_actions[node] = n_actions
+
+    def get_children(self, node):
+        first = self.first_slot[node]
+        return self.slot_node[first:first + self.n_children[node]]
+
+    def has_next_child(self, node):
+        if self.first_slot[node] == NO_NODE:
+            self.reserve_children(node)
+        return self.n_children[node] < self.n_actions[node]
+
+    def add_next_child(self, node):
+        slot = self.first_slot[node] + self.n_children[node]
+        self.n_children[node] += 1
+        child = self.new_node()
+        self.slot_node[slot] = child
+
+        index = int(self.slot_action[slot])
+        side = 1 - self.side[node]
+        board_x = int(self.board_x[node])
+        board_o = int(self.board_o[node])
+        if side == 0:
+            board_x |= 1 << index
+        else:
+            board_o |= 1 << index
+        result = board_utils.is_game_over_at(board_x, board_o, index, self.n_rows,
+                                             self.n_cols, self.n_connects)
+        stabilizer = symmetry.get_child_stabilizer(self.stabilizers[self.stabilizer[node]], index)
+
+        self.board_x[child] = board_x
+        self.board_o[child] = board_o
+        self.parent[child] = node
+        self.action[child] = index
+        self.side[child] = side
+        self.result[child] = RESULT_CODES[result]
+        self.stabilizer[child] = self.get_stabilizer_id(stabilizer)
+        self.depth[child] = self.depth[node] + 1
+        return child
+
+    def find_descendant(self, root, board_x, board_o):
+        """Same as algorithm.find_descendant.
+        """
+        n_plies = cache.get_n_plies(board_x, board_o, int(self.board_x[root]),
+                                    int(self.board_o[root]))
+        if not 0 <= n_plies <= cache.REUSE_PLIES:
+            return None, None
+        level = [root]
+        for _ in range(n_plies):
+            level = [int(child) for node in level for child in self.get_children(node)]
+        for node in level:
+            transforms = cache.match(board_x, board_o, int(self.board_x[node]),
+                                     int(self.board_o[node]), self.n_rows, self.n_cols)
+            if transforms is not None:
+                return node, transforms
+        return None, None
+
+    def reroot(self, root):
+        """Returns a new Tree of the subtree of root, with root as node 0
+        and the nodes and slots of the rest of the tree left out.
+        """
+        n_nodes = self.n_nodes
+        parent = self.parent[:n_nodes]
+        has_parent = parent != NO_NODE
+        # children are made after their parent, so each pass over the ids
+        # reaches one more ply of the subtree
+        keep = np.zeros(n_nodes, dtype=bool)
+        keep[root] = True
+        depth = self.depth[:n_nodes]
+        for _ in range(int(depth.max()) - int(depth[root])):
+            keep[has_parent] |= keep[parent[has_parent]]
+        new_ids = (np.cumsum(keep) - 1).astype(np.int32)
+
+        tree = Tree(self.n_rows, self.n_cols, self.n_connects)
+        tree.stabilizers = list(self.stabilizers)
+        tree.stabilizer_ids = dict(self.stabilizer_ids)
+        n_kept = int(keep.sum())
+        tree.node_capacity = grow(tree, NODE_FIELDS, 0, tree.node_capacity, n_kept)
+        tree.n_nodes = n_kept
+        for name, _ in NODE_FIELDS:
+            getattr(tree, name)[:n_kept] = getattr(self, name)[:n_nodes][keep]
+        kept_parent = tree.parent[:n_kept]
+        tree.parent[:n_kept] = np.where(kept_parent != NO_NODE, new_ids[kept_parent], NO_NODE)
+        tree.parent[0] = NO_NODE
+        tree.depth[:n_kept] -= self.depth[root]
+
+        # the runs of slots of the kept nodes, one after the other
+        first_slot = tree.first_slot[:n_kept]
+        n_actions = np.where(first_slot != NO_NODE, tree.n_actions[:n_kept], 0).astype(np.int64)
+        new_first_slot = np.cumsum(n_actions) - n_actions
+        n_slots = int(n_actions.sum())
+        slots = np.repeat(first_slot - new_first_slot, n_actions) + np.arange(n_slots)
+        tree.slot_capacity = grow(tree, SLOT_FIELDS, 0, tree.slot_capacity, n_slots)
+        tree.n_slots = n_slots
+        tree.slot_action[:n_slots] = self.slot_action[slots]
+        # the slots of children not made yet keep a meaningless id
+        tree.slot_node[:n_slots] = new_ids[self.slot_node[slots]]
+        tree.first_slot[:n_kept] = np.where(first_slot != NO_NODE, new_first_slot, NO_NODE)
+        return tree
+
+    def select_child_by_ucb(self, node, time_):
+        # unexplored child always has infinity ucb
+        if self.has_next_child(node):
+            return self.add_next_child(node)
+
+        children = self.get_children(node)
+        n_selected = self.n_selected[children]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ucb = np.where(n_selected > 0,
+                           self.n_wins[children] / n_selected
+                           + UCB_CONSTANT * np.sqrt(np.log(time_) / n_selected),
+                           np.inf)
+        return int(children[np.argmax(ucb)])
+
+    def select(self, node, time_):
+        while self.result[node] == ONGOING and self.n_children[node] > 0:
+            node = self.select_child_by_ucb(node, time_)
+        return node
+
+    def expand(self, node):
+        if self.result[node] != ONGOING or not self.has_next_child(node):
+            return node
+        return self.add_next_child(node)
+
+    def simulate(self, node):
+        result = self.result[node]
+        if result != ONGOING:
+            return RESULTS[result]
+
+        # rollout policy is a random order of the empty cells
+        board_x = int(self.board_x[node])
+        board_o = int(self.board_o[node])
+        is_x = self.side[node] == 1
+        actions = board_utils.get_empty_indexes(board_x, board_o, self.n_cells)
+        np.random.shuffle(actions)
+        for index in actions:
+            if is_x:
+                board_x |= 1 << index
+            else:
+                board_o |= 1 << index
+            result = board_utils.is_game_over_at(board_x, board_o, index, self.n_rows,
+                                                 self.n_cols, self.n_connects)
+            if result is not None:
+                return result
+            is_x = not is_x
+
+    def simulate_batch(self, node, n_rollouts):
+        """The wins of X, of O and the draws of n_rollouts random games
+        from node, see rollouts.
+        """
+        result = self.result[node]
+        if result != ONGOING:
+            return rollouts.get_result_counts(RESULTS[result], n_rollouts)
+        return rollouts.get_rollout_counts(int(self.board_x[node]), int(self.board_o[node]),
+                                           n_rollouts, self.n_rows, self.n_cols,
+                                           self.n_connects)
+
+    def backpropagate_counts(self, node, counts):
+        """Same as backpropagate for the counts of simulate_batch at once.
+        """
+        n_x_wins, n_o_wins, n_draws = counts
+        path = list()
+        while node != NO_NODE:
+            path.append(node)
+            node = self.parent[node]
+        self.n_selected[path] += n_x_wins + n_o_wins + n_draws
+        # side 0 is X
+        self.n_wins[path] += np.where(self.side[path] == 0, n_x_wins - n_o_wins,
+                                      n_o_wins - n_x_wins).astype(self.n_wins.dtype)
+
+    def backpropagate(self, node, result):
+        code = RESULT_CODES[result]
+        while node != NO_NODE:
+            self.n_selected[node] += 1
+            if code != DRAW:
+                # side 0 is X and X_WINS is 1
+                self.n_wins[node] += 1 if self.side[node] + 1 == code else -1
+            node = self.parent[node]
+
+
+def run(tree, root, deadline, max_rollouts, stats, batch_size=1):
+    """The rollouts from root until the deadline or max_rollouts, either
+    of them None for no bound, counted in stats, batch_size of them per
+    selected leaf. Returns the time of the ucb after the last rollout.
+    """
+    # the rollouts of a kept tree count for the ucb
+    n_kept = int(tree.n_selected[root])
+    it = n_kept + 1
+    n_iterations = 0
+    while True:
+        time_0 = time.monotonic()
+        if deadline is not None and time_0 >= deadline:
+            break
+        if max_rollouts is not None and it - n_kept > max_rollouts:
+            break
+
+        optimal_leaf = tree.select(root, it)
+        time_1 = time.monotonic()
+        expanded_optimal = tree.expand(optimal_leaf)
+        time_2 = time.monotonic()
+        if batch_size > 1:
+            n_rollouts = batch_size
+            if max_rollouts is not None:
+                n_rollouts = min(n_rollouts, max_rollouts - (it - 1 - n_kept))
+            simulation_counts = tree.simulate_batch(expanded_optimal, n_rollouts)
+            time_3 = time.monotonic()
+            tree.backpropagate_counts(expanded_optimal, simulation_counts)
+        else:
+            n_rollouts = 1
+            simulation_result = tree.simulate(expanded_optimal)
+            time_3 = time.monotonic()
+            tree.backpropagate(expanded_optimal, simulation_result)
+        time_4 = time.monotonic()
+        it += n_rollouts
+        n_iterations += 1
+
+        stats.add_time('select', time_1 - time_0)
+        stats.add_time('expand', time_2 - time_1)
+        stats.add_time('simulate', time_3 - time_2)
+        stats.add_time('backpropagate', time_4 - time_3)
+        depth = int(tree.depth[expanded_optimal])
+        if depth > stats.max_depth:
+            stats.max_depth = depth
+
+    stats.n_nodes = tree.n_nodes
+    stats.n_iterations = n_iterations
+    stats.n_rollouts = it - 1 - n_kept
+    stats.max_ply = stats.max_depth
+    return it
+
+
+def get_best_move(game, time_limit=SEC_LIMIT_PER_MOVE, max_rollouts=None, batch_size=1):
+    """Same as algorithm.get_best_move on a Tree, bounded by time_limit in
+    seconds and max_rollouts, with batch_size rollouts per selected leaf.
+    Returns the move and the SearchStats.
+    """
+    stats = SearchStats('mcts_tree')
+    start = time.monotonic()
+    key = cache.get_key('mcts_tree', game)
+    tree, transforms = None, None
+    kept = cache.pop_tree(key)
+    if kept is not None:
+        kept_tree, kept_root = kept
+        node, transforms = kept_tree.find_descendant(kept_root, game.board_x, game.board_o)
+        if node is not None:
+            tree = kept_tree.reroot(node)
+    if tree is None:
+        tree = Tree(game.n_rows, game.n_cols, game.n_connects)
+        tree.add_root(game.board_x, game.board_o)
+    else:
+        info_msg = 'Reusing the tree of game {} with {} rollouts'
+        info_msg = info_msg.format(game.pk, tree.n_selected[0])
+        logger.info(info_msg)
+    root = 0
+    if tree.result[root] != ONGOING:
+        err_msg = 'Game already over for {}, no more moves.'
+        err_msg = err_msg.format(game)
+        logger.error(err_msg)
+        raise ValueError(err_msg)
+
+    # the root is fully expanded as in Node.make_root
+    while tree.has_next_child(root):
+        tree.add_next_child(root)
+
+    deadline = start + time_limit if time_limit is not None else None
+    stats.add_time('setup', time.monotonic() - start)
+    it = run(tree, root, deadline, max_rollouts, stats, batch_size)
+
+    best_child = tree.select_child_by_ucb(root, it)
+    cache.put_tree(key, (tree, root), tree.nbytes)
+    logger.debug(tree)
+
+    best_move = int(tree.action[best_child])
+    if transforms is not None:
+        best_move = cache.to_game_move(best_move, transforms, game.n_rows, game.n_cols)
+    return best_move, stats
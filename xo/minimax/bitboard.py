@@ -0,0 +1,321 @@
+"""Negamax on plain integers.
+
+Same search as minimax.get_negamax, i.e., the same transposition table,
+move ordering, pvs and budget, so it picks the same moves, but a node is
+two bitboards and a side to move bit rather than a State. The children
+are marked and unmarked in place, the symmetry keys are XORed in and out
+of a single list, the empty cells come from the lowest set bit of
+~(x | o) & full and inner nodes only return their value.
+"""
+import time
+from .. import board_utils, win_state_utils, symmetry
+from . import zobrist, threats
+from .minimax import (SearchContext, SearchTimeout, ASPIRATION_WINDOW,
+                      get_time_limit)
+from .transposition_table import NO_MOVE, get_ttable
+from .evaluator import LineCounters, MAX_LINE
+
+
+INF = float('inf')
+
+EXACT = board_utils.EXACT
+LOWER = board_utils.LOWER
+UPPER = board_utils.UPPER
+HEURISTIC = board_utils.HEURISTIC
+
+
+class Board:
+    """The root position, the per configuration tables of the search and
+    the symmetry keys of the current node.
+    """
+    def __init__(self, n_rows, n_cols, n_connects, board_x, board_o, evaluation=MAX_LINE):
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+        self.n_connects = n_connects
+        self.board_x = board_x
+        self.board_o = board_o
+        self.n_cells = n_rows * n_cols
+        self.full = (1 << self.n_cells) - 1
+        self.max_score = self.n_cells
+        self.wins = win_state_utils.get_board_wins(n_rows, n_cols, n_connects)
+        self.cell_wins = win_state_utils.get_cell_wins(n_rows, n_cols, n_connects)
+        # [side][index] the deltas of each symmetry key, side 0 is X
+        self.deltas = zobrist.get_zobrist(n_rows, n_cols, n_connects)
+        symmetries = symmetry.get_symmetries(n_rows, n_cols)
+        self.permutations = tuple(permutation for _, permutation, _ in symmetries)
+        self.inverse_permutations = tuple(
+            symmetry.get_symmetry(symmetry.get_inverse(transform), n_rows, n_cols)[1]
+            for transform, _, _ in symmetries
+        )
+        self.keys = list(zobrist.compute_keys(board_x, board_o, n_rows, n_cols, n_connects))
+        # marked and unmarked along with the keys
+        self.lines = LineCounters(n_rows, n_cols, n_connects, board_x, board_o, evaluation)
+
+
+def get_winner_at(board, board_x, board_o, index, is_x):
+    """Value for X if the move at index by the player who is not to move
+    ended the game, None otherwise.
+    """
+    own = board_o if is_x else board_x
+    for win in board.cell_wins[index]:
+        if own & win == win:
+            return -board.max_score if is_x else board.max_score
+    if (board_x | board_o) == board.full:
+        return 0
+    return None
+
+
+def get_winner(board, board_x, board_o):
+    winner = board_utils.is_game_over(board_x, board_o, board.n_rows,
+                                      board.n_cols, board.n_connects)
+    if winner is None:
+        return None
+    elif winner == board_utils.MARKER_X:
+        return board.max_score
+    elif winner == board_utils.MARKER_O:
+        return -board.max_score
+    return 0
+
+
+def order_moves(empties, side, hash_move, ply, search):
+    """Same as minimax.order_moves on the bits of the empty cells.
+    """
+    history = search.history[side]
+    indexes = list()
+    rest = empties
+    while rest:
+        low = rest & -rest
+        indexes.append(low.bit_length() - 1)
+        rest ^= low
+    ordered = sorted(indexes, key=lambda index: -history[index])
+
+    first = list()
+    if hash_move is not None and empties >> hash_move & 1:
+        first.append(hash_move)
+    for killer in search.killers[ply]:
+        if killer is not None and killer not in first and empties >> killer & 1:
+            first.append(killer)
+
+    if not first:
+        return ordered
+    return first + [index for index in ordered if index not in first]
+
+
+def negamax(board, board_x, board_o, is_x, depth, alpha, beta, color, search, last_index, ply):
+    """Value of the position for color, the best move and flag of the root
+    are left in search.root_move and search.root_flag.
+    """
+    search.add_node(ply)
+    stats = search.stats
+    ttable = search.ttable
+    keys = board.keys
+    alpha_orig = alpha
+
+    key = min(keys)
+    entry = ttable.probe(key)
+    stats.n_tt_probes += 1
+    if entry is not None:
+        stats.n_tt_hits += 1
+        if ply > 0:
+            cache_depth, cache_flag, cache_value, _ = entry
+            if cache_depth >= depth:
+                if cache_flag == EXACT:
+                    stats.n_tt_cutoffs += 1
+                    return cache_value
+                elif cache_flag == LOWER:
+                    alpha = max(alpha, cache_value)
+                elif cache_flag == UPPER:
+                    beta = min(beta, cache_value)
+
+            if alpha >= beta:
+                stats.n_tt_cutoffs += 1
+                return cache_value
+
+    if last_index is not None:
+        winner = get_winner_at(board, board_x, board_o, last_index, is_x)
+    else:
+        winner = get_winner(board, board_x, board_o)
+    if winner is not None:
+        return color * winner
+
+    if depth == 0:
+        if search.threat_search:
+            own, other = (board_x, board_o) if is_x else (board_o, board_x)
+            value = threats.get_quiescence(own, other, board.wins, board.full,
+                                           board.max_score, search)
+            if value is not None:
+                return value
+        return color * board.lines.evaluate(is_x)
+
+    sym_ind = keys.index(key)
+    hash_move = None
+    if entry is not None and entry[3] != NO_MOVE:
+        hash_move = board.inverse_permutations[sym_ind][entry[3]]
+
+    side = 0 if is_x else 1
+    empties = ~(board_x | board_o) & board.full
+    ordered = order_moves(empties, side, hash_move, ply, search)
+    stabilizer = search.stabilizers[ply]
+    ordered = symmetry.get_unique_moves(ordered, stabilizer)
+
+    deltas = board.deltas[side]
+    n_keys = len(keys)
+    lines = board.lines
+    best_score = -INF
+    best_index = None
+    pvs = search.pvs
+    for i, index in enumerate(ordered):
+        flag = 1 << index
+        delta = deltas[index]
+        for k in range(n_keys):
+            keys[k] ^= delta[k]
+        lines.mark(index, side)
+        search.stabilizers[ply + 1] = symmetry.get_child_stabilizer(stabilizer, index)
+        if is_x:
+            child_x, child_o = board_x | flag, board_o
+        else:
+            child_x, child_o = board_x, board_o | flag
+
+        if pvs and i > 0:
+            child_value = -negamax(board, child_x, child_o, not is_x, depth - 1,
+                                   -alpha - 1, -alpha, -color, search, index, ply + 1)
+            if alpha < child_value < beta:
+                child_value = -negamax(board, child_x, child_o, not is_x, depth - 1,
+                                       -beta, -alpha, -color, search, index, ply + 1)
+        else:
+            child_value = -negamax(board, child_x, child_o, not is_x, depth - 1,
+                                   -beta, -alpha, -color, search, index, ply + 1)
+
+        for k in range(n_keys):
+            keys[k] ^= delta[k]
+        lines.unmark(index, side)
+
+        if child_value > best_score:
+            best_score = child_value
+            best_index = index
+
+        alpha = max(alpha, best_score)
+        if alpha >= beta:
+            search.add_cutoff(board_utils.MARKER_X if is_x else board_utils.MARKER_O,
+                              index, depth, ply)
+            break
+
+    if best_score <= alpha_orig:
+        tt_flag = UPPER
+    elif best_score >= beta:
+        tt_flag = LOWER
+    else:
+        tt_flag = EXACT
+
+    move = NO_MOVE if best_index is None else board.permutations[sym_ind][best_index]
+    ttable.store(key, depth, best_score, tt_flag, move)
+
+    if ply == 0:
+        search.root_move = best_index
+        search.root_flag = tt_flag
+    return best_score
+
+
+def get_root_negamax(board, is_x, depth, color, search, prev_utility):
+    """Same as minimax.get_root_negamax.
+    """
+    args = (board, board.board_x, board.board_o, is_x, depth)
+    if not search.pvs or prev_utility is None:
+        utility = negamax(*args, -INF, INF, color, search, None, 0)
+        return utility, search.root_move, search.root_flag
+
+    window = ASPIRATION_WINDOW
+    alpha = prev_utility - window
+    beta = prev_utility + window
+    while True:
+        utility = negamax(*args, alpha, beta, color, search, None, 0)
+
+        window *= 2
+        if utility <= alpha:
+            alpha = utility - window
+        elif utility >= beta:
+            beta = utility + window
+        else:
+            return utility, search.root_move, search.root_flag
+
+
+def get_ttable_evaluation(evaluation):
+    """The evaluation argument of get_ttable, MAX_LINE shares the table of
+    minimax since its values are those of minimax.get_heuristic.
+    """
+    return None if evaluation == MAX_LINE else evaluation
+
+
+def get_best_move(game, pvs=False, max_depth=None, time_limit=None, max_nodes=None,
+                  evaluation=MAX_LINE, on_check=None, threat_search=False):
+    """Same as minimax.get_best_move with a choice of evaluation, see
+    evaluator.LineCounters.evaluate. Returns the move and the SearchStats.
+    """
+    start = time.monotonic()
+    if time_limit is None and max_nodes is None:
+        time_limit = get_time_limit()
+    deadline = start + time_limit if time_limit is not None else None
+
+    board = Board(game.n_rows, game.n_cols, game.n_connects,
+                  game.board_x, game.board_o, evaluation)
+    eval_marker = board_utils.get_next_player(game.board_x, game.board_o, game.n_cells)
+    is_x = eval_marker == board_utils.MARKER_X
+    color = 1 if is_x else -1
+    empties = ~(game.board_x | game.board_o) & board.full
+    depth_bound = bin(empties).count('1')
+    if max_depth is not None:
+        depth_bound = min(depth_bound, max_depth)
+
+    ttable = get_ttable(game.n_rows, game.n_cols, game.n_connects,
+                        get_ttable_evaluation(evaluation))
+    ttable.new_search()
+    search = SearchContext(ttable, game.n_cells, pvs, deadline, max_nodes, on_check,
+                           threat_search)
+    search.stats.engine = 'bitboard_minimax'
+    search.stabilizers[0] = symmetry.get_stabilizer(game.board_x, game.board_o,
+                                                    game.n_rows, game.n_cols)
+    stats = search.stats
+    search_start = time.monotonic()
+    stats.add_time('setup', search_start - start)
+
+    if threat_search:
+        own, other = (game.board_x, game.board_o) if is_x else (game.board_o, game.board_x)
+        forced_move = threats.get_forced_move(own, other, board.wins, board.full, search)
+        stats.add_time('threats', time.monotonic() - search_start)
+        if forced_move is not None:
+            info_msg = 'Bitboard minimax move for Player {} is index {} forced by threats'
+            info_msg = info_msg.format(eval_marker, forced_move)
+            print(info_msg)
+            return forced_move, stats
+        search_start = time.monotonic()
+
+    utility, best_move, flag = None, None, None
+    completed_depth = 0
+    for depth in range(1, depth_bound + 1):
+        try:
+            result = get_root_negamax(board, is_x, depth, color, search, utility)
+        except SearchTimeout:
+            break
+        utility, best_move, flag = result
+        completed_depth = depth
+        stats.n_iterations += 1
+
+    stats.max_depth = completed_depth
+    stats.add_time('search', time.monotonic() - search_start)
+
+    if best_move is None:
+        # not even the first iteration completed, take the first move in
+        # the order of the search
+        side = 0 if is_x else 1
+        best_move = order_moves(empties, side, None, 0, search)[0]
+
+    if completed_depth > 0:
+        info_msg = 'Bitboard minimax move for Player {} is index {} with "{}" value {} at depth {}'
+        info_msg = info_msg.format(eval_marker, best_move, board_utils.flag2str(flag),
+                                   color * utility, completed_depth)
+    else:
+        info_msg = 'Bitboard minimax move for Player {} is index {} without a completed iteration'
+        info_msg = info_msg.format(eval_marker, best_move)
+    print(info_msg)
+
+    return best_move, stats
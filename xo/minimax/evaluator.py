@@ -0,0 +1,113 @@
+"""Evaluation from open line counters kept up to date during the search.
+
+A line is one of the win masks of the configuration and it is open for
+a player as long as the opponent has no marker on it. The counters hold
+the number of markers of each player on each line and, per player, how
+many open lines hold k of their markers, so marking a cell only touches
+the lines through that cell and the evaluation reads the counts rather
+than going over all the win masks.
+"""
+from .. import win_state_utils
+
+
+# evaluations
+MAX_LINE = 'max_line'
+OPEN_LINES = 'open_lines'
+EVALUATIONS = (MAX_LINE, OPEN_LINES)
+
+# what minimax.get_heuristic gives when no line is open
+NO_OPEN_LINE = -(1 << 30)
+
+
+class LineCounters:
+    def __init__(self, n_rows, n_cols, n_connects, board_x, board_o, evaluation=MAX_LINE):
+        if evaluation not in EVALUATIONS:
+            err_msg = 'Do not recognize evaluation {}'.format(evaluation)
+            raise ValueError(err_msg)
+
+        self.n_connects = n_connects
+        self.evaluation = evaluation
+        wins = win_state_utils.get_board_wins(n_rows, n_cols, n_connects)
+        n_cells = n_rows * n_cols
+        self.cell_lines = tuple(
+            tuple(line for line, win in enumerate(wins) if win & (1 << index))
+            for index in range(n_cells)
+        )
+
+        # [side][line] markers of the side on the line, side 0 is X
+        self.counts = [
+            [bin(board_x & win).count('1') for win in wins],
+            [bin(board_o & win).count('1') for win in wins],
+        ]
+        # [side][k] open lines of the side with k of its markers
+        self.open_counts = [[0] * (n_connects + 1) for _ in range(2)]
+        for count_x, count_o in zip(*self.counts):
+            if count_o == 0:
+                self.open_counts[0][count_x] += 1
+            if count_x == 0:
+                self.open_counts[1][count_o] += 1
+
+        # the open lines evaluation is scaled to below the value of a win
+        # so that it never looks better than one
+        self.weights = [4 ** k - 1 for k in range(n_connects + 1)]
+        self.max_score = n_cells
+        self.scale = (self.max_score - 1) / (len(wins) * self.weights[n_connects])
+
+    def mark(self, index, side):
+        own = self.counts[side]
+        other = self.counts[1 - side]
+        own_open = self.open_counts[side]
+        other_open = self.open_counts[1 - side]
+        for line in self.cell_lines[index]:
+            count = own[line]
+            count_other = other[line]
+            if count_other == 0:
+                own_open[count] -= 1
+                own_open[count + 1] += 1
+                if count == 0:
+                    # no longer open for the other side
+                    other_open[0] -= 1
+            elif count == 0:
+                other_open[count_other] -= 1
+            own[line] = count + 1
+
+    def unmark(self, index, side):
+        own = self.counts[side]
+        other = self.counts[1 - side]
+        own_open = self.open_counts[side]
+        other_open = self.open_counts[1 - side]
+        for line in self.cell_lines[index]:
+            count = own[line] - 1
+            count_other = other[line]
+            if count_other == 0:
+                own_open[count + 1] -= 1
+                own_open[count] += 1
+                if count == 0:
+                    other_open[0] += 1
+            elif count == 0:
+                other_open[count_other] += 1
+            own[line] = count
+
+    def get_max_line(self, side):
+        open_counts = self.open_counts[side]
+        for k in range(self.n_connects, -1, -1):
+            if open_counts[k] > 0:
+                return k
+        return NO_OPEN_LINE
+
+    def evaluate(self, is_x):
+        """Value for X of the position with the player to move given by
+        is_x. MAX_LINE is minimax.get_heuristic, i.e., the most markers of
+        the player to move on one open line, and OPEN_LINES is the
+        weighted difference of the open lines of the two players.
+        """
+        if self.evaluation == MAX_LINE:
+            if is_x:
+                return self.get_max_line(0)
+            return -self.get_max_line(1)
+
+        open_x, open_o = self.open_counts
+        score = 0
+        for k in range(1, self.n_connects + 1):
+            score += self.weights[k] * (open_x[k] - open_o[k])
+        return score * self.scale
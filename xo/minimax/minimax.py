@@ -1,25 +1,21 @@
 import time, operator
 import numpy as np
 from collections import namedtuple
-from .. import board_utils, win_state_utils
+from django.conf import settings
+from .. import board_utils, win_state_utils, symmetry
 from .. import models
 from ..utils import timeit
-from .transposition_table import TTable, State
+from ..stats import SearchStats
+from .transposition_table import TTable, State, get_ttable
+from . import zobrist, threats
 
 
 def get_max_score(n_rows, n_cols):
     return n_rows * n_cols
 
 
-def get_utility(state, max_score):
+def get_utility(winner, max_score):
     utility = 0
-    winner = board_utils.is_game_over(
-        state.board_x,
-        state.board_o,
-        state.n_rows,
-        state.n_cols,
-        state.n_connects
-    )
     if winner == board_utils.MARKER_X:
         utility = max_score
     elif winner == board_utils.MARKER_O:
@@ -49,12 +45,17 @@ def mark_cell(state, marker, index):
     else:
         board_o = add_circle(state.board_o, index)
         board_x = state.board_x
+    keys = state.keys
+    if keys is not None:
+        keys = zobrist.update_keys(keys, index, marker, state.n_rows,
+                                   state.n_cols, state.n_connects)
     new_state = State(
         state.n_rows,
         state.n_cols,
         state.n_connects,
         board_x,
         board_o,
+        keys,
     )
     return new_state
 
@@ -74,57 +75,208 @@ def get_depth_bound(state):
     return len(empty_indexes)
 
 
-def get_best_move(game):
-    start = time.time()
+N_KILLERS = 2
+# nodes between two looks at the clock
+CHECK_EVERY = 256
+# seconds per move when neither the player nor the settings give a limit
+TIME_LIMIT = 3
+
+
+class SearchTimeout(Exception):
+    """Raised from inside the search when it runs out of its budget, the
+    iteration it interrupts is thrown away.
+    """
+
+
+class SearchContext:
+    """What the nodes of one search share besides their own arguments.
+    """
+    def __init__(self, ttable, n_cells, pvs=False, deadline=None, max_nodes=None,
+                 on_check=None, threat_search=False):
+        self.ttable = ttable
+        # principal variation search, see get_negamax
+        self.pvs = pvs
+        # threat-space quiescence at the leaves, see threats
+        self.threat_search = threat_search
+        self.stats = SearchStats('minimax')
+        # budget, deadline is on the time.monotonic clock
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        # called along with the look at the clock, may raise SearchTimeout
+        # or sleep, e.g., to cancel or throttle a pondering search
+        self.on_check = on_check
+        # move ordering, see order_moves
+        self.killers = [[None] * N_KILLERS for _ in range(n_cells + 1)]
+        self.history = [[0] * n_cells for _ in range(2)]
+        # [ply] permutations that map the position at the ply onto itself,
+        # only one move of each class of symmetric moves is searched, see
+        # symmetry.get_stabilizer, the caller sets the one of the root
+        identity = tuple(range(n_cells))
+        self.stabilizers = [(identity,)] * (n_cells + 1)
+
+    def add_node(self, ply):
+        stats = self.stats
+        stats.n_nodes += 1
+        if ply > stats.max_ply:
+            stats.max_ply = ply
+        if self.max_nodes is not None and stats.n_nodes > self.max_nodes:
+            raise SearchTimeout()
+        if stats.n_nodes % CHECK_EVERY != 0:
+            return
+        if self.on_check is not None:
+            self.on_check()
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise SearchTimeout()
+
+    def add_cutoff(self, marker, index, depth, ply):
+        killers = self.killers[ply]
+        if killers[0] != index:
+            killers.insert(0, index)
+            killers.pop()
+        # deeper cutoffs prune more so they count more
+        side = zobrist.get_marker_ind(marker)
+        self.history[side][index] += depth * depth
+
+
+# half width of the aspiration window around the previous iteration's 
+# value, it doubles on each failed search
+ASPIRATION_WINDOW = 1
+
+
+def get_root_negamax(state, marker, depth, color, search, prev_utility):
+    """Root search of an iteration. With pvs the search starts with an 
+    aspiration window around the value of the previous iteration and 
+    widens it on the side that the value falls out of.
+    """
+    if not search.pvs or prev_utility is None:
+        return get_negamax(state, marker, depth, -np.inf, np.inf, color, 
+                           True, search)
+
+    window = ASPIRATION_WINDOW
+    alpha = prev_utility - window
+    beta = prev_utility + window
+    while True:
+        result = get_negamax(state, marker, depth, alpha, beta, color, 
+                             True, search)
+        utility = result[0]
+
+        window *= 2
+        if utility <= alpha:
+            alpha = utility - window
+        elif utility >= beta:
+            beta = utility + window
+        else:
+            return result
+
+
+def get_time_limit():
+    return getattr(settings, 'XO_MINIMAX_TIME_LIMIT', TIME_LIMIT)
+
+
+def get_best_move(game, pvs=False, max_depth=None, time_limit=None, max_nodes=None,
+                  on_check=None, threat_search=False):
+    """Iterative deepening until the depth bound, the time_limit in
+    seconds or max_nodes runs out, whichever comes first. Returns the
+    move of the deepest iteration that completed and the SearchStats.
+    on_check is passed on to the SearchContext. With threat_search, a
+    move that the threats decide is played without a search and the
+    leaves are extended by a threat-space search.
+    """
+    start = time.monotonic()
+    if time_limit is None and max_nodes is None:
+        time_limit = get_time_limit()
+    deadline = start + time_limit if time_limit is not None else None
+
+    keys = zobrist.compute_keys(game.board_x, game.board_o, 
+                                game.n_rows, game.n_cols, game.n_connects)
     state = State(
         game.n_rows, game.n_cols, game.n_connects,
-        game.board_x, game.board_o
+        game.board_x, game.board_o, keys
     )
 
     eval_marker = board_utils.get_next_player(game.board_x, game.board_o, game.n_cells)
     color = 1 if eval_marker == board_utils.MARKER_X else -1
-    alpha = -np.inf
-    beta = np.inf
-    # seconds
-    remaining_time = 3
-    # at least 3 steps ahead
     depth = 1
     depth_bound = get_depth_bound(state)
+    if max_depth is not None:
+        depth_bound = min(depth_bound, max_depth)
 
-    info_msg = 'Getting best move for Player {} at {} within {} seconds'
-    info_msg = info_msg.format(eval_marker, game, remaining_time)
+    info_msg = 'Getting best move for Player {} at {} within {} seconds and {} nodes'
+    info_msg = info_msg.format(eval_marker, game, time_limit, max_nodes)
     print(info_msg)
 
-    ttable = TTable()
-
-    it = 1
-    while remaining_time > 0:
-        info_msg = 'Iteration {}: depth: {}, depth bound: {} remaining time: {:.3f}s'
-        info_msg = info_msg.format(it, depth, depth_bound, remaining_time)
-        print(info_msg)
-
-        utility, best_move, flag, remaining_time = get_negamax(
-            state, eval_marker, depth, alpha, beta, color, True, remaining_time, ttable)
-
-        if depth == depth_bound:
+    # warm from the previous moves and games of this worker
+    ttable = get_ttable(game.n_rows, game.n_cols, game.n_connects)
+    ttable.new_search()
+    search = SearchContext(ttable, game.n_cells, pvs, deadline, max_nodes, on_check,
+                           threat_search)
+    search.stabilizers[0] = symmetry.get_stabilizer(game.board_x, game.board_o,
+                                                    game.n_rows, game.n_cols)
+    stats = search.stats
+    search_start = time.monotonic()
+    stats.add_time('setup', search_start - start)
+
+    if threat_search:
+        forced_move = get_forced_move(state, eval_marker, search)
+        stats.add_time('threats', time.monotonic() - search_start)
+        if forced_move is not None:
+            info_msg = 'Minimax move for Player {} is index {} forced by threats'
+            info_msg = info_msg.format(eval_marker, forced_move)
+            print(info_msg)
+            return forced_move, stats
+        search_start = time.monotonic()
+
+    utility, best_move, flag = None, None, None
+    completed_depth = 0
+    while depth <= depth_bound:
+        try:
+            result = get_root_negamax(state, eval_marker, depth, color, search, utility)
+        except SearchTimeout:
             break
 
-        depth = 1 + depth if 1 + depth <= depth_bound else depth_bound
-        it += 1
+        utility, best_move, flag = result
+        completed_depth = depth
+        stats.n_iterations += 1
+        depth += 1
 
-    end = time.time()
-    took = end - start
+    stats.max_depth = completed_depth
+    stats.add_time('search', time.monotonic() - search_start)
 
-    state_utility = color * utility
-    flag_str = board_utils.flag2str(flag)
-    info_msg = 'Minimax move for Player {} is index {} with "{}" value {} at depth {} with remaining time: {:.3f}s'
-    info_msg = info_msg.format(eval_marker, best_move, flag_str, state_utility, depth, remaining_time)
+    if best_move is None:
+        # not even the first iteration completed, take the first move in
+        # the order of the search
+        cache = ttable.get_cache(state)
+        hash_move = cache.move if cache else None
+        empty_indexes = order_moves(get_empty_indexes(state), eval_marker, 
+                                    hash_move, 0, search)
+        best_move = empty_indexes[0]
+
+    if completed_depth > 0:
+        state_utility = color * utility
+        flag_str = board_utils.flag2str(flag)
+        info_msg = 'Minimax move for Player {} is index {} with "{}" value {} at depth {}'
+        info_msg = info_msg.format(eval_marker, best_move, flag_str, state_utility, completed_depth)
+    else:
+        info_msg = 'Minimax move for Player {} is index {} without a completed iteration'
+        info_msg = info_msg.format(eval_marker, best_move)
     print(info_msg)
 
-    return best_move
+    return best_move, stats
 
 
-def is_game_over(state):
+def is_game_over(state, last_index=None):
+    """Only the wins through last_index are checked if the index of the
+    move that led to the state is known.
+    """
+    if last_index is not None:
+        return board_utils.is_game_over_at(
+            state.board_x,
+            state.board_o,
+            last_index,
+            state.n_rows,
+            state.n_cols,
+            state.n_connects
+        )
     is_over = board_utils.is_game_over(
         state.board_x, 
         state.board_o,
@@ -194,70 +346,118 @@ def get_heuristic(state, max_score):
     return max_score
 
 
-def sort_empty_indexes(state, marker, empty_indexes, ttable):
-    to_sort = list()
-    unknown = list()
-    max_score = get_max_score(state.n_rows, state.n_cols)
+def get_boards(state, marker):
+    """Boards of marker and of the opponent.
+    """
+    if marker == board_utils.MARKER_X:
+        return state.board_x, state.board_o
+    return state.board_o, state.board_x
 
-    for index in empty_indexes:
-        child = mark_cell(state, marker, index)
-        # cache = get_cache(child)
-        cache = ttable.get_cache(child)
-        if cache:
-            to_sort.append((index, cache.value, cache.flag))
-        else:
-            # use heuristic
-            heuristic = get_heuristic(child, max_score)
-            to_sort.append((index, heuristic, board_utils.HEURISTIC))
 
-    reverse = True if marker == board_utils.MARKER_X else False
-    flag_key = lambda tuple_: tuple_[2]
-    value_key = lambda tuple_: tuple_[1]
-    to_sort = sorted(to_sort, key=flag_key)
-    to_sort = sorted(to_sort, key=value_key, reverse=reverse)
-    results = list(map(lambda t: t[0], to_sort))
-    return results
+def get_threat_value(state, marker, max_score, search):
+    """Value for marker, the player to move, of a leaf that the threats
+    decide, None otherwise.
+    """
+    own, other = get_boards(state, marker)
+    wins = win_state_utils.get_board_wins(state.n_rows, state.n_cols, state.n_connects)
+    full = (1 << (state.n_rows * state.n_cols)) - 1
+    return threats.get_quiescence(own, other, wins, full, max_score, search)
+
 
+def get_forced_move(state, marker, search):
+    own, other = get_boards(state, marker)
+    wins = win_state_utils.get_board_wins(state.n_rows, state.n_cols, state.n_connects)
+    full = (1 << (state.n_rows * state.n_cols)) - 1
+    return threats.get_forced_move(own, other, wins, full, search)
+
+
+def order_moves(empty_indexes, marker, hash_move, ply, search):
+    """The best move of the transposition table entry, then the killer
+    moves, i.e., the last moves that caused a cutoff at the same ply,
+    and then the rest by their history of cutoffs for the player.
+    """
+    history = search.history[zobrist.get_marker_ind(marker)]
+    ordered = sorted(empty_indexes, key=lambda index: -history[index])
 
-def get_negamax(state, marker, depth, alpha, beta, color, is_root, remaining_time, ttable):
-    time_start = time.time()
+    first = list()
+    if hash_move is not None and hash_move in empty_indexes:
+        first.append(hash_move)
+    for killer in search.killers[ply]:
+        if killer is not None and killer not in first and killer in empty_indexes:
+            first.append(killer)
+
+    if not first:
+        return ordered
+    return first + [index for index in ordered if index not in first]
+
+
+def get_negamax(state, marker, depth, alpha, beta, color, is_root, search, last_index=None, ply=0):
+    """With search.pvs, every child after the first is searched with a 
+    null window around alpha to prove that it is no better, and only the
+    ones that fail high are searched again with the full window.
+
+    Raises SearchTimeout when the budget of the search runs out.
+    """
+    search.add_node(ply)
+    ttable = search.ttable
     flag = board_utils.EXACT
     max_score = get_max_score(state.n_rows, state.n_cols)
     alpha_orig = alpha
 
+    # cache = get_cache(state)
+    cache = ttable.get_cache(state)
+    search.stats.n_tt_probes += 1
+    if cache:
+        search.stats.n_tt_hits += 1
     if not is_root:
-        # cache = get_cache(state)
-        cache = ttable.get_cache(state)
-
         if cache and cache.depth >= depth:
             if cache.flag == board_utils.EXACT:
-                return cache.value, None, flag, remaining_time
+                search.stats.n_tt_cutoffs += 1
+                return cache.value, None, flag
             elif cache.flag == board_utils.LOWER:
                 alpha = max(alpha, cache.value)
             elif cache.flag == board_utils.UPPER:
                 beta = min(beta, cache.value)
 
         if alpha >= beta:
-            return cache.value, None, flag, remaining_time
+            search.stats.n_tt_cutoffs += 1
+            return cache.value, None, flag
 
-    if is_game_over(state):
-        return color * get_utility(state, max_score), None, flag, remaining_time
+    winner = is_game_over(state, last_index)
+    if winner is not None:
+        return color * get_utility(winner, max_score), None, flag
 
     if depth == 0:
+        if search.threat_search:
+            value = get_threat_value(state, marker, max_score, search)
+            if value is not None:
+                return value, None, flag
         flag = board_utils.HEURISTIC
-        return color * get_heuristic(state, max_score), None, flag, remaining_time
+        return color * get_heuristic(state, max_score), None, flag
 
     empty_indexes = get_empty_indexes(state)
-    empty_indexes = sort_empty_indexes(state, marker, empty_indexes, ttable)
+    hash_move = cache.move if cache else None
+    empty_indexes = order_moves(empty_indexes, marker, hash_move, ply, search)
+    stabilizer = search.stabilizers[ply]
+    empty_indexes = symmetry.get_unique_moves(empty_indexes, stabilizer)
     
     best_score = -np.inf
     best_index = None
 
-    for index in empty_indexes:
+    for i, index in enumerate(empty_indexes):
         child = mark_cell(state, marker, index)
+        search.stabilizers[ply + 1] = symmetry.get_child_stabilizer(stabilizer, index)
         next_marker = board_utils.get_opposite_marker(marker)
-        child_result = get_negamax(
-            child, next_marker, depth - 1, -beta, -alpha, -color, False, remaining_time, ttable)
+        if search.pvs and i > 0:
+            child_result = get_negamax(
+                child, next_marker, depth - 1, -alpha - 1, -alpha, -color, False, search, index, ply + 1)
+            child_value = -child_result[0]
+            if alpha < child_value < beta:
+                child_result = get_negamax(
+                    child, next_marker, depth - 1, -beta, -alpha, -color, False, search, index, ply + 1)
+        else:
+            child_result = get_negamax(
+                child, next_marker, depth - 1, -beta, -alpha, -color, False, search, index, ply + 1)
         child_value = -child_result[0]
         child_flag = child_result[2]
         flag = child_flag if child_flag == board_utils.HEURISTIC else flag
@@ -268,11 +468,7 @@ def get_negamax(state, marker, depth, alpha, beta, color, is_root, remaining_tim
 
         alpha = max(alpha, best_score)
         if alpha >= beta:
-            break
-
-        time_check = time.time()
-        took = time_check - time_start
-        if took >= remaining_time:
+            search.add_cutoff(marker, index, depth, ply)
             break
 
     if best_score <= alpha_orig:
@@ -284,11 +480,6 @@ def get_negamax(state, marker, depth, alpha, beta, color, is_root, remaining_tim
 
     # only save non-heuristic values
     # save_cache(state, depth, best_score, flag)
-    ttable.save_cache(state, depth, best_score, flag)
-
-    # update time
-    time_check = time.time()
-    took = time_check - time_start
-    remaining_time -= took
+    ttable.save_cache(state, depth, best_score, flag, best_index)
 
-    return best_score, best_index, flag, remaining_time
+    return best_score, best_index, flag
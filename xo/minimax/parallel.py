@@ -0,0 +1,156 @@
+"""Root-split minimax over the process pool.
+
+Each iteration searches the most promising root move first and, once its
+value is known, the other root moves as separate tasks of the pool. The
+tasks share the best value found so far through pool.shared_bound and
+use it as their alpha bound when they start, which is the Young Brothers
+Wait idea applied to the root only.
+"""
+import time
+import numpy as np
+from concurrent.futures import wait
+from .. import board_utils, pool, symmetry
+from ..stats import SearchStats
+from . import zobrist
+from .minimax import (SearchContext, SearchTimeout, mark_cell, get_negamax,
+                      get_depth_bound, get_time_limit)
+from .transposition_table import State, get_ttable
+
+
+def make_state(n_rows, n_cols, n_connects, board_x, board_o):
+    keys = zobrist.compute_keys(board_x, board_o, n_rows, n_cols, n_connects)
+    return State(n_rows, n_cols, n_connects, board_x, board_o, keys)
+
+
+def search_root_move(config, board_x, board_o, index, depth, pvs, deadline):
+    """Runs in a process of the pool. Returns the index, its value for
+    the player to move, or None if the deadline came first, and the
+    SearchStats of the task.
+    """
+    n_rows, n_cols, n_connects = config
+    n_cells = n_rows * n_cols
+    state = make_state(n_rows, n_cols, n_connects, board_x, board_o)
+    marker = board_utils.get_next_player(board_x, board_o, n_cells)
+    next_marker = board_utils.get_opposite_marker(marker)
+    color = 1 if marker == board_utils.MARKER_X else -1
+
+    ttable = get_ttable(n_rows, n_cols, n_connects)
+    search = SearchContext(ttable, n_cells, pvs, deadline)
+    alpha = pool.shared_bound.value
+    child = mark_cell(state, marker, index)
+    search.stabilizers[1] = symmetry.get_stabilizer(child.board_x, child.board_o,
+                                                    n_rows, n_cols)
+    try:
+        result = get_negamax(child, next_marker, depth - 1, -np.inf, -alpha,
+                             -color, False, search, index, 1)
+    except SearchTimeout:
+        return index, None, search.stats
+
+    value = -result[0]
+    with pool.shared_bound.get_lock():
+        if value > pool.shared_bound.value:
+            pool.shared_bound.value = value
+    return index, value, search.stats
+
+
+def search_root(executor, args, ordered, depth, pvs, deadline, stats):
+    """One iteration, returns the value of each root move or None if the
+    iteration did not complete. The counters of the tasks are added to
+    stats.
+    """
+    pool.shared_bound.value = -np.inf
+    first = executor.submit(search_root_move, *args, ordered[0], depth, pvs, deadline)
+    results = [first.result()]
+    if results[0][1] is None:
+        add_task_stats(stats, results)
+        return None
+
+    futures = [executor.submit(search_root_move, *args, index, depth, pvs, deadline)
+               for index in ordered[1:]]
+    # the tasks stop themselves at the deadline, the ones that have not
+    # started by then are cancelled
+    timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+    done, not_done = wait(futures, timeout=timeout)
+    for future in not_done:
+        future.cancel()
+    wait(not_done)
+    results.extend(future.result() for future in futures if not future.cancelled())
+
+    add_task_stats(stats, results)
+    if len(results) < len(ordered) or any(result[1] is None for result in results):
+        return None
+    values = {index: value for index, value, _ in results}
+    return values
+
+
+def add_task_stats(stats, results):
+    for _, _, task_stats in results:
+        stats.n_nodes += task_stats.n_nodes
+        stats.n_tt_probes += task_stats.n_tt_probes
+        stats.n_tt_hits += task_stats.n_tt_hits
+        stats.n_tt_cutoffs += task_stats.n_tt_cutoffs
+        # the tasks start one ply below the root
+        stats.max_ply = max(stats.max_ply, task_stats.max_ply)
+
+
+def get_best_move(game, pvs=False, max_depth=None, time_limit=None):
+    """Same as minimax.get_best_move with the root moves of each iteration
+    searched in parallel, bounded by time_limit in seconds only. Returns
+    the move and the SearchStats.
+    """
+    start = time.monotonic()
+    if time_limit is None:
+        time_limit = get_time_limit()
+    deadline = start + time_limit
+
+    state = make_state(game.n_rows, game.n_cols, game.n_connects,
+                       game.board_x, game.board_o)
+    eval_marker = board_utils.get_next_player(game.board_x, game.board_o, game.n_cells)
+    depth_bound = get_depth_bound(state)
+    if max_depth is not None:
+        depth_bound = min(depth_bound, max_depth)
+
+    executor = pool.get_pool()
+    config = (game.n_rows, game.n_cols, game.n_connects)
+    args = (config, game.board_x, game.board_o)
+
+    info_msg = 'Getting best move for Player {} at {} within {} seconds on {} workers'
+    info_msg = info_msg.format(eval_marker, game, time_limit, pool.get_n_workers())
+    print(info_msg)
+
+    ordered = board_utils.get_empty_indexes(game.board_x, game.board_o, game.n_cells)
+    # one task per class of symmetric moves
+    stabilizer = symmetry.get_stabilizer(game.board_x, game.board_o, game.n_rows, game.n_cols)
+    ordered = symmetry.get_unique_moves(ordered, stabilizer)
+    values = None
+    best_move = ordered[0]
+    completed_depth = 0
+    stats = SearchStats('parallel_minimax')
+    search_start = time.monotonic()
+    stats.add_time('setup', search_start - start)
+    with pool.search_lock:
+        for depth in range(1, depth_bound + 1):
+            iter_values = search_root(executor, args, ordered, depth, pvs, deadline, stats)
+            if iter_values is None:
+                break
+
+            values = iter_values
+            completed_depth = depth
+            stats.n_iterations += 1
+            # the next iteration starts with the best move so far, the
+            # sort is stable so ties keep their order
+            ordered = sorted(ordered, key=lambda index: -values[index])
+            best_move = ordered[0]
+
+    stats.max_depth = completed_depth
+    stats.add_time('search', time.monotonic() - search_start)
+    if completed_depth > 0:
+        state_utility = values[best_move] if eval_marker == board_utils.MARKER_X else -values[best_move]
+        info_msg = 'Parallel minimax move for Player {} is index {} with value {} at depth {}'
+        info_msg = info_msg.format(eval_marker, best_move, state_utility, completed_depth)
+    else:
+        info_msg = 'Parallel minimax move for Player {} is index {} without a completed iteration'
+        info_msg = info_msg.format(eval_marker, best_move)
+    print(info_msg)
+
+    return best_move, stats
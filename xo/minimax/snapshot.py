@@ -0,0 +1,172 @@
+"""Binary snapshots of transposition tables.
+
+A snapshot file is a fixed size header with the board configuration and
+the layout of the entries followed by the entries as a record array of
+TTABLE_DTYPE sorted by key. Workers map the file read-only, so the pages
+are shared through the page cache, and probe it with a binary search on
+the keys when their own table misses.
+"""
+import os
+import numpy as np
+from django.conf import settings
+from ..utils import make_logger
+from . import transposition_table
+from .transposition_table import TTABLE_DTYPE
+
+
+logger = make_logger('snapshot.py')
+
+
+SNAPSHOT_MAGIC = b'XOTTSNAP'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER_SIZE = 128
+SNAPSHOT_EXT = '.snap'
+SNAPSHOT_HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', np.uint32),
+    ('n_rows', np.uint8),
+    ('n_cols', np.uint8),
+    ('n_connects', np.uint8),
+    ('pad', np.uint8),
+    ('n_entries', np.uint64),
+    ('entry_size', np.uint32),
+    # field names and types of the entries, e.g., "key:<u8,value:<f4,..."
+    ('layout', 'S96'),
+    ('pad_end', 'S4'),
+])
+assert SNAPSHOT_HEADER_DTYPE.itemsize == SNAPSHOT_HEADER_SIZE
+
+
+def get_layout(dtype):
+    layout = ','.join('{}:{}'.format(name, dtype[name].str)
+                      for name in dtype.names)
+    return layout.encode('ascii')
+
+
+def get_snapshot_dir():
+    return getattr(settings, 'XO_TTABLE_SNAPSHOT_DIR', None)
+
+
+def get_snapshot_fname(n_rows, n_cols, n_connects):
+    return 'xo-ttable-{}x{}x{}{}'.format(n_rows, n_cols, n_connects, SNAPSHOT_EXT)
+
+
+def dump_snapshot(ttable, path, n_rows, n_cols, n_connects):
+    """Writes the stored entries of ttable (and of its own snapshot if it
+    has one) to path. Returns the number of entries written.
+    """
+    records = ttable.to_records()
+    if ttable.snapshot is not None:
+        records = np.concatenate([records, np.asarray(ttable.snapshot.records)])
+
+    # sort by key and keep the deepest entry of each key
+    order = np.lexsort((-records['depth'].astype(np.int16), records['key']))
+    records = records[order]
+    is_first = np.ones(len(records), dtype=bool)
+    is_first[1:] = records['key'][1:] != records['key'][:-1]
+    records = records[is_first]
+
+    header = np.zeros(1, dtype=SNAPSHOT_HEADER_DTYPE)
+    header['magic'] = SNAPSHOT_MAGIC
+    header['version'] = SNAPSHOT_VERSION
+    header['n_rows'] = n_rows
+    header['n_cols'] = n_cols
+    header['n_connects'] = n_connects
+    header['n_entries'] = len(records)
+    header['entry_size'] = TTABLE_DTYPE.itemsize
+    header['layout'] = get_layout(TTABLE_DTYPE)
+
+    # write to a temporary file first so that workers never map a half
+    # written snapshot
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(records.tobytes())
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class TTableSnapshot:
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=SNAPSHOT_HEADER_DTYPE, count=1)
+        if len(header) == 0 or header['magic'][0] != SNAPSHOT_MAGIC:
+            err_msg = 'Not a transposition table snapshot: {}'.format(path)
+            raise ValueError(err_msg)
+
+        header = header[0]
+        is_valid = header['version'] == SNAPSHOT_VERSION
+        is_valid = is_valid and header['entry_size'] == TTABLE_DTYPE.itemsize
+        is_valid = is_valid and header['layout'] == get_layout(TTABLE_DTYPE)
+        if not is_valid:
+            err_msg = 'Snapshot {} has version {} and layout "{}"'
+            err_msg = err_msg.format(path, header['version'], header['layout'])
+            raise ValueError(err_msg)
+
+        self.n_rows = int(header['n_rows'])
+        self.n_cols = int(header['n_cols'])
+        self.n_connects = int(header['n_connects'])
+        self.n_entries = int(header['n_entries'])
+
+        if self.n_entries > 0:
+            self.records = np.memmap(path, dtype=TTABLE_DTYPE, mode='r',
+                                     offset=SNAPSHOT_HEADER_SIZE,
+                                     shape=(self.n_entries,))
+        else:
+            self.records = np.zeros(0, dtype=TTABLE_DTYPE)
+        self.keys = self.records['key']
+
+    def __repr__(self):
+        repr_ = '{}("{}", ({}, {}, {}), {} entries)'
+        repr_ = repr_.format(TTableSnapshot.__name__, self.path,
+                             self.n_rows, self.n_cols, self.n_connects,
+                             self.n_entries)
+        return repr_
+
+    @property
+    def config(self):
+        return self.n_rows, self.n_cols, self.n_connects
+
+    def get_entry(self, key):
+        """Returns the (depth, flag, value, move) of key or None.
+        """
+        key = np.uint64(key)
+        i = int(np.searchsorted(self.keys, key))
+        if i == self.n_entries or self.keys[i] != key:
+            return None
+        record = self.records[i]
+        return (int(record['depth']), int(record['flag']),
+                float(record['value']), int(record['move']))
+
+
+def load_snapshots(snapshot_dir=None):
+    """Maps all the snapshots in snapshot_dir, the XO_TTABLE_SNAPSHOT_DIR
+    setting by default, and attaches them to the transposition tables of
+    their board configuration. Called once at worker start.
+    """
+    if snapshot_dir is None:
+        snapshot_dir = get_snapshot_dir()
+    if snapshot_dir is None or not os.path.isdir(snapshot_dir):
+        return []
+
+    snapshots = list()
+    for fname in sorted(os.listdir(snapshot_dir)):
+        if not fname.endswith(SNAPSHOT_EXT):
+            continue
+        path = os.path.join(snapshot_dir, fname)
+        try:
+            snapshot = TTableSnapshot(path)
+        except ValueError as e:
+            logger.error(str(e))
+            continue
+
+        config = snapshot.config
+        transposition_table.snapshot_registry[config] = snapshot
+        ttable = transposition_table.ttable_registry.get(config, None)
+        if ttable is not None:
+            ttable.snapshot = snapshot
+        snapshots.append(snapshot)
+
+        info_msg = 'Loaded {}'.format(snapshot)
+        logger.info(info_msg)
+    return snapshots
@@ -0,0 +1,110 @@
+"""Threat-space search, i.e., victory by continuous fours (VCF).
+
+A four is a line that a player can complete with their next move, the
+name comes from gomoku where n_connects is 5. The search only follows
+the attacker's moves that make a four and the defender's forced replies,
+i.e., the block of that four, so its branching factor is the handful of
+cells that turn a line of n_connects - 2 into a four rather than all the
+empty cells. An attacker move that makes two fours at once wins since
+only one of them can be blocked.
+
+Every position of a sequence is checked for a four of the defender
+first, the attacker has to block it and a sequence that lets the
+defender complete a line fails. So a VCF is a proven win, but a position
+without one can still be won by quieter moves.
+
+The boards are the bitboards of the attacker and of the defender.
+"""
+
+
+# attacker moves of the sequences of the quiescence search at the leaves,
+# the root pre-check looks until the board is full
+QUIESCENCE_DEPTH = 4
+
+
+def get_threat_cells(own, other, wins):
+    """The empty cells that complete a line of own, i.e., its fours, and
+    the empty cells on the open lines that own is two short of.
+    """
+    fours = 0
+    threes = 0
+    for win in wins:
+        if other & win:
+            continue
+        rest = win & ~own
+        if rest == 0:
+            continue
+        rest_rest = rest & (rest - 1)
+        if rest_rest == 0:
+            fours |= rest
+        elif rest_rest & (rest_rest - 1) == 0:
+            threes |= rest
+    return fours, threes
+
+
+def find_vcf(own, other, wins, full, depth, search=None):
+    """Index of the first move of a VCF of own, with up to depth attacker
+    moves, or None if there is none.
+    """
+    if search is not None:
+        search.stats.n_threat_nodes += 1
+    fours, threes = get_threat_cells(own, other, wins)
+    if fours:
+        return (fours & -fours).bit_length() - 1
+    if depth == 0:
+        return None
+
+    empties = ~(own | other) & full
+    threes &= empties
+    while threes:
+        flag = threes & -threes
+        threes ^= flag
+        own_next = own | flag
+        other_fours, _ = get_threat_cells(other, own_next, wins)
+        if other_fours:
+            # the defender completes a line first
+            continue
+
+        new_fours, _ = get_threat_cells(own_next, other, wins)
+        if new_fours & (new_fours - 1):
+            return flag.bit_length() - 1
+        if new_fours and (own_next | other | new_fours) != full:
+            if find_vcf(own_next, other | new_fours, wins, full, depth - 1, search) is not None:
+                return flag.bit_length() - 1
+    return None
+
+
+def get_quiescence(own, other, wins, full, max_score, search=None):
+    """Value for own, the player to move, of a position at the horizon
+    if the threats decide it, None otherwise.
+    """
+    move = find_vcf(own, other, wins, full, QUIESCENCE_DEPTH, search)
+    if move is not None:
+        return max_score
+
+    other_fours, _ = get_threat_cells(other, own, wins)
+    if other_fours & (other_fours - 1):
+        # two fours of the opponent and none of own, only one can be
+        # blocked
+        return -max_score
+    return None
+
+
+def get_forced_move(own, other, wins, full, search=None):
+    """Move of own, the player to move, that the threats decide, i.e., a
+    win, the block of the only four of the opponent or the first move of
+    a VCF, None if there is none.
+    """
+    fours, _ = get_threat_cells(own, other, wins)
+    if fours:
+        return (fours & -fours).bit_length() - 1
+
+    other_fours, _ = get_threat_cells(other, own, wins)
+    if other_fours:
+        if other_fours & (other_fours - 1):
+            # lost anyway, leave it to the search
+            return None
+        return other_fours.bit_length() - 1
+
+    depth = bin(~(own | other) & full).count('1')
+    return find_vcf(own, other, wins, full, depth, search)
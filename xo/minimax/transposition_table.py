@@ -1,5 +1,8 @@
-from .. import board_utils
+import os, tempfile
+from django.conf import settings
+from .. import board_utils, symmetry
 from ..utils import make_logger
+from . import zobrist
 import numpy as np
 from collections import namedtuple
 
@@ -7,15 +10,17 @@ from collections import namedtuple
 logger = make_logger('transposition_table.py')
 
 
+# default capacity of a table, the XO_TTABLE_SIZE_MB setting caps the 
+# table of each board configuration
+TTABLE_SIZE_MB = 16
+
+
 field_names = [
-    'board_x',
-    'board_o',
-    'n_rows',
-    'n_cols',
-    'n_connects',
+    'key',
     'depth',
     'flag',
-    'value'
+    'value',
+    'move',
 ]
 Cache = namedtuple('Cache', field_names)
 
@@ -26,86 +31,436 @@ field_names = [
     'n_connects',
     'board_x',
     'board_o',
+    # zobrist keys of the board per symmetry, carried forward by mark_cell
+    'keys',
 ]
-State = namedtuple('State', field_names)
+State = namedtuple('State', field_names, defaults=(None,))
+
+
+# 16 bytes per entry, empty entries have depth -1 since 0 is a valid key
+TTABLE_DTYPE = np.dtype([
+    ('key', np.uint64),
+    ('value', np.float32),
+    ('depth', np.int8),
+    ('flag', np.uint8),
+    ('move', np.int8),
+    ('generation', np.uint8),
+])
+EMPTY_DEPTH = -1
+NO_MOVE = -1
 
 
-def addition_hash(arr, sz):
-    # taken from: https://stackoverflow.com/questions/19854564/hash-integer-array
-    hash_ = 17
-    for i in range(sz):
-        v = arr[i]
-        hash_ = (hash_ * 19) + ord(v)
-    return hash_
+def get_state_keys(state):
+    keys = state.keys
+    if keys is None:
+        keys = zobrist.compute_keys(state.board_x, state.board_o,
+                                    state.n_rows, state.n_cols, 
+                                    state.n_connects)
+    return keys
 
 
-def hash_state(state):
-    n_cells = state.n_rows * state.n_cols
-    board_x = state.board_x
-    board_o = state.board_o
+def get_state_key(state):
+    return zobrist.get_key(get_state_keys(state))
 
-    board_str = board_utils.get_board_str(board_x, board_o, n_cells)
-    hash_ = addition_hash(board_str, n_cells)
-    return hash_
+
+def to_canonical_move(state, keys, move):
+    """Moves are stored as seen from the symmetry with the smallest key
+    since the entry is shared by all the symmetric positions.
+    """
+    if move is None:
+        return NO_MOVE
+    sym_ind = keys.index(zobrist.get_key(keys))
+    _, permutation, _ = symmetry.get_symmetries(state.n_rows, state.n_cols)[sym_ind]
+    return permutation[move]
+
+
+def from_canonical_move(state, keys, move):
+    if move == NO_MOVE:
+        return None
+    sym_ind = keys.index(zobrist.get_key(keys))
+    transform, _, _ = symmetry.get_symmetries(state.n_rows, state.n_cols)[sym_ind]
+    inverse = symmetry.get_inverse(transform)
+    return symmetry.transform_index(move, inverse, state.n_rows, state.n_cols)
+
+
+def get_n_buckets(size_mb):
+    """Largest power of two number of buckets of two entries that fits
+    in size_mb.
+    """
+    n_entries = int(size_mb * (1 << 20)) // TTABLE_DTYPE.itemsize
+    n_buckets = 1
+    while n_buckets * 4 <= n_entries:
+        n_buckets *= 2
+    return n_buckets
 
 
 class TTable:
-    def __init__(self):
-        self.table = dict()
-
-    def __get_cache(self, state):
-        hash_ = hash_state(state)
-        res = None
-        if hash_ in self.table:
-            res = self.table[hash_]
-            # check if it is in fact the state
-            same_board_x = res.board_x == state.board_x
-            same_board_o = res.board_o == state.board_o
-            if not same_board_x or not same_board_o:
-                res = None
-        return res
+    """Fixed capacity table with open addressing over a preallocated array
+    of buckets of two entries. The first entry of a bucket prefers deeper
+    searches and the second one is always replaced, so a deep result does
+    not get pushed out by the many shallow ones near the leaves.
+
+    Stores one entry per symmetry class, i.e., positions are stored and 
+    probed by the smallest of their per symmetry zobrist keys so that
+    all the symmetric positions share the same entry.
+    """
+    def __init__(self, size_mb=TTABLE_SIZE_MB):
+        self.n_buckets = get_n_buckets(size_mb)
+        self.bucket_mask = self.n_buckets - 1
+        self.table = np.zeros(2 * self.n_buckets, dtype=TTABLE_DTYPE)
+        self.table['depth'] = EMPTY_DEPTH
+        # field views for faster item access
+        self.keys = self.table['key']
+        self.values = self.table['value']
+        self.depths = self.table['depth']
+        self.flags = self.table['flag']
+        self.moves = self.table['move']
+        self.generations = self.table['generation']
+        # number of stores that replaced the entry of a different position
+        self.n_collisions = 0
+        # entries from earlier searches are replaced first
+        self.generation = 0
+        # read-only snapshot that is probed on a miss
+        self.snapshot = None
+
+    def __repr__(self):
+        repr_ = '{}({} buckets, {:.1f}MB)'
+        repr_ = repr_.format(TTable.__name__, self.n_buckets, self.size_mb)
+        return repr_
+
+    @property
+    def size_mb(self):
+        return self.table.nbytes / (1 << 20)
+
+    @property
+    def n_stored(self):
+        return int(np.count_nonzero(self.depths != EMPTY_DEPTH))
+
+    def find(self, key):
+        """Returns the index of the entry with key or None.
+        """
+        ind = 2 * (key & self.bucket_mask)
+        for i in (ind, ind + 1):
+            if self.keys[i] == key and self.depths[i] != EMPTY_DEPTH:
+                return i
+        return None
+
+    def read_slot(self, i):
+        """Returns the (key, depth, generation) of the entry at index i or
+        None if it is empty.
+        """
+        if self.depths[i] == EMPTY_DEPTH:
+            return None
+        return self.keys[i], self.depths[i], self.generations[i]
+
+    def read_entry(self, i):
+        """Returns the (depth, flag, value, move) of the entry at index i.
+        """
+        return (int(self.depths[i]), int(self.flags[i]), 
+                float(self.values[i]), int(self.moves[i]))
+
+    def write_slot(self, i, key, value, depth, flag, move):
+        self.keys[i] = key
+        self.values[i] = value
+        self.depths[i] = depth
+        self.flags[i] = flag
+        self.moves[i] = move
+        self.generations[i] = self.generation
+
+    def copy_slot(self, src, dst):
+        self.table[dst] = self.table[src]
+
+    def clear_slot(self, i):
+        self.depths[i] = EMPTY_DEPTH
+
+    def probe(self, key):
+        """Returns the (depth, flag, value, move) of key or None, the move
+        is as stored, i.e., in the orientation of the canonical position.
+        """
+        i = self.find(key)
+        if i is not None:
+            return self.read_entry(i)
+        elif self.snapshot is not None:
+            return self.snapshot.get_entry(key)
+        return None
 
     def get_cache(self, state):
-        res = self.__get_cache(state)
-        board_x = state.board_x
-        board_o = state.board_o
-        n_rows = state.n_rows
-        n_cols = state.n_cols
-        n_connects = state.n_connects
-        if not res:
-            # try reflecting the board on x axis
-            board_x_r = board_utils.reflect_x(board_x, n_rows, n_cols)
-            board_o_r = board_utils.reflect_x(board_o, n_rows, n_cols)
-            reflected = State(n_rows, n_cols, n_connects, board_x_r, board_o_r)
-            res = self.__get_cache(reflected)
-            # if not None, change it back to original board
-            if res:
-                # info_msg = 'Found cache via reflection on x axis'
-                # logger.info(info_msg)
-                res = Cache(board_x, board_o, n_rows, n_cols, n_connects, res.depth, res.flag, res.value)
-
-        if not res:
-            # try reflecting the board on y axis
-            board_x_r = board_utils.reflect_y(board_x, n_rows, n_cols)
-            board_o_r = board_utils.reflect_y(board_o, n_rows, n_cols)
-            reflected = State(n_rows, n_cols, n_connects, board_x_r, board_o_r)
-            res = self.__get_cache(reflected)
-            # if not None, change it back to original board
-            if res:
-                # info_msg = 'Found cache via reflection on y axis'
-                # logger.info(info_msg)
-                res = Cache(board_x, board_o, n_rows, n_cols, n_connects, res.depth, res.flag, res.value)
-
-        return res
-
-    def save_cache(self, state, depth, utility, flag):
-        cache = Cache(
-            state.board_x,
-            state.board_o,
-            state.n_rows,
-            state.n_cols,
-            state.n_connects,
-            depth, flag, utility
-        )
-        hash_ = hash_state(state)
-        self.table[hash_] = cache
+        keys = get_state_keys(state)
+        key = zobrist.get_key(keys)
+        entry = self.probe(key)
+        if entry is None:
+            return None
+        depth, flag, value, move = entry
+        move = from_canonical_move(state, keys, move)
+        return Cache(key, depth, flag, value, move)
+
+    def save_cache(self, state, depth, utility, flag, move=None):
+        keys = get_state_keys(state)
+        key = zobrist.get_key(keys)
+        move = to_canonical_move(state, keys, move)
+        self.store(key, depth, utility, flag, move)
+
+    def store(self, key, depth, utility, flag, move=NO_MOVE):
+        """Same as save_cache for a key and a canonical move.
+        """
+        ind = 2 * (key & self.bucket_mask)
+        slot = self.read_slot(ind)
+        slot_next = self.read_slot(ind + 1)
+        is_other = slot is not None and slot[0] != key
+        is_other_next = slot_next is not None and slot_next[0] != key
+
+        if is_other and depth < slot[1] and slot[2] == self.generation:
+            # keep the deeper entry and use the always-replace entry
+            i = ind + 1
+            if is_other_next:
+                self.n_collisions += 1
+        else:
+            i = ind
+            if is_other:
+                # the replaced entry moves to the always-replace entry
+                if is_other_next:
+                    self.n_collisions += 1
+                self.copy_slot(ind, ind + 1)
+            elif slot_next is not None and not is_other_next:
+                # drop the older copy of the same position
+                self.clear_slot(ind + 1)
+
+        self.write_slot(i, key, utility, depth, flag, move)
+
+    def to_records(self):
+        """Returns a copy of the stored entries.
+        """
+        return self.table[self.depths != EMPTY_DEPTH].copy()
+
+    def new_search(self):
+        """Ages the entries of the previous searches so that they are the
+        first to go, they are still used while they stay in the table.
+        """
+        self.generation = (self.generation + 1) % 256
+
+    def clear(self):
+        self.depths[:] = EMPTY_DEPTH
+        self.n_collisions = 0
+
+
+# 16 bytes per entry, the data packs the depth, flag, move, generation
+# and value of the entry and the check is key ^ data
+SHARED_TTABLE_DTYPE = np.dtype([
+    ('check', np.uint64),
+    ('data', np.uint64),
+])
+SHARED_TTABLE_MAGIC = 0x78_6f_74_74_61_62_6c_65
+SHARED_TTABLE_HEADER_SIZE = 16
+
+
+def pack_data(value, depth, flag, move, generation):
+    """Packs the entry into 64 bits, depth is stored plus one so that only
+    empty entries have data 0.
+    """
+    data = (depth + 1) & 0xff
+    data |= (flag & 0xff) << 8
+    data |= ((move + 1) & 0xff) << 16
+    data |= (generation & 0xff) << 24
+    data |= (int(value) & 0xffffffff) << 32
+    return data
+
+
+def unpack_data(data):
+    depth = (data & 0xff) - 1
+    flag = (data >> 8) & 0xff
+    move = ((data >> 16) & 0xff) - 1
+    generation = (data >> 24) & 0xff
+    value = data >> 32
+    if value >= 1 << 31:
+        value -= 1 << 32
+    return value, depth, flag, move, generation
+
+
+class SharedTTable(TTable):
+    """Same as TTable but over a memory-mapped file so that all the 
+    workers on a host probe and store into the same table.
+
+    Entries are written without locks. Each one stores key ^ data next to
+    its data, so an entry that was torn by two concurrent writes fails 
+    the check on probe and is treated as a miss rather than returning 
+    the data of some other position. The values are stored as integers.
+    """
+    def __init__(self, path, size_mb=TTABLE_SIZE_MB):
+        self.path = path
+        self.n_buckets = get_n_buckets(size_mb)
+        self.bucket_mask = self.n_buckets - 1
+        n_entries = 2 * self.n_buckets
+        nbytes = SHARED_TTABLE_HEADER_SIZE + n_entries * SHARED_TTABLE_DTYPE.itemsize
+
+        # every worker sizes the file the same way so it does not matter
+        # which one gets here first
+        with open(path, 'a+b') as f:
+            f.seek(0, 2)
+            if f.tell() != nbytes:
+                f.truncate(nbytes)
+
+        # header of the magic number and the shared generation
+        self.header = np.memmap(path, dtype=np.uint64, mode='r+', shape=(2,))
+        if self.header[0] != SHARED_TTABLE_MAGIC:
+            self.header[1] = 0
+            self.header[0] = SHARED_TTABLE_MAGIC
+        self.table = np.memmap(path, dtype=SHARED_TTABLE_DTYPE, mode='r+',
+                               offset=SHARED_TTABLE_HEADER_SIZE, 
+                               shape=(n_entries,))
+        self.checks = self.table['check']
+        self.datas = self.table['data']
+        self.n_collisions = 0
+        self.snapshot = None
+
+    def __repr__(self):
+        repr_ = '{}("{}", {} buckets, {:.1f}MB)'
+        repr_ = repr_.format(SharedTTable.__name__, self.path, 
+                             self.n_buckets, self.size_mb)
+        return repr_
+
+    @property
+    def generation(self):
+        return int(self.header[1]) & 0xff
+
+    @property
+    def n_stored(self):
+        return int(np.count_nonzero(self.datas))
+
+    def find(self, key):
+        ind = 2 * (key & self.bucket_mask)
+        for i in (ind, ind + 1):
+            data = int(self.datas[i])
+            if data and int(self.checks[i]) ^ data == key:
+                return i
+        return None
+
+    def read_slot(self, i):
+        data = int(self.datas[i])
+        if data == 0:
+            return None
+        key = int(self.checks[i]) ^ data
+        _, depth, _, _, generation = unpack_data(data)
+        return key, depth, generation
+
+    def read_entry(self, i):
+        value, depth, flag, move, _ = unpack_data(int(self.datas[i]))
+        return depth, flag, value, move
+
+    def probe(self, key):
+        # find then read_entry would read the data twice, and a write in
+        # between would return the data of another position, so the check
+        # and the data are read once and the data that passed is unpacked
+        ind = 2 * (key & self.bucket_mask)
+        for i in (ind, ind + 1):
+            check = int(self.checks[i])
+            data = int(self.datas[i])
+            if data and check ^ data == key:
+                value, depth, flag, move, _ = unpack_data(data)
+                return depth, flag, value, move
+        if self.snapshot is not None:
+            return self.snapshot.get_entry(key)
+        return None
+
+    def write_slot(self, i, key, value, depth, flag, move):
+        data = pack_data(value, depth, flag, move, self.generation)
+        self.datas[i] = data
+        self.checks[i] = key ^ data
+
+    def copy_slot(self, src, dst):
+        data = self.datas[src]
+        check = self.checks[src]
+        self.datas[dst] = data
+        self.checks[dst] = check
+
+    def clear_slot(self, i):
+        self.datas[i] = 0
+        self.checks[i] = 0
+
+    def to_records(self):
+        datas = self.datas[self.datas != 0]
+        checks = self.checks[self.datas != 0]
+        records = np.zeros(len(datas), dtype=TTABLE_DTYPE)
+        records['key'] = checks ^ datas
+        records['depth'] = (datas & 0xff).astype(np.int16) - 1
+        records['flag'] = (datas >> np.uint64(8)) & 0xff
+        records['move'] = ((datas >> np.uint64(16)) & 0xff).astype(np.int16) - 1
+        records['generation'] = (datas >> np.uint64(24)) & 0xff
+        records['value'] = (datas >> np.uint64(32)).astype(np.uint32).view(np.int32)
+        return records
+
+    def new_search(self):
+        # the generation is shared, a lost update from a concurrent search
+        # only means that the two searches share a generation
+        self.header[1] = (int(self.header[1]) + 1) % 256
+
+    def clear(self):
+        self.table[:] = 0
+        self.n_collisions = 0
+
+
+# process-wide tables keyed by (n_rows, n_cols, n_connects), and the
+# evaluation for the evaluations other than that of minimax, that live
+# across moves and games of the worker
+ttable_registry = dict()
+# read-only snapshots keyed by (n_rows, n_cols, n_connects) that are
+# attached to the tables, see snapshot.load_snapshots
+snapshot_registry = dict()
+
+
+def get_ttable_size_mb(n_rows, n_cols, n_connects):
+    """The table of a configuration never needs more entries than there 
+    are boards, e.g., 3^9 for 3x3, otherwise it gets the capped size.
+    """
+    size_mb = getattr(settings, 'XO_TTABLE_SIZE_MB', TTABLE_SIZE_MB)
+    n_cells = n_rows * n_cols
+    max_size_mb = 3 ** n_cells * TTABLE_DTYPE.itemsize / (1 << 20)
+    return min(size_mb, max_size_mb)
+
+
+def get_shared_ttable_path(n_rows, n_cols, n_connects):
+    shared_dir = getattr(settings, 'XO_TTABLE_SHARED_DIR', None)
+    if shared_dir is None:
+        shared_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    fname = 'xo-ttable-{}x{}x{}.bin'.format(n_rows, n_cols, n_connects)
+    return os.path.join(shared_dir, fname)
+
+
+def make_ttable(n_rows, n_cols, n_connects, evaluation=None):
+    """Makes the table of the XO_TTABLE_BACKEND setting, either 'local' 
+    to the worker or 'shared' by all the workers of the host. The shared
+    table stores integer values, so the tables of the other evaluations
+    are always local.
+    """
+    size_mb = get_ttable_size_mb(n_rows, n_cols, n_connects)
+    backend = getattr(settings, 'XO_TTABLE_BACKEND', 'local')
+    if backend == 'local' or (backend == 'shared' and evaluation is not None):
+        return TTable(size_mb)
+    elif backend == 'shared':
+        path = get_shared_ttable_path(n_rows, n_cols, n_connects)
+        return SharedTTable(path, size_mb)
+    err_msg = 'Do not recognize transposition table backend {}'
+    err_msg = err_msg.format(backend)
+    raise ValueError(err_msg)
+
+
+def get_ttable(n_rows, n_cols, n_connects, evaluation=None):
+    """The table of the configuration for the evaluation of
+    minimax.get_heuristic, or for another evaluation of
+    minimax.evaluator, whose values are on another scale and so never
+    share a table with it.
+    """
+    key = (n_rows, n_cols, n_connects)
+    if evaluation is not None:
+        key += (evaluation,)
+    ttable = ttable_registry.get(key, None)
+    if ttable is None:
+        ttable = make_ttable(n_rows, n_cols, n_connects, evaluation)
+        # the snapshots hold values of minimax.get_heuristic
+        if evaluation is None:
+            ttable.snapshot = snapshot_registry.get(key, None)
+        ttable = ttable_registry.setdefault(key, ttable)
+
+        info_msg = 'Created {} for {}'
+        info_msg = info_msg.format(ttable, key)
+        logger.info(info_msg)
+    return ttable
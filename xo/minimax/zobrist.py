@@ -0,0 +1,94 @@
+"""Zobrist keys for the transposition table.
+
+Each (cell, marker) of a board configuration gets a random 64 bit number
+and the key of a board is the XOR of the numbers of its marked cells, so
+marking a cell updates the key with a single XOR.
+
+To keep one entry per symmetry class, a state carries one key per board
+symmetry, i.e., the key of the board as seen through that transform, and
+the table uses the smallest of them. Symmetric positions have the same
+set of keys and so the same smallest key.
+"""
+import random
+from .. import board_utils, symmetry
+
+
+ZOBRIST_SEED = 123
+
+
+# process-wide zobrist tables keyed by (n_rows, n_cols, n_connects)
+zobrist_registry = dict()
+
+
+def compute_zobrist(n_rows, n_cols, seed=ZOBRIST_SEED):
+    """Returns the per symmetry deltas of each (marker, cell), i.e., the
+    item [marker_ind][index] is the tuple with the number to XOR into the
+    key of each symmetry when the cell at index is marked.
+    """
+    rng = random.Random(seed)
+    n_cells = n_rows * n_cols
+    numbers = [
+        [rng.getrandbits(64) for _ in range(n_cells)]
+        for _ in (board_utils.MARKER_X, board_utils.MARKER_O)
+    ]
+    symmetries = symmetry.get_symmetries(n_rows, n_cols)
+
+    deltas = list()
+    for marker_numbers in numbers:
+        marker_deltas = list()
+        for index in range(n_cells):
+            delta = tuple(marker_numbers[permutation[index]]
+                          for _, permutation, _ in symmetries)
+            marker_deltas.append(delta)
+        deltas.append(tuple(marker_deltas))
+    return tuple(deltas)
+
+
+def get_zobrist(n_rows, n_cols, n_connects):
+    key = (n_rows, n_cols, n_connects)
+    deltas = zobrist_registry.get(key, None)
+    if deltas is None:
+        deltas = compute_zobrist(n_rows, n_cols)
+        deltas = zobrist_registry.setdefault(key, deltas)
+    return deltas
+
+
+def get_marker_ind(marker):
+    if marker == board_utils.MARKER_X:
+        return 0
+    elif marker == board_utils.MARKER_O:
+        return 1
+    err_msg = 'Do not recognize marker {}'.format(marker)
+    raise ValueError(err_msg)
+
+
+def update_keys(keys, index, marker, n_rows, n_cols, n_connects):
+    """Keys after marking the cell at index with marker, unmarking the
+    cell is the same update.
+    """
+    deltas = get_zobrist(n_rows, n_cols, n_connects)
+    delta = deltas[get_marker_ind(marker)][index]
+    return tuple(key ^ d for key, d in zip(keys, delta))
+
+
+def compute_keys(board_x, board_o, n_rows, n_cols, n_connects):
+    """Keys of a board from scratch, only needed at the root of a search.
+    """
+    n_syms = len(symmetry.get_transforms(n_rows, n_cols))
+    keys = (0,) * n_syms
+    n_cells = n_rows * n_cols
+    for index in range(n_cells):
+        flag = 1 << index
+        if board_x & flag:
+            keys = update_keys(keys, index, board_utils.MARKER_X,
+                               n_rows, n_cols, n_connects)
+        elif board_o & flag:
+            keys = update_keys(keys, index, board_utils.MARKER_O,
+                               n_rows, n_cols, n_connects)
+    return keys
+
+
+def get_key(keys):
+    """The key of the symmetry class.
+    """
+    return min(keys)
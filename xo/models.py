@@ -144,11 +144,12 @@ class Game(models.Model):
             player_obj = get_player(player)
             self.play(player_obj.play(self))
         else:
-            while not self.is_game_over:
+            result = None
+            while result is None:
                 next_player = self.next_player
                 player = self.player_x if next_player  == MARKER_X else self.player_o
                 player_obj = get_player(player)
-                self.play(player_obj.play(self))
+                result = self.play(player_obj.play(self))
 
     def play_next_auto(self):
         # play next auto move if possible
@@ -168,6 +169,8 @@ class Game(models.Model):
         # logger.info(info_msg)
         index = player_obj.play(self)
         self.play(index)
+        # counters of the engine for the debug output, not saved
+        self.search_stats = getattr(player_obj, 'stats', None)
 
         row_ind = index // self.n_cols
         col_ind = index % self.n_cols
@@ -181,7 +184,7 @@ class Game(models.Model):
 
     def play_xy(self, row_ind, col_ind):
         index = row_ind * self.n_cols + col_ind
-        self.play(index)
+        return self.play(index)
 
     def play(self, index):
         info_msg = 'Player {} playing index {} at game {}'
@@ -203,6 +206,11 @@ class Game(models.Model):
         else:
             self.add_circle(index)
 
+        # the move can only end the game through its own cell
+        return board_utils.is_game_over_at(
+            self.board_x, self.board_o, index, 
+            self.n_rows, self.n_cols, self.n_connects)
+
 
 class BoardState(models.Model):
     """All the board state is cached with their utility value assuming that it is at a max layer
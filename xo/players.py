@@ -1,7 +1,10 @@
 import random
 
 from django.utils.module_loading import import_string
-from . import minimax, mcts
+from . import minimax, mcts, tablebase, stats, ponder
+from .mcts import tree, rollouts
+from .mcts import parallel as mcts_parallel
+from .minimax import parallel, bitboard, evaluator
 
 
 def get_player(player_type):
@@ -20,18 +23,112 @@ class RandomPlayer:
         return random.choice(empty_indexes)
 
 
+def record_stats(player, stats_):
+    """Keeps the SearchStats of the last move on the player and adds them
+    to the running totals of the engine.
+    """
+    player.stats = stats_
+    if stats_ is not None:
+        stats.record(stats_)
+
+
 class MinimaxPlayer:
+    # principal variation search with aspiration windows
+    pvs = False
+    # budget per move, seconds and searched nodes, the XO_MINIMAX_TIME_LIMIT
+    # setting if both are None
+    time_limit = None
+    max_nodes = None
+    # root moves searched over the process pool, time_limit only
+    parallel = False
+    # the negamax on plain integers, same moves and faster, and its
+    # evaluation, see minimax.evaluator
+    bitboard = False
+    evaluation = evaluator.MAX_LINE
+    # forced moves and threat-space quiescence, see minimax.threats
+    threat_search = False
+
+    def __init__(self):
+        # of the last move
+        self.stats = None
+
     def __repr__(self):
-        return MinimaxPlayer.__name__
+        return type(self).__name__
+
+    @property
+    def can_ponder(self):
+        # the pool is for the live searches
+        return not self.parallel
+
+    def search(self, game, time_limit=None, on_check=None):
+        """Move and SearchStats of the engine of the player, time_limit
+        defaults to the player's own and on_check is passed on to the
+        SearchContext, see ponder.
+        """
+        if time_limit is None:
+            time_limit = self.time_limit
+        if self.parallel:
+            return parallel.get_best_move(game, pvs=self.pvs, time_limit=time_limit)
+        elif self.bitboard:
+            return bitboard.get_best_move(game, pvs=self.pvs, 
+                                          time_limit=time_limit,
+                                          max_nodes=self.max_nodes,
+                                          evaluation=self.evaluation,
+                                          on_check=on_check,
+                                          threat_search=self.threat_search)
+        return minimax.get_best_move(game, pvs=self.pvs, 
+                                     time_limit=time_limit,
+                                     max_nodes=self.max_nodes,
+                                     on_check=on_check,
+                                     threat_search=self.threat_search)
 
     def play(self, game):
         empty_indexes = game.empty_indexes
         if not empty_indexes:
             return
-        return minimax.get_best_move(game)
+        index, stats_ = tablebase.get_best_move(game)
+        if index is None:
+            # pondering writes the same tables
+            with ponder.live_search():
+                index, stats_ = self.search(game)
+        record_stats(self, stats_)
+        return index
+
+
+class PVSMinimaxPlayer(MinimaxPlayer):
+    pvs = True
+
+
+class ParallelMinimaxPlayer(MinimaxPlayer):
+    parallel = True
+
+
+class BitboardMinimaxPlayer(MinimaxPlayer):
+    bitboard = True
+
+
+class OpenLinesMinimaxPlayer(BitboardMinimaxPlayer):
+    evaluation = evaluator.OPEN_LINES
+
+
+class ThreatSpaceMinimaxPlayer(BitboardMinimaxPlayer):
+    threat_search = True
 
 
 class MCTSPlayer:
+    # no tree is kept from one move to the next to ponder into
+    can_ponder = False
+    # the tree on flat arrays, see mcts.tree
+    compact = False
+    # one compact tree per process of the pool, see mcts.parallel
+    parallel = False
+    # rollouts per selected leaf, see mcts.rollouts
+    batch_size = 1
+
+    def __init__(self):
+        # of the last move
+        self.stats = None
+
     def __repr__(self):
         return MCTSPlayer.__name__
 
@@ -39,4 +136,25 @@ class MCTSPlayer:
         empty_indexes = game.empty_indexes
         if not empty_indexes:
             return
-        return mcts.get_best_move(game)
+        index, stats_ = tablebase.get_best_move(game)
+        if index is None:
+            if self.parallel:
+                index, stats_ = mcts_parallel.get_best_move(game, batch_size=self.batch_size)
+            elif self.compact:
+                index, stats_ = tree.get_best_move(game, batch_size=self.batch_size)
+            else:
+                index, stats_ = mcts.get_best_move(game, batch_size=self.batch_size)
+        record_stats(self, stats_)
+        return index
+
+
+class CompactMCTSPlayer(MCTSPlayer):
+    compact = True
+
+
+class ParallelMCTSPlayer(CompactMCTSPlayer):
+    parallel = True
+
+
+class BatchedMCTSPlayer(CompactMCTSPlayer):
+    batch_size = rollouts.ROLLOUT_BATCH_SIZE
@@ -0,0 +1,239 @@
+"""Pondering, i.e., searching on the human's clock.
+
+After an AI move against a human, a background thread searches the
+position after each likely reply of the human, the move of the
+transposition table first, with the engine of the AI player. The
+searches fill the process-wide transposition table, so when the reply
+comes in the AI's search starts from a table that already holds it. The
+thread is cancelled as soon as the human moves, whatever it was on.
+
+Pondering runs at most XO_PONDER_DUTY_CYCLE of the time, it sleeps in
+between slices of search, so that it cannot starve the live requests of
+the worker. The tables are not safe to write from two threads, so it
+also stops at its next check for as long as a live search of any game
+runs, see live_search. There is a single pondering thread per process,
+a new one cancels the previous one. Off unless the XO_PONDER setting is
+set.
+"""
+import time
+import threading
+import contextlib
+from django.conf import settings
+from . import board_utils, players
+from .stats import SearchStats, record
+from .minimax.minimax import SearchTimeout, State
+from .minimax.transposition_table import get_ttable
+from .utils import make_logger
+
+
+logger = make_logger('ponder.py')
+
+
+# fraction of the time spent searching
+DUTY_CYCLE = 0.5
+# seconds of search between two sleeps
+SLICE = 0.02
+# seconds per reply
+TIME_LIMIT = 10
+
+
+def is_enabled():
+    return getattr(settings, 'XO_PONDER', False)
+
+
+def get_duty_cycle():
+    return getattr(settings, 'XO_PONDER_DUTY_CYCLE', DUTY_CYCLE)
+
+
+def get_time_limit():
+    return getattr(settings, 'XO_PONDER_TIME_LIMIT', TIME_LIMIT)
+
+
+# the live searches of the process and the ponderer that is searching,
+# if any, under live_condition
+live_state = {'n_searches': 0, 'ponderer': None}
+live_condition = threading.Condition()
+
+
+@contextlib.contextmanager
+def live_search():
+    """Around the searches of the AI moves of the requests. Waits for the
+    ponderer to stop at its next check, and keeps it stopped until the
+    search is done.
+    """
+    with live_condition:
+        live_state['n_searches'] += 1
+        while live_state['ponderer'] is not None and live_state['ponderer'].thread.is_alive():
+            live_condition.wait(SLICE)
+    try:
+        yield
+    finally:
+        with live_condition:
+            live_state['n_searches'] -= 1
+            live_condition.notify_all()
+
+
+def get_likely_replies(game):
+    """Empty cells of the game, the move of the transposition table for
+    the player to move first.
+    """
+    state = State(game.n_rows, game.n_cols, game.n_connects,
+                  game.board_x, game.board_o)
+    cache = get_ttable(game.n_rows, game.n_cols, game.n_connects).get_cache(state)
+    replies = list(game.empty_indexes)
+    if cache is not None and cache.move in replies:
+        replies.remove(cache.move)
+        replies.insert(0, cache.move)
+    return replies
+
+
+def make_reply(game, index):
+    """Unsaved copy of the game after the move at index.
+    """
+    reply = type(game)(n_rows=game.n_rows, n_cols=game.n_cols,
+                       n_connects=game.n_connects,
+                       board_x=game.board_x, board_o=game.board_o,
+                       player_x=game.player_x, player_o=game.player_o)
+    if game.next_player == board_utils.MARKER_X:
+        reply.add_cross(index)
+    else:
+        reply.add_circle(index)
+    return reply
+
+
+class Ponderer:
+    def __init__(self, game, player, duty_cycle, time_limit):
+        self.game_id = game.pk
+        self.replies = [(index, make_reply(game, index)) for index in get_likely_replies(game)]
+        self.player = player
+        self.duty_cycle = duty_cycle
+        self.time_limit = time_limit
+        self.cancel_event = threading.Event()
+        # reply index to the SearchStats of the searches that completed
+        self.pondered = dict()
+        self.stats = SearchStats('ponder')
+        self.stats.n_moves = 0
+        self.busy_start = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __repr__(self):
+        repr_ = '{}(game {}, {}, {}/{} replies)'
+        repr_ = repr_.format(Ponderer.__name__, self.game_id, self.player,
+                             len(self.pondered), len(self.replies))
+        return repr_
+
+    def start(self):
+        self.busy_start = time.monotonic()
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.thread.join()
+
+    def release(self):
+        with live_condition:
+            if live_state['ponderer'] is self:
+                live_state['ponderer'] = None
+            live_condition.notify_all()
+
+    def acquire(self, pause=0.):
+        """Stops searching for pause seconds and then for as long as there
+        are live searches. Returns False if cancelled in the meantime.
+        """
+        self.release()
+        if self.cancel_event.wait(pause):
+            return False
+        with live_condition:
+            while live_state['n_searches'] > 0:
+                if self.cancel_event.is_set():
+                    return False
+                live_condition.wait(SLICE)
+            if self.cancel_event.is_set():
+                return False
+            live_state['ponderer'] = self
+        return True
+
+    def throttle(self):
+        """The on_check of the searches, gives up the cpu for as long as
+        the duty cycle asks for every SLICE seconds of search and the
+        tables to the live searches.
+        """
+        if self.cancel_event.is_set():
+            raise SearchTimeout()
+        busy = time.monotonic() - self.busy_start
+        if busy < SLICE and live_state['n_searches'] == 0:
+            return
+        pause = busy * (1. - self.duty_cycle) / self.duty_cycle if busy >= SLICE else 0.
+        if not self.acquire(pause):
+            raise SearchTimeout()
+        self.busy_start = time.monotonic()
+
+    def run(self):
+        try:
+            for index, reply in self.replies:
+                if not self.acquire():
+                    break
+                if reply.is_game_over:
+                    continue
+                _, stats = self.player.search(reply, time_limit=self.time_limit,
+                                              on_check=self.throttle)
+                self.stats.add(stats)
+                if self.cancel_event.is_set():
+                    # the last search was cut short
+                    break
+                self.pondered[index] = stats
+        finally:
+            self.release()
+        record(self.stats)
+
+
+# the ponderer of the process
+ponder_registry = dict()
+ponder_lock = threading.Lock()
+
+
+def start_pondering(game):
+    """Ponders the replies of the human to the game if the AI player of
+    the game's last move can, returns the Ponderer or None.
+    """
+    if not is_enabled() or game.is_game_over or not game.is_next_player_human():
+        return None
+    player = players.get_player(game.cur_player_type)
+    if not getattr(player, 'can_ponder', False):
+        return None
+
+    with ponder_lock:
+        prev = ponder_registry.pop('ponderer', None)
+        if prev is not None:
+            prev.cancel()
+        # the likely replies read the table, after the previous ponderer
+        # is done with it
+        ponderer = Ponderer(game, player, get_duty_cycle(), get_time_limit())
+        ponder_registry['ponderer'] = ponderer
+        ponderer.start()
+
+    info_msg = 'Started pondering {}'.format(ponderer)
+    logger.info(info_msg)
+    return ponderer
+
+
+def stop_pondering(game_id, index=None):
+    """Cancels the pondering of the game, index is the human's move if it
+    is known. Returns the SearchStats of the pondered search of the move
+    or None.
+    """
+    with ponder_lock:
+        ponderer = ponder_registry.get('ponderer', None)
+        if ponderer is None or str(ponderer.game_id) != str(game_id):
+            return None
+        ponder_registry.pop('ponderer')
+        ponderer.cancel()
+
+    stats = ponderer.pondered.get(index, None)
+    if stats is not None:
+        info_msg = 'Ponder hit on index {} at depth {}, {}'
+        info_msg = info_msg.format(index, stats.max_depth, ponderer)
+    else:
+        info_msg = 'Ponder miss on index {}, {}'.format(index, ponderer)
+    logger.info(info_msg)
+    return stats
@@ -0,0 +1,73 @@
+"""Long-lived process pool for the searches that spread over the cores.
+
+The pool is made on first use and kept for the life of the web worker so
+that every request reuses the same processes, and with them their warm
+transposition tables. The number of processes is the XO_SEARCH_WORKERS
+setting, all the cores by default.
+"""
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from .utils import make_logger
+
+
+logger = make_logger('pool.py')
+
+
+# a single pool per process
+pool_registry = dict()
+pool_lock = threading.Lock()
+
+# best value found so far by any process of the pool for the search that
+# holds search_lock, e.g., the alpha bound of a root-split minimax search
+shared_bound = None
+# searches that use shared_bound take turns
+search_lock = threading.Lock()
+
+
+def get_n_workers():
+    n_workers = getattr(settings, 'XO_SEARCH_WORKERS', None)
+    if not n_workers:
+        n_workers = os.cpu_count() or 1
+    return n_workers
+
+
+def init_worker(bound):
+    global shared_bound
+    shared_bound = bound
+
+    # processes that are spawned rather than forked start without django
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def get_pool():
+    global shared_bound
+    pool = pool_registry.get('pool', None)
+    if pool is not None:
+        return pool
+
+    with pool_lock:
+        pool = pool_registry.get('pool', None)
+        if pool is None:
+            n_workers = get_n_workers()
+            shared_bound = multiprocessing.Value('d', float('-inf'))
+            pool = ProcessPoolExecutor(max_workers=n_workers,
+                                       initializer=init_worker,
+                                       initargs=(shared_bound,))
+            pool_registry['pool'] = pool
+
+            info_msg = 'Created process pool with {} workers'.format(n_workers)
+            logger.info(info_msg)
+    return pool
+
+
+def shutdown_pool():
+    with pool_lock:
+        pool = pool_registry.pop('pool', None)
+        if pool is not None:
+            pool.shutdown(wait=True)
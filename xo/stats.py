@@ -0,0 +1,121 @@
+"""Counters of the AI engines, one SearchStats per move and their running
+totals per engine for the life of the worker.
+"""
+import threading
+from collections import OrderedDict
+
+
+class SearchStats:
+    def __init__(self, engine):
+        self.engine = engine
+        self.n_moves = 1
+        # nodes visited, i.e., negamax calls or tree nodes created
+        self.n_nodes = 0
+        # iterative deepening iterations or mcts rollouts
+        self.n_iterations = 0
+        self.n_rollouts = 0
+        # transposition table and tablebase lookups
+        self.n_tt_probes = 0
+        self.n_tt_hits = 0
+        # hits that ended the node without searching it
+        self.n_tt_cutoffs = 0
+        # positions of the threat-space searches
+        self.n_threat_nodes = 0
+        # depth of the deepest completed iteration or of the deepest
+        # selected tree node, and the deepest ply visited at all
+        self.max_depth = 0
+        self.max_ply = 0
+        # seconds per phase, e.g., 'search' or 'simulate'
+        self.phase_times = OrderedDict()
+
+    def __repr__(self):
+        repr_ = '{}({}, {} nodes in {:.3f}s, {:.0f} nps, depth {}/{}, {} iterations, {} rollouts, TT {}/{}/{}, ebf {:.2f})'
+        repr_ = repr_.format(SearchStats.__name__, self.engine, self.n_nodes, self.time,
+                             self.nps, self.max_depth, self.max_ply,
+                             self.n_iterations, self.n_rollouts,
+                             self.n_tt_probes, self.n_tt_hits, self.n_tt_cutoffs,
+                             self.ebf)
+        return repr_
+
+    def add_time(self, phase, seconds):
+        self.phase_times[phase] = self.phase_times.get(phase, 0.) + seconds
+
+    @property
+    def time(self):
+        return sum(self.phase_times.values())
+
+    @property
+    def nps(self):
+        time_ = self.time
+        return self.n_nodes / time_ if time_ > 0 else 0.
+
+    @property
+    def tt_hit_rate(self):
+        return self.n_tt_hits / self.n_tt_probes if self.n_tt_probes > 0 else 0.
+
+    @property
+    def ebf(self):
+        """Effective branching factor, the b of a uniform tree of depth
+        max_depth with as many nodes per move as were visited.
+        """
+        if self.max_depth == 0 or self.n_nodes == 0:
+            return 0.
+        return (self.n_nodes / self.n_moves) ** (1. / self.max_depth)
+
+    def add(self, other):
+        """Adds the counters of other, e.g., of another move or of another
+        process of a parallel search.
+        """
+        self.n_moves += other.n_moves
+        self.n_nodes += other.n_nodes
+        self.n_iterations += other.n_iterations
+        self.n_rollouts += other.n_rollouts
+        self.n_tt_probes += other.n_tt_probes
+        self.n_tt_hits += other.n_tt_hits
+        self.n_tt_cutoffs += other.n_tt_cutoffs
+        self.n_threat_nodes += other.n_threat_nodes
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.max_ply = max(self.max_ply, other.max_ply)
+        for phase, seconds in other.phase_times.items():
+            self.add_time(phase, seconds)
+
+    def to_dict(self):
+        return OrderedDict([
+            ('engine', self.engine),
+            ('n_moves', self.n_moves),
+            ('n_nodes', self.n_nodes),
+            ('nps', self.nps),
+            ('n_iterations', self.n_iterations),
+            ('n_rollouts', self.n_rollouts),
+            ('n_tt_probes', self.n_tt_probes),
+            ('n_tt_hits', self.n_tt_hits),
+            ('n_tt_cutoffs', self.n_tt_cutoffs),
+            ('tt_hit_rate', self.tt_hit_rate),
+            ('n_threat_nodes', self.n_threat_nodes),
+            ('max_depth', self.max_depth),
+            ('max_ply', self.max_ply),
+            ('ebf', self.ebf),
+            ('time', self.time),
+            ('phase_times', dict(self.phase_times)),
+        ])
+
+
+# process-wide running totals keyed by engine
+stats_registry = dict()
+stats_lock = threading.Lock()
+
+
+def record(stats):
+    with stats_lock:
+        total = stats_registry.get(stats.engine, None)
+        if total is None:
+            total = SearchStats(stats.engine)
+            total.n_moves = 0
+            stats_registry[stats.engine] = total
+        total.add(stats)
+    return total
+
+
+def get_totals():
+    with stats_lock:
+        return {engine: total.to_dict() for engine, total in stats_registry.items()}
@@ -0,0 +1,231 @@
+"""Board symmetries as precomputed cell permutations.
+
+A transform maps cell (row_ind, col_ind) to another cell of the same
+board. Square boards have all 8 symmetries of the square while the
+rotations by 90 degrees and the diagonal reflections do not keep the
+shape of rectangular boards, which leaves them with 4.
+
+Boards are transformed through per-byte lookup tables, i.e., each byte
+of the board indexes a table of the transformed bits of that byte, so a
+5x5 board takes 4 lookups rather than a loop over its 25 cells.
+"""
+
+
+IDENTITY = 0
+ROTATE_90 = 1
+ROTATE_180 = 2
+ROTATE_270 = 3
+REFLECT_X = 4
+REFLECT_Y = 5
+TRANSPOSE = 6
+ANTI_TRANSPOSE = 7
+
+
+SQUARE_TRANSFORMS = (
+    IDENTITY, ROTATE_90, ROTATE_180, ROTATE_270,
+    REFLECT_X, REFLECT_Y, TRANSPOSE, ANTI_TRANSPOSE,
+)
+RECT_TRANSFORMS = (IDENTITY, ROTATE_180, REFLECT_X, REFLECT_Y)
+
+
+def transform2str(transform):
+    d = {
+        IDENTITY: 'identity',
+        ROTATE_90: 'rotate_90',
+        ROTATE_180: 'rotate_180',
+        ROTATE_270: 'rotate_270',
+        REFLECT_X: 'reflect_x',
+        REFLECT_Y: 'reflect_y',
+        TRANSPOSE: 'transpose',
+        ANTI_TRANSPOSE: 'anti_transpose',
+    }
+    return d[transform]
+
+
+def get_inverse(transform):
+    if transform == ROTATE_90:
+        return ROTATE_270
+    elif transform == ROTATE_270:
+        return ROTATE_90
+    # all the others are their own inverse
+    return transform
+
+
+def get_transforms(n_rows, n_cols):
+    if n_rows == n_cols:
+        return SQUARE_TRANSFORMS
+    return RECT_TRANSFORMS
+
+
+def transform_cell(row_ind, col_ind, transform, n_rows, n_cols):
+    last_row = n_rows - 1
+    last_col = n_cols - 1
+    if transform == IDENTITY:
+        return row_ind, col_ind
+    elif transform == ROTATE_90:
+        # clockwise
+        return col_ind, last_row - row_ind
+    elif transform == ROTATE_180:
+        return last_row - row_ind, last_col - col_ind
+    elif transform == ROTATE_270:
+        return last_col - col_ind, row_ind
+    elif transform == REFLECT_X:
+        return last_row - row_ind, col_ind
+    elif transform == REFLECT_Y:
+        return row_ind, last_col - col_ind
+    elif transform == TRANSPOSE:
+        return col_ind, row_ind
+    elif transform == ANTI_TRANSPOSE:
+        return last_col - col_ind, last_row - row_ind
+    err_msg = 'Do not recognize transform {}'.format(transform)
+    raise ValueError(err_msg)
+
+
+def compute_permutation(transform, n_rows, n_cols):
+    """The ith item is the index that cell i is moved to by transform.
+    """
+    if transform not in get_transforms(n_rows, n_cols):
+        err_msg = 'Transform {} is not a symmetry of a ({}x{}) board'
+        err_msg = err_msg.format(transform2str(transform), n_rows, n_cols)
+        raise ValueError(err_msg)
+
+    n_cells = n_rows * n_cols
+    permutation = list()
+    for ind in range(n_cells):
+        row_ind = ind // n_cols
+        col_ind = ind % n_cols
+        row_ind_t, col_ind_t = transform_cell(row_ind, col_ind, transform,
+                                              n_rows, n_cols)
+        # the transformed board has the same shape for all the valid
+        # transforms
+        permutation.append(row_ind_t * n_cols + col_ind_t)
+    return tuple(permutation)
+
+
+def compute_byte_tables(permutation):
+    """For each byte of the board, a table of 256 items with the moved
+    bits of all the possible values of that byte.
+    """
+    n_cells = len(permutation)
+    n_bytes = (n_cells + 7) // 8
+    tables = list()
+    for byte_ind in range(n_bytes):
+        table = [0] * 256
+        for value in range(256):
+            moved = 0
+            for bit_ind in range(8):
+                ind = byte_ind * 8 + bit_ind
+                if ind < n_cells and (value >> bit_ind) & 1:
+                    moved |= 1 << permutation[ind]
+            table[value] = moved
+        tables.append(tuple(table))
+    return tuple(tables)
+
+
+# process-wide symmetry tables keyed by (n_rows, n_cols)
+symmetries_registry = dict()
+
+
+def get_symmetries(n_rows, n_cols):
+    """Returns the tuple of (transform, permutation, byte tables) of all
+    the valid transforms of the board shape, starting with the identity.
+    """
+    key = (n_rows, n_cols)
+    symmetries = symmetries_registry.get(key, None)
+    if symmetries is None:
+        symmetries = list()
+        for transform in get_transforms(n_rows, n_cols):
+            permutation = compute_permutation(transform, n_rows, n_cols)
+            tables = compute_byte_tables(permutation)
+            symmetries.append((transform, permutation, tables))
+        symmetries = symmetries_registry.setdefault(key, tuple(symmetries))
+    return symmetries
+
+
+def get_symmetry(transform, n_rows, n_cols):
+    for symmetry in get_symmetries(n_rows, n_cols):
+        if symmetry[0] == transform:
+            return symmetry
+    err_msg = 'Transform {} is not a symmetry of a ({}x{}) board'
+    err_msg = err_msg.format(transform2str(transform), n_rows, n_cols)
+    raise ValueError(err_msg)
+
+
+def apply_tables(board, tables):
+    moved = 0
+    for table in tables:
+        moved |= table[board & 0xff]
+        board >>= 8
+    return moved
+
+
+def apply_transform(board, transform, n_rows, n_cols):
+    _, _, tables = get_symmetry(transform, n_rows, n_cols)
+    return apply_tables(board, tables)
+
+
+def transform_index(index, transform, n_rows, n_cols):
+    _, permutation, _ = get_symmetry(transform, n_rows, n_cols)
+    return permutation[index]
+
+
+def canonicalize(board_x, board_o, n_rows, n_cols):
+    """Returns the smallest (board_x, board_o) pair over all the valid
+    transforms of the board together with the transform that gives it.
+    Positions that are symmetric to each other share the same canonical
+    pair and undoing the transform, i.e., applying get_inverse(transform),
+    gives back the original board.
+    """
+    best_x, best_o, best_transform = board_x, board_o, IDENTITY
+    for transform, _, tables in get_symmetries(n_rows, n_cols):
+        if transform == IDENTITY:
+            continue
+        board_x_t = apply_tables(board_x, tables)
+        if board_x_t > best_x:
+            continue
+        board_o_t = apply_tables(board_o, tables)
+        if board_x_t < best_x or board_o_t < best_o:
+            best_x, best_o, best_transform = board_x_t, board_o_t, transform
+    return best_x, best_o, best_transform
+
+
+def get_stabilizer(board_x, board_o, n_rows, n_cols):
+    """Returns the permutations of the transforms that map the position
+    onto itself, starting with the identity. Moves that one of them maps
+    onto each other lead to symmetric positions.
+    """
+    stabilizer = list()
+    for _, permutation, tables in get_symmetries(n_rows, n_cols):
+        if apply_tables(board_x, tables) != board_x:
+            continue
+        if apply_tables(board_o, tables) == board_o:
+            stabilizer.append(permutation)
+    return tuple(stabilizer)
+
+
+def get_child_stabilizer(stabilizer, index):
+    """Permutations of the stabilizer before the move at index that are
+    still in the stabilizer after it, i.e., the ones that keep the cell in
+    place, so that only the root needs the boards transformed. A move can
+    also make the position symmetric under new transforms, which are left
+    out and only cost the pruning of their moves.
+    """
+    if len(stabilizer) == 1:
+        return stabilizer
+    return tuple(permutation for permutation in stabilizer if permutation[index] == index)
+
+
+def get_unique_moves(indexes, stabilizer):
+    """One move per class of moves that the stabilizer maps onto each
+    other, the first one in the order of indexes.
+    """
+    if len(stabilizer) == 1:
+        return indexes
+    unique = list()
+    equivalent = set()
+    for index in indexes:
+        if index in equivalent:
+            continue
+        unique.append(index)
+        equivalent.update(permutation[index] for permutation in stabilizer)
+    return unique
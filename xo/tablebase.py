@@ -0,0 +1,301 @@
+"""Endgame tablebases, i.e., the exact value of every position of a board
+configuration solved offline.
+
+The solver enumerates the positions that can come up in a game, one
+level per number of marked cells and up to symmetry, and then solves the
+levels backwards from the full boards: a position is won if one of its
+moves leads to a lost position, lost if all of them lead to won ones and
+drawn otherwise. Values are for the player to move, together with the
+number of moves to the end of the game with perfect play, i.e., winning
+as fast and losing as slowly as possible.
+
+A tablebase file is a fixed size header followed by the sorted keys of
+the canonical positions, their values and their distances. Workers map
+the file read-only and look positions up with a binary search.
+"""
+import os
+import time
+import numpy as np
+from django.conf import settings
+from . import board_utils, symmetry
+from .utils import make_logger
+from .stats import SearchStats
+
+
+logger = make_logger('tablebase.py')
+
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+TABLEBASE_MAGIC = b'XOTBASE0'
+TABLEBASE_VERSION = 1
+TABLEBASE_EXT = '.tb'
+TABLEBASE_HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', np.uint32),
+    ('n_rows', np.uint8),
+    ('n_cols', np.uint8),
+    ('n_connects', np.uint8),
+    ('pad', np.uint8),
+    ('n_entries', np.uint64),
+])
+TABLEBASE_HEADER_SIZE = TABLEBASE_HEADER_DTYPE.itemsize
+
+
+def get_tablebase_dir():
+    return getattr(settings, 'XO_TABLEBASE_DIR', None)
+
+
+def get_tablebase_fname(n_rows, n_cols, n_connects):
+    return 'xo-tablebase-{}x{}x{}{}'.format(n_rows, n_cols, n_connects, TABLEBASE_EXT)
+
+
+def get_key(board_x, board_o, n_rows, n_cols):
+    """Key of the symmetry class of the position, boards of up to 32
+    cells fit in 64 bits.
+    """
+    board_x, board_o, _ = symmetry.canonicalize(board_x, board_o, n_rows, n_cols)
+    return board_x | board_o << (n_rows * n_cols)
+
+
+def get_children(board_x, board_o, n_cells):
+    """Yields the index and the boards after each move of the position.
+    """
+    marker = board_utils.get_next_player(board_x, board_o, n_cells)
+    for index in board_utils.get_empty_indexes(board_x, board_o, n_cells):
+        flag = 1 << index
+        if marker == board_utils.MARKER_X:
+            yield index, board_x | flag, board_o
+        else:
+            yield index, board_x, board_o | flag
+
+
+def get_rank(value, distance):
+    """Order of the outcomes for the player to move, the higher the
+    better. Wins are better the sooner they come, losses and draws the
+    later.
+    """
+    if value == WIN:
+        return (value, -distance)
+    return (value, distance)
+
+
+def get_terminal_value(board_x, board_o, n_rows, n_cols, n_connects):
+    """Value for the player to move if the game is over, None otherwise.
+    """
+    result = board_utils.is_game_over(board_x, board_o, n_rows, n_cols, n_connects)
+    if result is None:
+        return None
+    elif result == ' ':
+        return DRAW
+    # the player who just moved won
+    return LOSS
+
+
+def enumerate_levels(n_rows, n_cols, n_connects):
+    """Returns the list of the canonical positions of each level, i.e.,
+    the positions with that many marked cells, as dicts from their key to
+    their boards.
+    """
+    n_cells = n_rows * n_cols
+    levels = [{get_key(0, 0, n_rows, n_cols): (0, 0)}]
+    for level in range(n_cells):
+        next_level = dict()
+        for board_x, board_o in levels[level].values():
+            if get_terminal_value(board_x, board_o, n_rows, n_cols, n_connects) is not None:
+                continue
+            for _, child_x, child_o in get_children(board_x, board_o, n_cells):
+                child_x, child_o, _ = symmetry.canonicalize(child_x, child_o, n_rows, n_cols)
+                key = child_x | child_o << n_cells
+                if key not in next_level:
+                    next_level[key] = (child_x, child_o)
+        levels.append(next_level)
+
+        info_msg = 'Level {}: {} positions'.format(level + 1, len(next_level))
+        logger.info(info_msg)
+    return levels
+
+
+def solve(n_rows, n_cols, n_connects):
+    """Returns the sorted keys of all the canonical positions and the
+    value and distance of each of them.
+    """
+    n_cells = n_rows * n_cols
+    levels = enumerate_levels(n_rows, n_cols, n_connects)
+
+    # (value, distance) of the solved level below
+    solved_next = dict()
+    all_solved = dict()
+    for level in range(len(levels) - 1, -1, -1):
+        solved = dict()
+        for key, (board_x, board_o) in levels[level].items():
+            value = get_terminal_value(board_x, board_o, n_rows, n_cols, n_connects)
+            if value is not None:
+                solved[key] = (value, 0)
+                continue
+
+            best = None
+            for _, child_x, child_o in get_children(board_x, board_o, n_cells):
+                child_value, child_distance = solved_next[get_key(child_x, child_o, n_rows, n_cols)]
+                outcome = (-child_value, child_distance + 1)
+                if best is None or get_rank(*outcome) > get_rank(*best):
+                    best = outcome
+            solved[key] = best
+
+        all_solved.update(solved)
+        solved_next = solved
+        levels[level] = None
+
+    keys = np.array(sorted(all_solved), dtype=np.uint64)
+    values = np.array([all_solved[int(key)][0] for key in keys], dtype=np.int8)
+    distances = np.array([all_solved[int(key)][1] for key in keys], dtype=np.uint8)
+    return keys, values, distances
+
+
+def dump_tablebase(path, n_rows, n_cols, n_connects, keys, values, distances):
+    header = np.zeros(1, dtype=TABLEBASE_HEADER_DTYPE)
+    header['magic'] = TABLEBASE_MAGIC
+    header['version'] = TABLEBASE_VERSION
+    header['n_rows'] = n_rows
+    header['n_cols'] = n_cols
+    header['n_connects'] = n_connects
+    header['n_entries'] = len(keys)
+
+    # write to a temporary file first so that workers never map a half
+    # written tablebase
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(keys.astype(np.uint64).tobytes())
+        f.write(values.astype(np.int8).tobytes())
+        f.write(distances.astype(np.uint8).tobytes())
+    os.replace(tmp_path, path)
+
+
+class Tablebase:
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=TABLEBASE_HEADER_DTYPE, count=1)
+        if len(header) == 0 or header['magic'][0] != TABLEBASE_MAGIC:
+            err_msg = 'Not a tablebase: {}'.format(path)
+            raise ValueError(err_msg)
+
+        header = header[0]
+        if header['version'] != TABLEBASE_VERSION:
+            err_msg = 'Tablebase {} has version {}'.format(path, header['version'])
+            raise ValueError(err_msg)
+
+        self.n_rows = int(header['n_rows'])
+        self.n_cols = int(header['n_cols'])
+        self.n_connects = int(header['n_connects'])
+        self.n_entries = int(header['n_entries'])
+
+        n = self.n_entries
+        offset = TABLEBASE_HEADER_SIZE
+        self.keys = np.memmap(path, dtype=np.uint64, mode='r', offset=offset, shape=(n,))
+        offset += 8 * n
+        self.values = np.memmap(path, dtype=np.int8, mode='r', offset=offset, shape=(n,))
+        offset += n
+        self.distances = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(n,))
+
+    def __repr__(self):
+        repr_ = '{}("{}", ({}, {}, {}), {} positions)'
+        repr_ = repr_.format(Tablebase.__name__, self.path,
+                             self.n_rows, self.n_cols, self.n_connects,
+                             self.n_entries)
+        return repr_
+
+    @property
+    def config(self):
+        return self.n_rows, self.n_cols, self.n_connects
+
+    def get_entry(self, board_x, board_o):
+        """Returns the (value, distance) of the position for the player to
+        move or None if it is not in the table.
+        """
+        key = np.uint64(get_key(board_x, board_o, self.n_rows, self.n_cols))
+        i = int(np.searchsorted(self.keys, key))
+        if i == self.n_entries or self.keys[i] != key:
+            return None
+        return int(self.values[i]), int(self.distances[i])
+
+    def get_best_move(self, board_x, board_o):
+        """Returns the index of the best move and its (value, distance) for
+        the player to move, the lowest index among equally good moves.
+        """
+        n_cells = self.n_rows * self.n_cols
+        best_index, best = None, None
+        for index, child_x, child_o in get_children(board_x, board_o, n_cells):
+            entry = self.get_entry(child_x, child_o)
+            if entry is None:
+                return None, None
+            outcome = (-entry[0], entry[1] + 1)
+            if best is None or get_rank(*outcome) > get_rank(*best):
+                best_index, best = index, outcome
+        return best_index, best
+
+
+# process-wide tablebases keyed by (n_rows, n_cols, n_connects)
+tablebase_registry = dict()
+
+
+def get_tablebase(n_rows, n_cols, n_connects):
+    return tablebase_registry.get((n_rows, n_cols, n_connects), None)
+
+
+def get_best_move(game):
+    """The move of the tablebase of the game's configuration and the
+    SearchStats of the lookup, or None and None if there is no tablebase
+    for it.
+    """
+    tablebase = get_tablebase(game.n_rows, game.n_cols, game.n_connects)
+    if tablebase is None:
+        return None, None
+
+    start = time.monotonic()
+    index, outcome = tablebase.get_best_move(game.board_x, game.board_o)
+    if index is None:
+        return None, None
+
+    stats = SearchStats('tablebase')
+    n_moves = len(game.empty_indexes)
+    stats.n_nodes = n_moves
+    stats.n_tt_probes = n_moves
+    stats.n_tt_hits = n_moves
+    stats.max_depth = 1
+    stats.add_time('lookup', time.monotonic() - start)
+
+    info_msg = 'Tablebase move is index {} with value {} in {} moves'
+    info_msg = info_msg.format(index, *outcome)
+    logger.info(info_msg)
+    return index, stats
+
+
+def load_tablebases(tablebase_dir=None):
+    """Maps all the tablebases in tablebase_dir, the XO_TABLEBASE_DIR
+    setting by default. Called once at worker start.
+    """
+    if tablebase_dir is None:
+        tablebase_dir = get_tablebase_dir()
+    if tablebase_dir is None or not os.path.isdir(tablebase_dir):
+        return []
+
+    tablebases = list()
+    for fname in sorted(os.listdir(tablebase_dir)):
+        if not fname.endswith(TABLEBASE_EXT):
+            continue
+        path = os.path.join(tablebase_dir, fname)
+        try:
+            tablebase = Tablebase(path)
+        except ValueError as e:
+            logger.error(str(e))
+            continue
+
+        tablebase_registry[tablebase.config] = tablebase
+        tablebases.append(tablebase)
+
+        info_msg = 'Loaded {}'.format(tablebase)
+        logger.info(info_msg)
+    return tablebases
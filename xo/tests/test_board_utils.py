@@ -1,3 +1,4 @@
+import random
 from django.test import TestCase
 from xo import board_utils as utils
 
@@ -38,7 +39,82 @@ class BoardUtilsTest(TestCase):
         expected = 0b000000111
         assert_reflected(expected, reflected, n_cells)
 
+    def test_is_game_over_at_3x3x3(self):
+        n_rows, n_cols, n_connects = 3, 3, 3
 
+        # X completes the top row with the move at index 1
+        board_x = 0b000000111
+        board_o = 0b000011000
+        result = utils.is_game_over_at(board_x, board_o, 1, n_rows, n_cols, n_connects)
+        self.assertEqual(result, utils.MARKER_X)
 
+        # O's move at index 4 does not complete anything
+        result = utils.is_game_over_at(board_x, board_o, 4, n_rows, n_cols, n_connects)
+        self.assertIsNone(result)
 
+        # filled board without a win
+        board_x = 0b011100101
+        board_o = 0b100011010
+        result = utils.is_game_over_at(board_x, board_o, 8, n_rows, n_cols, n_connects)
+        self.assertEqual(result, ' ')
 
+    def test_is_game_over_at_matches_is_game_over(self):
+        n_rows, n_cols, n_connects = 3, 3, 3
+        n_cells = n_rows * n_cols
+
+        # walk all the reachable positions and compare after each move
+        to_visit = [(0, 0)]
+        visited = set(to_visit)
+        while to_visit:
+            board_x, board_o = to_visit.pop()
+            marker = utils.get_next_player(board_x, board_o, n_cells)
+            for index in utils.get_empty_indexes(board_x, board_o, n_cells):
+                flag = 1 << index
+                if marker == utils.MARKER_X:
+                    child = (board_x | flag, board_o)
+                else:
+                    child = (board_x, board_o | flag)
+
+                expected = utils.is_game_over(*child, n_rows, n_cols, n_connects)
+                result = utils.is_game_over_at(*child, index, n_rows, n_cols, n_connects)
+                self.assertEqual(result, expected)
+
+                if expected is None and child not in visited:
+                    visited.add(child)
+                    to_visit.append(child)
+
+    def test_has_connects_does_not_wrap(self):
+        n_rows, n_cols, n_connects = 3, 3, 3
+        # cells 1, 2 and 3 are consecutive bits but wrap around a row
+        board = 0b000001110
+        self.assertIs(utils.has_connects(board, n_rows, n_cols, n_connects), False)
+        # cells 2, 4 and 6 is the r2l diagonal
+        board = 0b001010100
+        self.assertIs(utils.has_connects(board, n_rows, n_cols, n_connects), True)
+
+    def test_is_game_over_matches_masks_on_random_boards(self):
+        rng = random.Random(123)
+        for n_rows in range(3, 6):
+            for n_cols in range(3, 6):
+                n_cells = n_rows * n_cols
+                for n_connects in range(3, max(n_rows, n_cols) + 1):
+                    args = (n_rows, n_cols, n_connects)
+                    for _ in range(200):
+                        # random split of cells into X, O and empty
+                        board_x, board_o = 0, 0
+                        for index in range(n_cells):
+                            v = rng.randint(0, 3)
+                            if v == 1:
+                                board_x |= 1 << index
+                            elif v == 2:
+                                board_o |= 1 << index
+                        # only one player can have a win in a real game
+                        x_won = utils.has_connects(board_x, *args)
+                        o_won = utils.has_connects(board_o, *args)
+                        boards = [(board_x, 0), (0, board_o)]
+                        if not (x_won and o_won):
+                            boards.append((board_x, board_o))
+                        for x, o in boards:
+                            expected = utils.is_game_over_by_masks(x, o, *args)
+                            result = utils.is_game_over(x, o, *args)
+                            self.assertEqual(result, expected, args)
@@ -0,0 +1,100 @@
+import random
+from django.test import TestCase
+from xo import board_utils
+from xo.models import Game
+from xo.minimax import minimax, bitboard, evaluator
+from xo.minimax.transposition_table import State, get_ttable
+
+
+class LineCountersTest(TestCase):
+    def test_mark_and_unmark_match_max_line(self):
+        rng = random.Random(123)
+        for n_rows, n_cols, n_connects in [(3, 3, 3), (4, 4, 3), (5, 5, 4), (3, 5, 3)]:
+            n_cells = n_rows * n_cols
+            lines = evaluator.LineCounters(n_rows, n_cols, n_connects, 0, 0)
+            initial = [list(counts) for counts in lines.open_counts]
+            max_score = minimax.get_max_score(n_rows, n_cols)
+
+            for _ in range(20):
+                board_x, board_o = 0, 0
+                played = list()
+                indexes = list(range(n_cells))
+                rng.shuffle(indexes)
+                for index in indexes[:rng.randint(1, n_cells)]:
+                    is_x = len(played) % 2 == 0
+                    if is_x:
+                        board_x |= 1 << index
+                    else:
+                        board_o |= 1 << index
+                    lines.mark(index, 0 if is_x else 1)
+                    played.append((index, 0 if is_x else 1))
+
+                    state = State(n_rows, n_cols, n_connects, board_x, board_o)
+                    expected = minimax.get_heuristic(state, max_score)
+                    self.assertEqual(lines.evaluate(not is_x), expected)
+
+                # undoing all the moves gets back to the empty board
+                for index, side in reversed(played):
+                    lines.unmark(index, side)
+                self.assertEqual(lines.open_counts, initial)
+
+    def test_counters_from_board(self):
+        n_rows, n_cols, n_connects = 3, 3, 3
+        board_x = 0b000010001
+        board_o = 0b000000110
+        lines = evaluator.LineCounters(n_rows, n_cols, n_connects, 0, 0)
+        lines.mark(0, 0)
+        lines.mark(1, 1)
+        lines.mark(4, 0)
+        lines.mark(2, 1)
+        expected = evaluator.LineCounters(n_rows, n_cols, n_connects, board_x, board_o)
+        self.assertEqual(lines.counts, expected.counts)
+        self.assertEqual(lines.open_counts, expected.open_counts)
+
+    def test_open_lines_stays_below_a_win(self):
+        n_rows, n_cols, n_connects = 5, 5, 3
+        # X holds two cells of many lines and O has nothing open
+        board_x = 0b0101010101010101010101010
+        lines = evaluator.LineCounters(n_rows, n_cols, n_connects, board_x, 0,
+                                       evaluator.OPEN_LINES)
+        value = lines.evaluate(False)
+        self.assertGreater(value, 0)
+        self.assertLess(value, minimax.get_max_score(n_rows, n_cols))
+
+    def test_open_lines_search(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        # O to move and has to block the top row at index 2
+        game.board_x = 0b000000011
+        game.board_o = 0b000010000
+        move, _ = bitboard.get_best_move(game, max_depth=2,
+                                         evaluation=evaluator.OPEN_LINES)
+        self.assertEqual(move, 2)
+
+    def test_own_table(self):
+        self.assertIs(get_ttable(4, 4, 3, bitboard.get_ttable_evaluation(evaluator.MAX_LINE)),
+                      get_ttable(4, 4, 3))
+        self.assertIsNot(get_ttable(4, 4, 3, evaluator.OPEN_LINES), get_ttable(4, 4, 3))
+
+        # the move of open lines does not depend on the max line searches
+        # that came before
+        rng = random.Random(123)
+        for _ in range(10):
+            game = Game(n_rows=4, n_cols=4, n_connects=3)
+            for _ in range(rng.choice([2, 4])):
+                game.play(rng.choice(game.empty_indexes))
+            if game.is_game_over:
+                continue
+            moves = list()
+            for evaluations in ([evaluator.OPEN_LINES],
+                                [evaluator.MAX_LINE, evaluator.OPEN_LINES]):
+                get_ttable(4, 4, 3).clear()
+                get_ttable(4, 4, 3, evaluator.OPEN_LINES).clear()
+                for evaluation in evaluations:
+                    move, _ = bitboard.get_best_move(game, max_depth=4,
+                                                     evaluation=evaluation)
+                moves.append(move)
+            self.assertEqual(moves[0], moves[1])
+
+    def test_unknown_evaluation(self):
+        with self.assertRaises(ValueError):
+            evaluator.LineCounters(3, 3, 3, 0, 0, 'unknown')
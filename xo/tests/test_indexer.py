@@ -0,0 +1,56 @@
+import numpy as np
+from django.test import TestCase
+from xo import indexer, board_utils
+
+
+class IndexerTest(TestCase):
+    def test_base3_round_trip(self):
+        ind = indexer.Base3Indexer(9)
+        index = np.arange(ind.size)
+        board_x, board_o = ind.unrank(index)
+        self.assertEqual(np.count_nonzero(board_x & board_o), 0)
+        np.testing.assert_array_equal(ind.rank(board_x, board_o), index)
+
+        # X in the first cell and O in the second
+        self.assertEqual(int(ind.rank(0b01, 0b10)), 1 + 2 * 3)
+
+    def test_combinatorial_covers_game_boards(self):
+        n_cells = 9
+        ind = indexer.CombinatorialIndexer(n_cells)
+        index = np.arange(ind.size)
+        board_x, board_o = ind.unrank(index)
+        np.testing.assert_array_equal(ind.rank(board_x, board_o), index)
+
+        # all the boards that a game can get to, with or without a win
+        expected = set()
+        for board_x_ in range(1 << n_cells):
+            n_x = bin(board_x_).count('1')
+            rest = [i for i in range(n_cells) if not board_x_ >> i & 1]
+            for n_o in (n_x - 1, n_x):
+                if n_o < 0:
+                    continue
+                for bits in range(1 << len(rest)):
+                    if bin(bits).count('1') != n_o:
+                        continue
+                    board_o_ = sum(1 << rest[i] for i in range(len(rest)) if bits >> i & 1)
+                    expected.add((board_x_, board_o_))
+        result = set(zip(board_x.tolist(), board_o.tolist()))
+        self.assertEqual(result, expected)
+
+    def test_combinatorial_5x5_round_trip(self):
+        ind = indexer.CombinatorialIndexer(25)
+        rng = np.random.RandomState(123)
+        index = rng.randint(0, ind.size, size=10000, dtype=np.int64)
+        board_x, board_o = ind.unrank(index)
+        np.testing.assert_array_equal(ind.rank(board_x, board_o), index)
+
+    def test_combinatorial_rejects_other_boards(self):
+        ind = indexer.CombinatorialIndexer(9)
+        with self.assertRaises(ValueError):
+            # O has more markers than X
+            ind.rank(0b001, 0b110)
+
+    def test_get_indexer(self):
+        self.assertIsInstance(indexer.get_indexer(3, 4), indexer.Base3Indexer)
+        self.assertIsInstance(indexer.get_indexer(4, 4), indexer.CombinatorialIndexer)
+        self.assertIs(indexer.get_indexer(4, 4), indexer.get_indexer(4, 4))
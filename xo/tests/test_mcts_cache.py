@@ -0,0 +1,113 @@
+import random
+from django.test import TestCase, override_settings
+from xo import symmetry
+from xo.models import Game
+from xo.mcts import cache, tree, algorithm
+
+
+class TreeCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def make_game(self):
+        game = Game(n_rows=4, n_cols=4, n_connects=3,
+                    player_x='xo.players.CompactMCTSPlayer', player_o='human')
+        game.save()
+        return game
+
+    def test_to_game_move(self):
+        rng = random.Random(123)
+        n_rows, n_cols = 4, 4
+        for _ in range(50):
+            cells = rng.sample(range(16), 5)
+            node_x = sum(1 << index for index in cells[:3])
+            node_o = sum(1 << index for index in cells[3:])
+            transform = rng.choice(symmetry.get_transforms(n_rows, n_cols))
+            board_x = symmetry.apply_transform(node_x, transform, n_rows, n_cols)
+            board_o = symmetry.apply_transform(node_o, transform, n_rows, n_cols)
+
+            transforms = cache.match(board_x, board_o, node_x, node_o, n_rows, n_cols)
+            self.assertIsNotNone(transforms)
+            index = next(i for i in range(16) if not (node_x | node_o) >> i & 1)
+            game_index = cache.to_game_move(index, transforms, n_rows, n_cols)
+            canonical = symmetry.canonicalize(board_x, board_o | 1 << game_index, n_rows, n_cols)
+            node_canonical = symmetry.canonicalize(node_x, node_o | 1 << index, n_rows, n_cols)
+            self.assertEqual(canonical[:2], node_canonical[:2])
+
+    def test_reuse(self):
+        game = self.make_game()
+        move, _ = tree.get_best_move(game, max_rollouts=500)
+        kept_tree, kept_root = cache.tree_cache[('mcts_tree', game.pk)]
+        game.play(move)
+        node, _ = kept_tree.find_descendant(kept_root, game.board_x, game.board_o)
+        children = kept_tree.get_children(node)
+        reply = int(children[0])
+        game.play(int(kept_tree.action[reply]))
+        n_kept = int(kept_tree.n_selected[reply])
+        self.assertGreater(n_kept, 0)
+
+        _, stats = tree.get_best_move(game, max_rollouts=500)
+        self.assertEqual(stats.n_rollouts, 500)
+        kept_tree, kept_root = cache.tree_cache[('mcts_tree', game.pk)]
+        self.assertEqual(kept_tree.n_selected[kept_root], n_kept + 500)
+
+    def test_node_reuse(self):
+        game = self.make_game()
+        move, _ = algorithm.get_best_move(game, time_limit=0.2)
+        kept_root = cache.tree_cache[('mcts', game.pk)]
+        game.play(move)
+        reply = next(child for child in kept_root.children if child.action == move).children[0]
+        game.play(reply.action)
+        n_kept = reply.n_selected
+
+        _, stats = algorithm.get_best_move(game, time_limit=0.2)
+        self.assertIs(cache.tree_cache[('mcts', game.pk)], reply)
+        self.assertEqual(reply.n_selected, n_kept + stats.n_rollouts)
+        self.assertIsNone(reply.parent)
+
+    def test_no_match(self):
+        game = self.make_game()
+        tree.get_best_move(game, max_rollouts=100)
+        # three plies on
+        for index in (0, 5, 10):
+            game.play(index)
+        _, stats = tree.get_best_move(game, max_rollouts=100)
+        kept_tree, kept_root = cache.tree_cache[('mcts_tree', game.pk)]
+        self.assertEqual(kept_tree.n_selected[kept_root], 100)
+
+    @override_settings(XO_MCTS_TREE_CACHE_MB=1)
+    def test_lru(self):
+        quarter = 1 << 18
+        for key in range(3):
+            cache.put_tree(key, key, quarter)
+        cache.pop_tree(1)
+        cache.put_tree(1, 1, quarter)
+        cache.put_tree(3, 3, 2 * quarter)
+        # 0 is dropped to fit 3
+        self.assertEqual(list(cache.tree_cache), [2, 1, 3])
+        # larger than the whole cache
+        cache.put_tree(4, 4, 5 * quarter)
+        self.assertNotIn(4, cache.tree_cache)
+        self.assertEqual(sum(cache.tree_cache_nbytes.values()), 4 * quarter)
+
+    @override_settings(XO_MCTS_TREE_CACHE_MB=0)
+    def test_off(self):
+        game = self.make_game()
+        tree.get_best_move(game, max_rollouts=10)
+        self.assertEqual(len(cache.tree_cache), 0)
+
+    def test_nbytes(self):
+        game = self.make_game()
+        tree.get_best_move(game, max_rollouts=200)
+        kept_tree, _ = cache.tree_cache[('mcts_tree', game.pk)]
+        self.assertEqual(cache.tree_cache_nbytes[('mcts_tree', game.pk)], kept_tree.nbytes)
+
+        algorithm.get_best_move(game, time_limit=0.1)
+        root = cache.tree_cache[('mcts', game.pk)]
+        self.assertEqual(cache.tree_cache_nbytes[('mcts', game.pk)],
+                         algorithm.get_n_nodes(root) * algorithm.NODE_NBYTES)
+
+    def test_unsaved_game(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        tree.get_best_move(game, max_rollouts=10)
+        self.assertEqual(len(cache.tree_cache), 0)
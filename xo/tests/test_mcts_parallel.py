@@ -0,0 +1,52 @@
+from django.test import TestCase, override_settings
+from xo import pool
+from xo.models import Game
+from xo.mcts import parallel
+
+
+@override_settings(XO_SEARCH_WORKERS=2)
+class ParallelMCTSTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        pool.shutdown_pool()
+        super().tearDownClass()
+
+    def test_takes_the_win(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        # X to move and win at index 2 before O wins at 3
+        game.board_x = 0b000000011
+        game.board_o = 0b000110000
+        result, stats = parallel.get_best_move(game, time_limit=None, max_rollouts=400)
+        self.assertEqual(result, 2)
+        self.assertEqual(stats.n_rollouts, 400)
+
+    def test_trees_differ(self):
+        # no symmetry left, so the same moves at the root
+        game = Game(n_rows=4, n_cols=4, n_connects=3, board_x=0b10)
+        config = (game.n_rows, game.n_cols, game.n_connects)
+        results = [parallel.search_tree(config, game.board_x, game.board_o, seed, None, 200)
+                   for seed in (1, 1, 2)]
+        # the counts depend on the stream
+        for actions, _, _, _ in results:
+            self.assertEqual(sorted(actions), sorted(results[0][0]))
+        self.assertEqual(results[0][2].tolist(), results[1][2].tolist())
+        self.assertNotEqual(results[0][2].tolist(), results[2][2].tolist())
+        self.assertEqual(sum(results[0][2]), 200)
+
+    def test_symmetric_moves(self):
+        # the empty board is one class of corners, edges and centres, the
+        # counters are summed on the lowest index of each
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        result, stats = parallel.get_best_move(game, time_limit=None, max_rollouts=200)
+        self.assertIn(result, (0, 1, 4))
+
+    def test_task_rollouts(self):
+        self.assertEqual(parallel.get_n_task_rollouts(10, 3), [4, 3, 3])
+        self.assertEqual(parallel.get_n_task_rollouts(None, 2), [None, None])
+
+    def test_game_over(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        game.board_x = 0b000000111
+        game.board_o = 0b000011000
+        with self.assertRaises(ValueError):
+            parallel.get_best_move(game, time_limit=1)
@@ -0,0 +1,77 @@
+import numpy as np
+from django.test import TestCase
+from xo.models import Game
+from xo.mcts import rollouts, tree, algorithm
+
+
+def get_board(indexes):
+    return sum(1 << index for index in indexes)
+
+
+class RolloutsTest(TestCase):
+    def setUp(self):
+        np.random.seed(123)
+
+    def test_random_tic_tac_toe(self):
+        # random games from the empty board end in 58.5% wins of X,
+        # 28.8% of O and 12.7% draws
+        n_rollouts = 20000
+        n_x_wins, n_o_wins, n_draws = rollouts.get_rollout_counts(0, 0, n_rollouts, 3, 3, 3)
+        self.assertEqual(n_x_wins + n_o_wins + n_draws, n_rollouts)
+        self.assertAlmostEqual(n_x_wins / n_rollouts, 0.585, delta=0.015)
+        self.assertAlmostEqual(n_o_wins / n_rollouts, 0.288, delta=0.015)
+        self.assertAlmostEqual(n_draws / n_rollouts, 0.127, delta=0.015)
+
+    def test_last_moves(self):
+        #  XOX
+        #  XOO
+        #  O.X   X to play the last cell to a draw
+        board_x = get_board([0, 2, 3, 8])
+        board_o = get_board([1, 4, 5, 6])
+        self.assertEqual(rollouts.get_rollout_counts(board_x, board_o, 10, 3, 3, 3),
+                         (0, 0, 10))
+        #  XOX
+        #  .O.
+        #  ...   X to move, O wins at 7 unless X blocks it
+        board_x = get_board([0, 2])
+        board_o = get_board([1, 4])
+        n_x_wins, n_o_wins, n_draws = rollouts.get_rollout_counts(board_x, board_o, 1000,
+                                                                  3, 3, 3)
+        self.assertGreater(n_o_wins, n_x_wins)
+        self.assertEqual(n_x_wins + n_o_wins + n_draws, 1000)
+
+    def test_too_large(self):
+        with self.assertRaises(ValueError):
+            rollouts.get_rollout_counts(0, 0, 1, 9, 9, 5)
+
+    def test_backpropagate_counts(self):
+        game = Game(n_rows=4, n_cols=4, n_connects=3)
+        trees = [tree.Tree(4, 4, 3) for _ in range(2)]
+        leaves = list()
+        for t in trees:
+            root = t.add_root(game.board_x, game.board_o)
+            leaves.append(t.add_next_child(t.add_next_child(root)))
+        counts = (3, 5, 2)
+        trees[0].backpropagate_counts(leaves[0], counts)
+        for result, n in zip(('X', 'O', ' '), counts):
+            for _ in range(n):
+                trees[1].backpropagate(leaves[1], result)
+        n_nodes = trees[0].n_nodes
+        self.assertEqual(trees[0].n_wins[:n_nodes].tolist(), trees[1].n_wins[:n_nodes].tolist())
+        self.assertEqual(trees[0].n_selected[:n_nodes].tolist(),
+                         trees[1].n_selected[:n_nodes].tolist())
+
+    def test_batched_search(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        # X to move and win at index 2 before O wins at 3
+        game.board_x = 0b000000011
+        game.board_o = 0b000110000
+        move, stats = tree.get_best_move(game, time_limit=None, max_rollouts=1000,
+                                         batch_size=16)
+        self.assertEqual(move, 2)
+        self.assertEqual(stats.n_rollouts, 1000)
+        self.assertEqual(stats.n_iterations, 63)
+
+        move, stats = algorithm.get_best_move(game, time_limit=0.2, batch_size=16)
+        self.assertEqual(move, 2)
+        self.assertEqual(stats.n_rollouts, 16 * stats.n_iterations)
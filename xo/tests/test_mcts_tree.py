@@ -0,0 +1,97 @@
+import numpy as np
+from django.test import TestCase
+from xo.models import Game
+from xo.mcts import tree
+
+
+class TreeTest(TestCase):
+    def test_links(self):
+        game = Game(n_rows=4, n_cols=4, n_connects=3)
+        t = tree.Tree(4, 4, 3, capacity=4)
+        root = t.add_root(game.board_x, game.board_o)
+        n_rollouts = 500
+        for it in range(1, n_rollouts + 1):
+            leaf = t.expand(t.select(root, it))
+            t.backpropagate(leaf, t.simulate(leaf))
+
+        self.assertGreater(t.node_capacity, 4)
+        self.assertGreater(t.slot_capacity, 4)
+        self.assertEqual(t.n_selected[root], n_rollouts)
+        for node in range(t.n_nodes):
+            if t.first_slot[node] == tree.NO_NODE:
+                continue
+            children = t.get_children(node)
+            # the rollouts through the node, less the ones from the node
+            n_below = sum(t.n_selected[child] for child in children)
+            if node == root:
+                self.assertEqual(n_below, t.n_selected[node])
+            else:
+                self.assertLessEqual(n_below, t.n_selected[node])
+            for child in children:
+                self.assertEqual(t.parent[child], node)
+                flag = 1 << int(t.action[child])
+                self.assertEqual(int(t.board_x[child] | t.board_o[child]),
+                                 int(t.board_x[node] | t.board_o[node]) | flag)
+                self.assertNotEqual(t.side[child], t.side[node])
+
+    def test_root_children(self):
+        game = Game(n_rows=5, n_cols=5, n_connects=4)
+        _, stats = tree.get_best_move(game, max_rollouts=10)
+        self.assertEqual(stats.n_rollouts, 10)
+        # the root and one child per class of symmetric moves, then one
+        # more per rollout at most
+        self.assertGreaterEqual(stats.n_nodes, 1 + 6)
+        self.assertLessEqual(stats.n_nodes, 1 + 6 + 2 * 10)
+
+    def test_win(self):
+        # X to win at 2 with O threatening 5
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        for index in (0, 1):
+            game.add_cross(index)
+        for index in (3, 4):
+            game.add_circle(index)
+        np.random.seed(123)
+        move, _ = tree.get_best_move(game, max_rollouts=1000)
+        self.assertEqual(move, 2)
+
+    def test_reroot(self):
+        game = Game(n_rows=4, n_cols=4, n_connects=3)
+        t = tree.Tree(4, 4, 3)
+        root = t.add_root(game.board_x, game.board_o)
+        for it in range(1, 2001):
+            leaf = t.expand(t.select(root, it))
+            t.backpropagate(leaf, t.simulate(leaf))
+
+        node = root
+        for _ in range(2):
+            children = t.get_children(node)
+            node = int(children[np.argmax(t.n_selected[children])])
+        subtree = t.reroot(node)
+
+        self.assertEqual(subtree.n_selected[0], t.n_selected[node])
+        self.assertEqual(subtree.parent[0], tree.NO_NODE)
+        self.assertEqual(subtree.depth[0], 0)
+        self.assertLess(subtree.n_nodes, t.n_nodes)
+        # same subtree, visited in the same order
+        old_nodes, new_nodes = [node], [0]
+        while old_nodes:
+            old, new = old_nodes.pop(), new_nodes.pop()
+            self.assertEqual(int(subtree.board_x[new]), int(t.board_x[old]))
+            self.assertEqual(int(subtree.board_o[new]), int(t.board_o[old]))
+            self.assertEqual(subtree.n_wins[new], t.n_wins[old])
+            self.assertEqual(subtree.n_actions[new], t.n_actions[old])
+            self.assertEqual(subtree.n_children[new], t.n_children[old])
+            if t.first_slot[old] == tree.NO_NODE:
+                self.assertEqual(subtree.first_slot[new], tree.NO_NODE)
+                continue
+            for new_child in subtree.get_children(new):
+                self.assertEqual(subtree.parent[new_child], new)
+            old_nodes.extend(int(child) for child in t.get_children(old))
+            new_nodes.extend(int(child) for child in subtree.get_children(new))
+        self.assertEqual(len(new_nodes), 0)
+
+        # and the search goes on from it
+        for it in range(1, 101):
+            leaf = subtree.expand(subtree.select(0, it))
+            subtree.backpropagate(leaf, subtree.simulate(leaf))
+        self.assertEqual(subtree.n_selected[0], t.n_selected[node] + 100)
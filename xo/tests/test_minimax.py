@@ -0,0 +1,143 @@
+import time
+from django.test import TestCase
+from xo import board_utils
+from xo.models import Game
+from xo.minimax import minimax, bitboard, zobrist
+from xo.minimax.transposition_table import TTable, State, get_ttable
+
+
+def search(board_x, board_o, n_rows, n_cols, n_connects, depth, pvs):
+    """Iterative deepening up to depth with a fresh table and no time
+    limit, returns the value for the player to move and the search.
+    """
+    keys = zobrist.compute_keys(board_x, board_o, n_rows, n_cols, n_connects)
+    state = State(n_rows, n_cols, n_connects, board_x, board_o, keys)
+    n_cells = n_rows * n_cols
+    marker = board_utils.get_next_player(board_x, board_o, n_cells)
+    color = 1 if marker == board_utils.MARKER_X else -1
+    context = minimax.SearchContext(TTable(1), n_cells, pvs)
+
+    utility = None
+    for d in range(1, depth + 1):
+        utility, _, _ = minimax.get_root_negamax(
+            state, marker, d, color, context, utility)
+    return utility, context
+
+
+class PVSTest(TestCase):
+    def test_pvs_finds_same_value(self):
+        n_rows, n_cols, n_connects = 3, 3, 3
+        boards = [
+            (0, 0),
+            # X in the corner, O in the center
+            (0b000000001, 0b000010000),
+            # X to move and win at index 2
+            (0b000010011, 0b001100000),
+            # O answers X in the center on an edge
+            (0b000010000, 0b000000010),
+        ]
+        for board_x, board_o in boards:
+            n_empty = 9 - bin(board_x | board_o).count('1')
+            args = (board_x, board_o, n_rows, n_cols, n_connects, n_empty)
+            expected, _ = search(*args, pvs=False)
+            result, _ = search(*args, pvs=True)
+            self.assertEqual(result, expected, (board_x, board_o))
+
+    def test_aspiration_window_finds_same_value(self):
+        # depth limited values of a 4x4 board change between the
+        # iterations so the window around the previous value can fail
+        n_rows, n_cols, n_connects = 4, 4, 3
+        expected, _ = search(0, 0, n_rows, n_cols, n_connects, 4, pvs=False)
+        result, context = search(0, 0, n_rows, n_cols, n_connects, 4, pvs=True)
+        self.assertEqual(result, expected)
+        self.assertGreater(context.stats.n_nodes, 0)
+
+
+class MoveOrderingTest(TestCase):
+    def test_hash_move_then_killers_then_history(self):
+        n_cells = 9
+        context = minimax.SearchContext(TTable(1), n_cells)
+        context.add_cutoff(board_utils.MARKER_X, 6, 1, 2)
+        context.add_cutoff(board_utils.MARKER_X, 7, 1, 2)
+        # the history of the other player does not count
+        context.add_cutoff(board_utils.MARKER_O, 1, 5, 0)
+        context.add_cutoff(board_utils.MARKER_X, 3, 3, 0)
+
+        empty_indexes = [0, 1, 2, 3, 5, 6, 7]
+        ordered = minimax.order_moves(empty_indexes, board_utils.MARKER_X, 5, 2, context)
+        self.assertEqual(ordered, [5, 7, 6, 3, 0, 1, 2])
+
+        # killers that are not empty anymore are skipped
+        empty_indexes = [0, 1, 2, 3, 6]
+        ordered = minimax.order_moves(empty_indexes, board_utils.MARKER_X, None, 2, context)
+        self.assertEqual(ordered, [6, 3, 0, 1, 2])
+
+
+class BudgetTest(TestCase):
+    def setUp(self):
+        self.game = Game(n_rows=5, n_cols=5, n_connects=4)
+        self.game.add_cross(12)
+        get_ttable(5, 5, 4).clear()
+
+    def test_interrupted_iteration_is_discarded(self):
+        expected, _ = minimax.get_best_move(self.game, max_depth=1)
+        get_ttable(5, 5, 4).clear()
+        # enough nodes for the root and its 24 children at depth 1 but
+        # not for depth 2
+        result, _ = minimax.get_best_move(self.game, max_nodes=26)
+        self.assertEqual(result, expected)
+
+    def test_no_completed_iteration_returns_a_move(self):
+        result, _ = minimax.get_best_move(self.game, max_nodes=3)
+        self.assertIn(result, self.game.empty_indexes)
+
+    def test_time_limit_is_kept(self):
+        start = time.monotonic()
+        result, _ = minimax.get_best_move(self.game, time_limit=0.2)
+        took = time.monotonic() - start
+        self.assertIn(result, self.game.empty_indexes)
+        self.assertLess(took, 0.5)
+
+
+class BitboardTest(TestCase):
+    def test_same_search_as_minimax(self):
+        games = [
+            ((3, 3, 3), [], []),
+            ((3, 3, 3), [4], [0]),
+            ((4, 4, 3), [5], []),
+            ((4, 4, 4), [5, 10], [6]),
+            ((5, 5, 4), [12], [6]),
+        ]
+        for (n_rows, n_cols, n_connects), crosses, circles in games:
+            game = Game(n_rows=n_rows, n_cols=n_cols, n_connects=n_connects)
+            for index in crosses:
+                game.add_cross(index)
+            for index in circles:
+                game.add_circle(index)
+            for pvs in (False, True):
+                results = list()
+                for engine in (minimax, bitboard):
+                    get_ttable(n_rows, n_cols, n_connects).clear()
+                    move, stats = engine.get_best_move(game, pvs=pvs, max_depth=4)
+                    results.append((move, stats.n_nodes, stats.n_tt_hits))
+                self.assertEqual(results[0], results[1], (game, pvs))
+
+
+class SymmetryPruningTest(TestCase):
+    def test_root_moves(self):
+        # the root and one child per class of symmetric moves
+        for (n_rows, n_cols, n_connects), n_unique in (((3, 3, 3), 3), ((5, 5, 4), 6)):
+            game = Game(n_rows=n_rows, n_cols=n_cols, n_connects=n_connects)
+            for engine in (minimax, bitboard):
+                get_ttable(n_rows, n_cols, n_connects).clear()
+                _, stats = engine.get_best_move(game, max_depth=1)
+                self.assertEqual(stats.n_nodes, 1 + n_unique)
+
+    def test_same_value(self):
+        # the center of 3x3 leaves 2 classes of replies, a corner that
+        # draws and an edge that loses
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        game.add_cross(4)
+        get_ttable(3, 3, 3).clear()
+        move, _ = minimax.get_best_move(game)
+        self.assertIn(move, (0, 2, 6, 8))
@@ -0,0 +1,32 @@
+from django.test import TestCase, override_settings
+from xo import pool
+from xo.models import Game
+from xo.minimax import minimax, parallel
+
+
+@override_settings(XO_SEARCH_WORKERS=2)
+class ParallelMinimaxTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        pool.shutdown_pool()
+        super().tearDownClass()
+
+    def test_takes_the_win(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        # X to move and win at index 2
+        game.board_x = 0b000010011
+        game.board_o = 0b001100000
+        result, _ = parallel.get_best_move(game, time_limit=5)
+        self.assertEqual(result, 2)
+
+    def test_blocks_the_win(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        # O to move and has to block the top row at index 2
+        game.board_x = 0b000000011
+        game.board_o = 0b000010000
+        result, _ = parallel.get_best_move(game, time_limit=5)
+        self.assertEqual(result, 2)
+
+    def test_pool_is_reused(self):
+        executor = pool.get_pool()
+        self.assertIs(pool.get_pool(), executor)
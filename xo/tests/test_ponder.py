@@ -0,0 +1,122 @@
+import time
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from xo import ponder
+from xo.models import Game
+from xo.players import MinimaxPlayer
+from xo.minimax.minimax import SearchTimeout
+from xo.minimax.transposition_table import State, get_ttable
+
+
+def make_game(n_rows=3, n_cols=3, n_connects=3):
+    game = Game(n_rows=n_rows, n_cols=n_cols, n_connects=n_connects,
+                player_x='xo.players.BitboardMinimaxPlayer', player_o='human')
+    game.save()
+    return game
+
+
+@override_settings(XO_PONDER=True, XO_PONDER_TIME_LIMIT=5)
+class PonderTest(TestCase):
+    def tearDown(self):
+        ponderer = ponder.ponder_registry.pop('ponderer', None)
+        if ponderer is not None:
+            ponderer.cancel()
+
+    def test_replies_searched(self):
+        game = make_game()
+        game.add_cross(4)
+        get_ttable(3, 3, 3).clear()
+        ponderer = ponder.start_pondering(game)
+        self.assertIsNotNone(ponderer)
+        ponderer.thread.join()
+
+        # every reply solved and left in the table
+        self.assertEqual(sorted(ponderer.pondered), game.empty_indexes)
+        for index in game.empty_indexes:
+            reply = ponder.make_reply(game, index)
+            state = State(3, 3, 3, reply.board_x, reply.board_o)
+            self.assertIsNotNone(get_ttable(3, 3, 3).get_cache(state))
+
+        stats = ponder.stop_pondering(game.pk, 0)
+        self.assertEqual(stats.max_depth, 7)
+        self.assertNotIn('ponderer', ponder.ponder_registry)
+
+    def test_cancel(self):
+        game = make_game(5, 5, 4)
+        game.add_cross(12)
+        ponderer = ponder.start_pondering(game)
+        time.sleep(0.1)
+
+        start = time.monotonic()
+        ponder.stop_pondering(game.pk, 0)
+        self.assertLess(time.monotonic() - start, 1.)
+        self.assertFalse(ponderer.thread.is_alive())
+        self.assertEqual(ponderer.pondered, dict())
+
+    def test_other_game_not_stopped(self):
+        game = make_game(5, 5, 4)
+        game.add_cross(12)
+        ponderer = ponder.start_pondering(game)
+        self.assertIsNone(ponder.stop_pondering(game.pk + 1, 0))
+        self.assertTrue(ponderer.thread.is_alive())
+
+    def test_duty_cycle(self):
+        game = make_game(5, 5, 4)
+        game.add_cross(12)
+        ponderer = ponder.Ponderer(game, MinimaxPlayer(), 0.25, 5)
+        ponderer.busy_start = time.monotonic() - ponder.SLICE
+
+        # three times the slice off the cpu
+        start = time.monotonic()
+        ponderer.throttle()
+        self.assertGreaterEqual(time.monotonic() - start, 3 * ponder.SLICE)
+
+        ponderer.cancel_event.set()
+        with self.assertRaises(SearchTimeout):
+            ponderer.throttle()
+
+    def test_live_search(self):
+        game = make_game(5, 5, 4)
+        game.add_cross(12)
+        ponderer = ponder.start_pondering(game)
+
+        def get_holders(seconds):
+            holders = set()
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                holders.add(ponder.live_state['ponderer'])
+                time.sleep(0.001)
+            return holders
+
+        # searching, but off the tables in the pauses of the duty cycle
+        self.assertIn(ponderer, get_holders(0.2))
+        with ponder.live_search():
+            self.assertEqual(get_holders(0.2), {None})
+            self.assertTrue(ponderer.thread.is_alive())
+        self.assertIn(ponderer, get_holders(0.2))
+
+        ponder.stop_pondering(game.pk, 0)
+        self.assertIsNone(ponder.live_state['ponderer'])
+        self.assertEqual(ponder.live_state['n_searches'], 0)
+
+    def test_board_update(self):
+        game = make_game()
+        response = self.client.get(reverse('xo:board_update'), {'game_id': game.pk})
+        self.assertIsNotNone(response.json()['move'])
+        ponderer = ponder.ponder_registry['ponderer']
+        self.assertEqual(ponderer.game_id, game.pk)
+
+        game.refresh_from_db()
+        index = game.empty_indexes[0]
+        self.client.get(reverse('xo:board_update'), {
+            'game_id': game.pk,
+            'row_index': index // 3,
+            'col_index': index % 3,
+        })
+        self.assertFalse(ponderer.thread.is_alive())
+
+    @override_settings(XO_PONDER=False)
+    def test_off_by_default(self):
+        game = make_game()
+        game.add_cross(4)
+        self.assertIsNone(ponder.start_pondering(game))
@@ -0,0 +1,73 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from xo import stats
+from xo.models import Game
+from xo.minimax import minimax
+from xo.minimax.transposition_table import get_ttable
+
+
+class SearchStatsTest(TestCase):
+    def test_add(self):
+        a = stats.SearchStats('minimax')
+        a.n_nodes = 100
+        a.max_depth = 2
+        a.add_time('search', 0.5)
+        b = stats.SearchStats('minimax')
+        b.n_nodes = 300
+        b.n_tt_probes = 10
+        b.n_tt_hits = 4
+        b.max_depth = 3
+        b.add_time('search', 1.5)
+        b.add_time('setup', 0.1)
+
+        a.add(b)
+        self.assertEqual(a.n_moves, 2)
+        self.assertEqual(a.n_nodes, 400)
+        self.assertEqual(a.max_depth, 3)
+        self.assertAlmostEqual(a.time, 2.1)
+        self.assertAlmostEqual(a.nps, 400 / 2.1)
+        self.assertAlmostEqual(a.tt_hit_rate, 0.4)
+
+    def test_ebf(self):
+        s = stats.SearchStats('minimax')
+        self.assertEqual(s.ebf, 0.)
+        s.n_nodes = 1000
+        s.max_depth = 3
+        self.assertAlmostEqual(s.ebf, 10.)
+
+    def test_minimax_stats(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        game.add_cross(4)
+        get_ttable(3, 3, 3).clear()
+        _, s = minimax.get_best_move(game)
+        # solved to the end of the game
+        self.assertEqual(s.max_depth, 8)
+        self.assertEqual(s.n_iterations, 8)
+        self.assertGreater(s.n_nodes, 0)
+        self.assertGreaterEqual(s.n_tt_probes, s.n_tt_hits)
+        self.assertGreaterEqual(s.n_tt_hits, s.n_tt_cutoffs)
+        self.assertGreater(s.n_tt_cutoffs, 0)
+        self.assertEqual(list(s.phase_times), ['setup', 'search'])
+
+
+@override_settings(XO_DEBUG_STATS=True)
+class BoardUpdateStatsTest(TestCase):
+    def test_stats_in_response(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3,
+                    player_x='xo.players.MinimaxPlayer', player_o='human')
+        game.save()
+        stats.stats_registry.clear()
+
+        response = self.client.get(reverse('xo:board_update'), {'game_id': game.pk})
+        data = response.json()
+        self.assertEqual(data['stats']['engine'], 'minimax')
+        self.assertEqual(data['stats_totals']['minimax']['n_moves'], 1)
+        self.assertEqual(data['stats_totals']['minimax']['n_nodes'], data['stats']['n_nodes'])
+
+    @override_settings(XO_DEBUG_STATS=False)
+    def test_no_stats_without_flag(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3,
+                    player_x='xo.players.MinimaxPlayer', player_o='human')
+        game.save()
+        response = self.client.get(reverse('xo:board_update'), {'game_id': game.pk})
+        self.assertNotIn('stats', response.json())
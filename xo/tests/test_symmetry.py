@@ -0,0 +1,112 @@
+import random
+from django.test import TestCase
+from xo import symmetry
+from xo.models import Game
+from xo.mcts.algorithm import Node
+
+
+def random_board(rng, n_cells):
+    board_x, board_o = 0, 0
+    for index in range(n_cells):
+        v = rng.randint(0, 2)
+        if v == 1:
+            board_x |= 1 << index
+        elif v == 2:
+            board_o |= 1 << index
+    return board_x, board_o
+
+
+class SymmetryTest(TestCase):
+    def test_get_transforms(self):
+        self.assertEqual(len(symmetry.get_transforms(3, 3)), 8)
+        self.assertEqual(len(symmetry.get_transforms(5, 5)), 8)
+        self.assertEqual(len(symmetry.get_transforms(3, 4)), 4)
+
+    def test_permutations_are_distinct(self):
+        for n_rows, n_cols in ((3, 3), (4, 4), (3, 5)):
+            n_cells = n_rows * n_cols
+            permutations = set()
+            for _, permutation, _ in symmetry.get_symmetries(n_rows, n_cols):
+                assert sorted(permutation) == list(range(n_cells))
+                permutations.add(permutation)
+            n_transforms = len(symmetry.get_transforms(n_rows, n_cols))
+            self.assertEqual(len(permutations), n_transforms)
+
+    def test_rotate_90_3x3(self):
+        n_rows, n_cols = 3, 3
+        # top row goes to the right column
+        board = 0b000000111
+        rotated = symmetry.apply_transform(board, symmetry.ROTATE_90, n_rows, n_cols)
+        expected = 0b100100100
+        self.assertEqual(rotated, expected)
+
+    def test_inverse_undoes_transform(self):
+        rng = random.Random(123)
+        for n_rows, n_cols in ((3, 3), (5, 5), (4, 3)):
+            n_cells = n_rows * n_cols
+            for transform in symmetry.get_transforms(n_rows, n_cols):
+                inverse = symmetry.get_inverse(transform)
+                for _ in range(20):
+                    board, _ = random_board(rng, n_cells)
+                    moved = symmetry.apply_transform(board, transform, n_rows, n_cols)
+                    moved = symmetry.apply_transform(moved, inverse, n_rows, n_cols)
+                    self.assertEqual(moved, board)
+
+    def test_canonicalize_symmetric_positions(self):
+        rng = random.Random(123)
+        for n_rows, n_cols in ((3, 3), (4, 4), (5, 3)):
+            n_cells = n_rows * n_cols
+            for _ in range(50):
+                board_x, board_o = random_board(rng, n_cells)
+                expected = symmetry.canonicalize(board_x, board_o, n_rows, n_cols)
+
+                for transform in symmetry.get_transforms(n_rows, n_cols):
+                    board_x_t = symmetry.apply_transform(board_x, transform, n_rows, n_cols)
+                    board_o_t = symmetry.apply_transform(board_o, transform, n_rows, n_cols)
+                    canonical = symmetry.canonicalize(board_x_t, board_o_t, n_rows, n_cols)
+                    self.assertEqual(canonical[:2], expected[:2])
+
+                    # the transform maps the board onto the canonical pair
+                    canonical_x = symmetry.apply_transform(board_x_t, canonical[2], n_rows, n_cols)
+                    canonical_o = symmetry.apply_transform(board_o_t, canonical[2], n_rows, n_cols)
+                    self.assertEqual((canonical_x, canonical_o), canonical[:2])
+
+    def test_unique_moves_of_empty_board(self):
+        for (n_rows, n_cols), n_unique in (((3, 3), 3), ((4, 4), 3), ((5, 5), 6), ((3, 4), 4)):
+            n_cells = n_rows * n_cols
+            stabilizer = symmetry.get_stabilizer(0, 0, n_rows, n_cols)
+            self.assertEqual(len(stabilizer), len(symmetry.get_transforms(n_rows, n_cols)))
+            unique = symmetry.get_unique_moves(list(range(n_cells)), stabilizer)
+            self.assertEqual(len(unique), n_unique)
+
+    def test_child_stabilizer(self):
+        rng = random.Random(123)
+        for n_rows, n_cols in ((3, 3), (4, 4), (5, 5), (3, 4)):
+            n_cells = n_rows * n_cols
+            for _ in range(20):
+                board_x, board_o = 0, 0
+                stabilizer = symmetry.get_stabilizer(board_x, board_o, n_rows, n_cols)
+                for index in rng.sample(range(n_cells), rng.randint(1, 4)):
+                    # the player to move is on board_x
+                    board_x, board_o = board_o, board_x | 1 << index
+                    stabilizer = symmetry.get_child_stabilizer(stabilizer, index)
+                    expected = symmetry.get_stabilizer(board_x, board_o, n_rows, n_cols)
+                    self.assertTrue(set(stabilizer) <= set(expected))
+                    self.assertEqual(stabilizer[0], tuple(range(n_cells)))
+
+    def test_mcts_root_children(self):
+        game = Game(n_rows=5, n_cols=5, n_connects=4)
+        root = Node.make_root(game)
+        self.assertEqual(len(root.children), 6)
+
+        # a corner of 3x3 leaves the diagonal as the only symmetry
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        game.add_cross(0)
+        root = Node.make_root(game)
+        self.assertEqual(len(root.children), 5)
+        for child in root.children:
+            n_unique = len(child.next_action_indexes)
+            if child.action in (4, 8):
+                self.assertEqual(n_unique, 4)
+            else:
+                self.assertEqual(n_unique, 7)
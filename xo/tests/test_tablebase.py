@@ -0,0 +1,82 @@
+import os
+import tempfile
+from django.test import TestCase
+from xo import board_utils, tablebase
+from xo.models import Game
+from xo.players import MinimaxPlayer, MCTSPlayer
+
+
+def solve_by_search(board_x, board_o, n_rows, n_cols, n_connects, cache):
+    """Plain negamax over all the moves for the (value, distance) of the
+    player to move.
+    """
+    key = (board_x, board_o)
+    if key in cache:
+        return cache[key]
+    value = tablebase.get_terminal_value(board_x, board_o, n_rows, n_cols, n_connects)
+    if value is not None:
+        return value, 0
+
+    best = None
+    n_cells = n_rows * n_cols
+    for _, child_x, child_o in tablebase.get_children(board_x, board_o, n_cells):
+        child = solve_by_search(child_x, child_o, n_rows, n_cols, n_connects, cache)
+        outcome = (-child[0], child[1] + 1)
+        if best is None or tablebase.get_rank(*outcome) > tablebase.get_rank(*best):
+            best = outcome
+    cache[key] = best
+    return best
+
+
+class TablebaseTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        n_rows, n_cols, n_connects = 3, 3, 3
+        solved = tablebase.solve(n_rows, n_cols, n_connects)
+        fname = tablebase.get_tablebase_fname(n_rows, n_cols, n_connects)
+        cls.path = os.path.join(cls.tmp_dir.name, fname)
+        tablebase.dump_tablebase(cls.path, n_rows, n_cols, n_connects, *solved)
+
+    @classmethod
+    def tearDownClass(cls):
+        tablebase.tablebase_registry.clear()
+        cls.tmp_dir.cleanup()
+        super().tearDownClass()
+
+    def test_3x3_values(self):
+        tb = tablebase.Tablebase(self.path)
+        # all the reachable positions up to symmetry
+        self.assertEqual(tb.n_entries, 765)
+        self.assertEqual(tb.get_entry(0, 0), (tablebase.DRAW, 9))
+
+        cache = dict()
+        n_cells = 9
+        to_visit = [(0, 0)]
+        visited = set(to_visit)
+        while to_visit:
+            board_x, board_o = to_visit.pop()
+            expected = solve_by_search(board_x, board_o, 3, 3, 3, cache)
+            self.assertEqual(tb.get_entry(board_x, board_o), expected)
+            if tablebase.get_terminal_value(board_x, board_o, 3, 3, 3) is not None:
+                continue
+            for _, child_x, child_o in tablebase.get_children(board_x, board_o, n_cells):
+                if (child_x, child_o) not in visited:
+                    visited.add((child_x, child_o))
+                    to_visit.append((child_x, child_o))
+
+    def test_players_answer_from_tablebase(self):
+        loaded = tablebase.load_tablebases(self.tmp_dir.name)
+        self.assertEqual(len(loaded), 1)
+
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        # X wins right away at index 2 or 7, the lowest index is taken
+        game.board_x = 0b000010011
+        game.board_o = 0b100100000
+        for player in (MinimaxPlayer(), MCTSPlayer()):
+            self.assertEqual(player.play(game), 2)
+
+        # no tablebase for 4x4
+        game = Game(n_rows=4, n_cols=4, n_connects=4)
+        self.assertEqual(tablebase.get_best_move(game), (None, None))
@@ -0,0 +1,87 @@
+from django.test import TestCase
+from xo import win_state_utils
+from xo.models import Game
+from xo.minimax import minimax, bitboard, threats
+from xo.minimax.transposition_table import get_ttable
+
+
+def get_board(indexes):
+    return sum(1 << index for index in indexes)
+
+
+# X to move on 5x5 with 4 in a row, 12 starts a VCF of two moves:
+#  O.O.X
+#  ..X..
+#  .X...
+#  O.XXO
+#  ...O.
+VCF_X = get_board([4, 7, 11, 17, 18])
+VCF_O = get_board([0, 2, 15, 19, 23])
+
+
+class ThreatsTest(TestCase):
+    def setUp(self):
+        self.wins = win_state_utils.get_board_wins(5, 5, 4)
+        self.full = (1 << 25) - 1
+
+    def test_threat_cells(self):
+        own = get_board([0, 1, 2])
+        fours, threes = threats.get_threat_cells(own, 0, self.wins)
+        self.assertEqual(fours, get_board([3]))
+        self.assertTrue(threes & get_board([4]))
+
+        # blocked lines are not threats
+        fours, _ = threats.get_threat_cells(own, get_board([3]), self.wins)
+        self.assertEqual(fours, 0)
+
+    def test_vcf(self):
+        self.assertEqual(threats.find_vcf(VCF_X, VCF_O, self.wins, self.full, 10), 12)
+        # but not for O
+        self.assertIsNone(threats.find_vcf(VCF_O, VCF_X, self.wins, self.full, 10))
+        # nor within a single move
+        self.assertIsNone(threats.find_vcf(VCF_X, VCF_O, self.wins, self.full, 1))
+        self.assertEqual(threats.find_vcf(VCF_X, VCF_O, self.wins, self.full, 2), 12)
+
+    def test_forced_move(self):
+        # the block of the only four of the opponent
+        other = get_board([0, 1, 2])
+        own = get_board([10, 20])
+        self.assertEqual(threats.get_forced_move(own, other, self.wins, self.full), 3)
+        # own win comes first
+        own = get_board([10, 15, 20])
+        self.assertEqual(threats.get_forced_move(own, other, self.wins, self.full), 5)
+
+    def test_quiescence(self):
+        # two fours of the opponent
+        other = get_board([0, 1, 2, 5, 10])
+        own = get_board([7, 13, 19, 20, 24])
+        value = threats.get_quiescence(own, other, self.wins, self.full, 25)
+        self.assertEqual(value, -25)
+        value = threats.get_quiescence(VCF_X, VCF_O, self.wins, self.full, 25)
+        self.assertEqual(value, 25)
+        self.assertIsNone(threats.get_quiescence(0, 0, self.wins, self.full, 25))
+
+    def test_root_precheck(self):
+        game = Game(n_rows=5, n_cols=5, n_connects=4, board_x=VCF_X, board_o=VCF_O)
+        for engine in (minimax, bitboard):
+            move, stats = engine.get_best_move(game, threat_search=True)
+            self.assertEqual(move, 12)
+            self.assertEqual(stats.n_nodes, 0)
+            self.assertGreater(stats.n_threat_nodes, 0)
+
+    def test_same_search_as_minimax(self):
+        games = [
+            ((4, 4, 3), [5], []),
+            ((5, 5, 4), [12], [6]),
+            ((5, 5, 4), [12, 7], [6, 13]),
+        ]
+        for (n_rows, n_cols, n_connects), crosses, circles in games:
+            game = Game(n_rows=n_rows, n_cols=n_cols, n_connects=n_connects,
+                        board_x=get_board(crosses), board_o=get_board(circles))
+            results = list()
+            for engine in (minimax, bitboard):
+                get_ttable(n_rows, n_cols, n_connects).clear()
+                move, stats = engine.get_best_move(game, max_depth=3, threat_search=True)
+                results.append((move, stats.n_nodes, stats.n_threat_nodes))
+            self.assertEqual(results[0], results[1], game)
+            self.assertGreater(results[0][2], 0)
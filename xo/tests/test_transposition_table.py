@@ -0,0 +1,270 @@
+import os, tempfile
+from django.test import TestCase
+from xo import board_utils, symmetry
+from xo.minimax import zobrist, snapshot
+from xo.minimax.minimax import mark_cell
+from xo.minimax.transposition_table import TTable, SharedTTable, State, get_ttable
+
+
+def make_state(board_x, board_o, n_rows, n_cols, n_connects):
+    keys = zobrist.compute_keys(board_x, board_o, n_rows, n_cols, n_connects)
+    return State(n_rows, n_cols, n_connects, board_x, board_o, keys)
+
+
+def find_same_bucket_states(ttable, n_states, n_rows, n_cols, n_connects):
+    """Different positions that go to the same bucket of ttable.
+    """
+    states = list()
+    keys = set()
+    board_x = 1
+    while len(states) < n_states:
+        state = make_state(board_x, 0, n_rows, n_cols, n_connects)
+        key = zobrist.get_key(state.keys)
+        is_same_bucket = not keys or \
+            (key & ttable.bucket_mask) == (min(keys) & ttable.bucket_mask)
+        if is_same_bucket and key not in keys:
+            states.append(state)
+            keys.add(key)
+        board_x += 1
+    return states
+
+
+class ZobristTest(TestCase):
+    def test_incremental_keys_match_compute_keys(self):
+        n_rows, n_cols, n_connects = 4, 4, 3
+        state = make_state(0, 0, n_rows, n_cols, n_connects)
+        marker = board_utils.MARKER_X
+        for index in (5, 0, 15, 10, 3):
+            state = mark_cell(state, marker, index)
+            marker = board_utils.get_opposite_marker(marker)
+
+            expected = zobrist.compute_keys(state.board_x, state.board_o,
+                                            n_rows, n_cols, n_connects)
+            self.assertEqual(state.keys, expected)
+
+    def test_symmetric_positions_share_key(self):
+        n_rows, n_cols, n_connects = 3, 3, 3
+        board_x = 0b000000011
+        board_o = 0b000010000
+        key = zobrist.get_key(zobrist.compute_keys(
+            board_x, board_o, n_rows, n_cols, n_connects))
+
+        for transform in symmetry.get_transforms(n_rows, n_cols):
+            board_x_t = symmetry.apply_transform(board_x, transform, n_rows, n_cols)
+            board_o_t = symmetry.apply_transform(board_o, transform, n_rows, n_cols)
+            keys = zobrist.compute_keys(board_x_t, board_o_t, n_rows, n_cols, n_connects)
+            self.assertEqual(zobrist.get_key(keys), key)
+
+        # a different position has a different key
+        keys = zobrist.compute_keys(board_o, board_x, n_rows, n_cols, n_connects)
+        self.assertNotEqual(zobrist.get_key(keys), key)
+
+
+class TTableTest(TestCase):
+    def test_save_and_get_cache(self):
+        n_rows, n_cols, n_connects = 3, 3, 3
+        ttable = TTable()
+        state = make_state(0b000000001, 0b000010000, n_rows, n_cols, n_connects)
+        self.assertIsNone(ttable.get_cache(state))
+
+        ttable.save_cache(state, 3, 1, board_utils.LOWER)
+        cache = ttable.get_cache(state)
+        self.assertEqual(cache.depth, 3)
+        self.assertEqual(cache.value, 1)
+        self.assertEqual(cache.flag, board_utils.LOWER)
+
+        # the corner and center position reflected on the y axis
+        reflected = make_state(0b000000100, 0b000010000, n_rows, n_cols, n_connects)
+        self.assertEqual(ttable.get_cache(reflected), cache)
+
+    def test_move_is_mapped_to_symmetric_position(self):
+        n_rows, n_cols, n_connects = 3, 3, 3
+        ttable = TTable()
+        # X in the top left corner, best move for O is the center
+        state = make_state(0b000000001, 0, n_rows, n_cols, n_connects)
+        ttable.save_cache(state, 8, 0, board_utils.EXACT, 4)
+        self.assertEqual(ttable.get_cache(state).move, 4)
+
+        # X in the top left corner and O in the top right, X to play at
+        # the bottom left corner
+        state = make_state(0b000000001, 0b000000100, n_rows, n_cols, n_connects)
+        ttable.save_cache(state, 7, 1, board_utils.EXACT, 6)
+
+        # the same position rotated by 90 degrees clockwise
+        rotated = make_state(0b000000100, 0b100000000, n_rows, n_cols, n_connects)
+        cache = ttable.get_cache(rotated)
+        self.assertEqual(cache.value, 1)
+        self.assertEqual(cache.move, 0)
+
+    def test_capacity_is_bounded(self):
+        n_rows, n_cols, n_connects = 5, 5, 3
+        ttable = TTable(size_mb=0.001)
+        n_entries = len(ttable.table)
+        nbytes = ttable.table.nbytes
+
+        board_o = 0
+        for board_x in range(1, 4 * n_entries):
+            state = make_state(board_x, board_o, n_rows, n_cols, n_connects)
+            ttable.save_cache(state, board_x % 5, 0, board_utils.EXACT)
+
+        self.assertEqual(len(ttable.table), n_entries)
+        self.assertEqual(ttable.table.nbytes, nbytes)
+        self.assertLessEqual(ttable.n_stored, n_entries)
+        self.assertGreater(ttable.n_collisions, 0)
+
+    def test_deeper_entry_is_kept(self):
+        n_rows, n_cols, n_connects = 5, 5, 3
+        ttable = TTable(size_mb=0.001)
+
+        states = find_same_bucket_states(ttable, 3, n_rows, n_cols, n_connects)
+        deep, shallow, other = states
+        ttable.save_cache(deep, 5, 1, board_utils.EXACT)
+        ttable.save_cache(shallow, 1, 2, board_utils.EXACT)
+        ttable.save_cache(other, 1, 3, board_utils.EXACT)
+
+        self.assertEqual(ttable.get_cache(deep).value, 1)
+        self.assertIsNone(ttable.get_cache(shallow))
+        self.assertEqual(ttable.get_cache(other).value, 3)
+
+    def test_stale_entry_is_replaced_first(self):
+        n_rows, n_cols, n_connects = 5, 5, 3
+        ttable = TTable(size_mb=0.001)
+
+        states = find_same_bucket_states(ttable, 3, n_rows, n_cols, n_connects)
+        old, new, newer = states
+        ttable.save_cache(old, 5, 1, board_utils.EXACT)
+        ttable.new_search()
+        # the old deep entry moves to the always-replace entry
+        ttable.save_cache(new, 1, 2, board_utils.EXACT)
+        self.assertEqual(ttable.get_cache(old).value, 1)
+        self.assertEqual(ttable.get_cache(new).value, 2)
+
+        # and is then replaced before the current one
+        ttable.save_cache(newer, 0, 3, board_utils.EXACT)
+        self.assertIsNone(ttable.get_cache(old))
+        self.assertEqual(ttable.get_cache(new).value, 2)
+        self.assertEqual(ttable.get_cache(newer).value, 3)
+
+    def test_get_ttable_is_shared(self):
+        ttable = get_ttable(3, 3, 3)
+        self.assertIs(get_ttable(3, 3, 3), ttable)
+        self.assertIsNot(get_ttable(3, 3, 4), ttable)
+        # no more entries than 3x3 boards
+        self.assertLessEqual(len(ttable.table), 3 ** 9)
+
+
+class SharedTTableTest(TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.bin')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_tables_on_same_file_share_entries(self):
+        n_rows, n_cols, n_connects = 4, 4, 3
+        ttable = SharedTTable(self.path, size_mb=0.01)
+        other = SharedTTable(self.path, size_mb=0.01)
+
+        state = make_state(0b1, 0b10, n_rows, n_cols, n_connects)
+        self.assertIsNone(other.get_cache(state))
+        ttable.save_cache(state, 4, -3, board_utils.UPPER, 5)
+
+        cache = other.get_cache(state)
+        self.assertEqual(cache.depth, 4)
+        self.assertEqual(cache.value, -3)
+        self.assertEqual(cache.flag, board_utils.UPPER)
+        self.assertEqual(cache.move, 5)
+
+        other.new_search()
+        self.assertEqual(ttable.generation, other.generation)
+
+    def test_torn_entry_is_a_miss(self):
+        n_rows, n_cols, n_connects = 4, 4, 3
+        ttable = SharedTTable(self.path, size_mb=0.01)
+        state = make_state(0b1, 0b10, n_rows, n_cols, n_connects)
+        ttable.save_cache(state, 4, 1, board_utils.EXACT, 5)
+        key = zobrist.get_key(state.keys)
+        i = ttable.find(key)
+
+        # data of another write without its check
+        ttable.datas[i] = int(ttable.datas[i]) ^ (7 << 32)
+        self.assertIsNone(ttable.get_cache(state))
+
+    def test_entry_written_during_probe_is_a_miss(self):
+        n_rows, n_cols, n_connects = 4, 4, 3
+        ttable = SharedTTable(self.path, size_mb=0.01)
+        state = make_state(0b1, 0b10, n_rows, n_cols, n_connects)
+        ttable.save_cache(state, 4, 1, board_utils.EXACT, 5)
+        key = zobrist.get_key(state.keys)
+        i = ttable.find(key)
+        checks = ttable.checks
+
+        class WrittenChecks:
+            """Another worker writes the data of the entry right after
+            its check is read.
+            """
+            def __getitem__(self, j):
+                check = checks[j]
+                if j == i:
+                    ttable.datas[i] = int(ttable.datas[i]) ^ (7 << 32)
+                return check
+
+        ttable.checks = WrittenChecks()
+        self.assertIsNone(ttable.get_cache(state))
+
+
+class SnapshotTest(TestCase):
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        fname = snapshot.get_snapshot_fname(3, 3, 3)
+        self.path = os.path.join(self.snapshot_dir, fname)
+
+    def tearDown(self):
+        for fname in os.listdir(self.snapshot_dir):
+            os.remove(os.path.join(self.snapshot_dir, fname))
+        os.rmdir(self.snapshot_dir)
+
+    def test_dump_and_load(self):
+        n_rows, n_cols, n_connects = 3, 3, 3
+        ttable = TTable(size_mb=0.01)
+        states = [
+            make_state(0b000000001, 0, n_rows, n_cols, n_connects),
+            make_state(0b000000001, 0b000010000, n_rows, n_cols, n_connects),
+            make_state(0b000010001, 0b000000010, n_rows, n_cols, n_connects),
+        ]
+        for i, state in enumerate(states):
+            ttable.save_cache(state, 5 + i, i - 1, board_utils.EXACT, 8)
+
+        n_entries = snapshot.dump_snapshot(ttable, self.path, n_rows, n_cols, n_connects)
+        self.assertEqual(n_entries, len(states))
+
+        loaded = snapshot.TTableSnapshot(self.path)
+        self.assertEqual(loaded.config, (n_rows, n_cols, n_connects))
+        self.assertEqual(loaded.n_entries, len(states))
+        self.assertFalse(loaded.records.flags.writeable)
+
+        # a cold table answers from the snapshot
+        cold = TTable(size_mb=0.01)
+        cold.snapshot = loaded
+        for i, state in enumerate(states):
+            self.assertEqual(cold.get_cache(state), ttable.get_cache(state))
+        state = make_state(0b000000010, 0, n_rows, n_cols, n_connects)
+        self.assertIsNone(cold.get_cache(state))
+
+    def test_dump_shared_ttable(self):
+        n_rows, n_cols, n_connects = 3, 3, 3
+        shared_path = os.path.join(self.snapshot_dir, 'shared.bin')
+        ttable = SharedTTable(shared_path, size_mb=0.01)
+        state = make_state(0b000000001, 0b000010000, n_rows, n_cols, n_connects)
+        ttable.save_cache(state, 7, -2, board_utils.UPPER, 2)
+
+        snapshot.dump_snapshot(ttable, self.path, n_rows, n_cols, n_connects)
+        cold = TTable(size_mb=0.01)
+        cold.snapshot = snapshot.TTableSnapshot(self.path)
+        self.assertEqual(cold.get_cache(state), ttable.get_cache(state))
+
+    def test_load_snapshots_skips_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot')
+        self.assertEqual(snapshot.load_snapshots(self.snapshot_dir), [])
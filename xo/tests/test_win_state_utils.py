@@ -268,3 +268,28 @@ class WinStateUtilsTest(TestCase):
 
         assert_msg = '{} != {}'.format(expected, wins)
         assert expected == wins, assert_msg
+
+    def test_get_board_wins_matches_str_wins(self):
+        for n_rows in range(3, 6):
+            for n_cols in range(3, 6):
+                for n_connects in range(3, max(n_rows, n_cols) + 1):
+                    args = (n_rows, n_cols, n_connects)
+                    expected = utils.compute_win_state_row(*args) \
+                        + utils.compute_win_state_col(*args) \
+                        + utils.compute_win_state_diag_l2r(*args) \
+                        + utils.compute_win_state_diag_r2l(*args)
+                    wins = utils.get_board_wins(*args)
+
+                    assert_msg = '{}: {} != {}'.format(args, expected, wins)
+                    assert sorted(expected) == sorted(wins), assert_msg
+
+    def test_get_board_wins_is_cached(self):
+        wins = utils.get_board_wins(4, 4, 3)
+        assert isinstance(wins, tuple)
+        assert wins is utils.get_board_wins(4, 4, 3)
+
+        wins_arr = utils.get_board_wins_array(4, 4, 3)
+        assert wins_arr.dtype == np.uint64
+        assert not wins_arr.flags.writeable
+        assert wins_arr is utils.get_board_wins_array(4, 4, 3)
+        assert list(wins_arr) == list(wins)
@@ -72,3 +72,11 @@ class GameModelTests(TestCase):
         self.assertEqual(board_str, expected)
 
 
+
+    def test_3x3_play_returns_result(self):
+        game = Game(n_rows=3, n_cols=3, n_connects=3)
+        self.assertIsNone(game.play(0))
+        self.assertIsNone(game.play(3))
+        self.assertIsNone(game.play(1))
+        self.assertIsNone(game.play(4))
+        self.assertEqual(game.play(2), board_utils.MARKER_X)
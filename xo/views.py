@@ -2,11 +2,14 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.shortcuts import render, redirect, get_object_or_404, reverse
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.conf import settings
 
 
 from .forms import NewGameForm, MoveForm
 from .models import Game
 from .utils import make_logger
+from .stats import get_totals
+from . import ponder
 from xo.board_utils import MARKER_O, MARKER_X
 
 
@@ -57,6 +60,7 @@ def game(request, pk):
             if game.is_next_player_human():
                 row_ind = form.cleaned_data['row_index']
                 col_ind = form.cleaned_data['col_index']
+                ponder.stop_pondering(game.pk, row_ind * game.n_cols + col_ind)
                 game.play_xy(row_ind, col_ind)
                 game.save()
             return redirect(game)
@@ -99,6 +103,9 @@ def board_update(request):
     # update game state
     game = get_object_or_404(Game, pk=game_id)
     if not (row_ind == -1 or col_ind == -1):
+        # the search of the reply picks up what pondering left in the
+        # transposition table
+        ponder.stop_pondering(game.pk, row_ind * game.n_cols + col_ind)
         game.play_xy(row_ind, col_ind)
 
     try:
@@ -106,6 +113,8 @@ def board_update(request):
     except:
         move = None
     game.save()
+    if move is not None:
+        ponder.start_pondering(game)
 
     # make message
     if game.is_game_over == MARKER_X:
@@ -126,6 +135,12 @@ def board_update(request):
         'next_player': game.next_player,
         'next_player_type': game.next_player_type,
     }
+
+    if getattr(settings, 'XO_DEBUG_STATS', settings.DEBUG):
+        search_stats = getattr(game, 'search_stats', None)
+        data['stats'] = search_stats.to_dict() if search_stats is not None else None
+        data['stats_totals'] = get_totals()
+
     info_msg = 'JSON response: ' + str(data)
     logger.info(info_msg)
     return JsonResponse(data)
@@ -142,9 +142,160 @@ def compute_win_state_diag_r2l(n_rows, n_cols, n_connects):
     return [int(s, 2) for s in win_state_str]
 
 
-def get_board_wins(n_rows, n_cols, n_connects):
-    row_wins = compute_win_state_row(n_rows, n_cols, n_connects)
-    col_wins = compute_win_state_col(n_rows, n_cols, n_connects)
-    l2r_diag_wins = compute_win_state_diag_l2r(n_rows, n_cols, n_connects)
-    r2l_diag_wins = compute_win_state_diag_r2l(n_rows, n_cols, n_connects)
+#======================================================================
+# Win mask registry
+#======================================================================
+
+# process-wide win masks keyed by (n_rows, n_cols, n_connects), these
+# never change so every caller gets the same immutable tuple
+board_wins_registry = dict()
+board_wins_array_registry = dict()
+
+
+def compute_line_wins(n_rows, n_cols, n_connects, row_step, col_step):
+    """Computes the win masks of all lines of n_connects cells going in
+    the direction (row_step, col_step) directly with bit shifts.
+
+    Cell (row_ind, col_ind) is bit row_ind * n_cols + col_ind, so a line
+    is just its first cell shifted by the index step n_connects - 1 times.
+    """
+    index_step = row_step * n_cols + col_step
+    # the line as if it starts at index 0, the starting column offset
+    # is added back for lines going from right to left
+    col_offset = -col_step * (n_connects - 1) if col_step < 0 else 0
+    line = 0
+    for i in range(n_connects):
+        line |= 1 << (i * index_step + col_offset)
+
+    row_span = row_step * (n_connects - 1)
+    col_span = abs(col_step) * (n_connects - 1)
+    wins = list()
+    for row_ind in range(n_rows - row_span):
+        for col_ind in range(n_cols - col_span):
+            shift = row_ind * n_cols + col_ind
+            wins.append(line << shift)
+    return wins
+
+
+def compute_board_wins(n_rows, n_cols, n_connects):
+    row_wins = compute_line_wins(n_rows, n_cols, n_connects, 0, 1)
+    col_wins = compute_line_wins(n_rows, n_cols, n_connects, 1, 0)
+    l2r_diag_wins = compute_line_wins(n_rows, n_cols, n_connects, 1, 1)
+    r2l_diag_wins = compute_line_wins(n_rows, n_cols, n_connects, 1, -1)
     return row_wins + col_wins + l2r_diag_wins + r2l_diag_wins
+
+
+def get_board_wins(n_rows, n_cols, n_connects):
+    """Returns the win masks of the board configuration as a tuple, they
+    are only computed the first time that a configuration is requested.
+    """
+    key = (n_rows, n_cols, n_connects)
+    wins = board_wins_registry.get(key, None)
+    if wins is None:
+        wins = tuple(compute_board_wins(n_rows, n_cols, n_connects))
+        wins = board_wins_registry.setdefault(key, wins)
+    return wins
+
+
+def get_board_wins_array(n_rows, n_cols, n_connects):
+    """Same as get_board_wins but as a read-only uint64 array for 
+    vectorized checks.
+    """
+    key = (n_rows, n_cols, n_connects)
+    wins = board_wins_array_registry.get(key, None)
+    if wins is None:
+        wins = get_board_wins(n_rows, n_cols, n_connects)
+        wins = np.array(wins, dtype=np.uint64)
+        wins.flags.writeable = False
+        wins = board_wins_array_registry.setdefault(key, wins)
+    return wins
+
+
+win_directions_registry = dict()
+
+
+def compute_win_directions(n_rows, n_cols, n_connects):
+    """For each line direction, the mask of cells that a line of 
+    n_connects cells can start from without leaving the board and the
+    shifts that check the rest of the line. These take the place of the
+    padding column of the usual connect four bitboard since a line that
+    would wrap around to the next row can never start in the mask.
+
+    The shifts double the length of the run that is checked at each 
+    step, i.e., after run &= run >> shift a bit stays set if the run 
+    starting at the cell shift away is also set, so n_connects = 5 
+    takes 3 steps rather than 4.
+    """
+    directions = list()
+    for row_step, col_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        row_span = row_step * (n_connects - 1)
+        col_span = col_step * (n_connects - 1)
+        start_mask = 0
+        for row_ind in range(n_rows):
+            for col_ind in range(n_cols):
+                is_valid = row_ind + row_span < n_rows
+                is_valid = is_valid and 0 <= col_ind + col_span < n_cols
+                if is_valid:
+                    start_mask |= 1 << (row_ind * n_cols + col_ind)
+
+        if start_mask == 0:
+            continue
+
+        index_step = row_step * n_cols + col_step
+        shifts = list()
+        covered = 1
+        while covered < n_connects:
+            step = min(covered, n_connects - covered)
+            shifts.append(step * index_step)
+            covered += step
+        directions.append((start_mask, tuple(shifts)))
+    return tuple(directions)
+
+
+def get_win_directions(n_rows, n_cols, n_connects):
+    key = (n_rows, n_cols, n_connects)
+    directions = win_directions_registry.get(key, None)
+    if directions is None:
+        directions = compute_win_directions(n_rows, n_cols, n_connects)
+        directions = win_directions_registry.setdefault(key, directions)
+    return directions
+
+
+def get_win_directions_xo(n_rows, n_cols, n_connects):
+    """Same as get_win_directions but for both boards at once with the O
+    board shifted by the returned offset above the X board, i.e., on the
+    board board_x | board_o << offset. The offset leaves enough room so
+    that the O bits never shift into the X runs.
+    """
+    key = (n_rows, n_cols, n_connects, 'xo')
+    directions = win_directions_registry.get(key, None)
+    if directions is None:
+        directions = get_win_directions(n_rows, n_cols, n_connects)
+        max_shift = max(sum(shifts) for _, shifts in directions)
+        offset = n_rows * n_cols + max_shift
+        directions = tuple(
+            (start_mask | start_mask << offset, shifts)
+            for start_mask, shifts in directions
+        )
+        directions = win_directions_registry.setdefault(key, (offset, directions))
+    return directions
+
+
+cell_wins_registry = dict()
+
+
+def get_cell_wins(n_rows, n_cols, n_connects):
+    """Reverse index from each cell to the win masks that go through it,
+    i.e., the only wins that a move at the cell can complete.
+    """
+    key = (n_rows, n_cols, n_connects)
+    cell_wins = cell_wins_registry.get(key, None)
+    if cell_wins is None:
+        wins = get_board_wins(n_rows, n_cols, n_connects)
+        n_cells = n_rows * n_cols
+        cell_wins = tuple(
+            tuple(win for win in wins if win & (1 << index))
+            for index in range(n_cells)
+        )
+        cell_wins = cell_wins_registry.setdefault(key, cell_wins)
+    return cell_wins
@@ -139,3 +139,46 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+
+# AI engines
+
+# search counters of the AI moves in the board_update responses
+XO_DEBUG_STATS = DEBUG
+
+# seconds per minimax move for the players without their own budget
+XO_MINIMAX_TIME_LIMIT = float(os.environ.get('XO_MINIMAX_TIME_LIMIT', 3))
+
+# processes of the pool of the parallel searches, all the cores if empty
+XO_SEARCH_WORKERS = int(os.environ.get('XO_SEARCH_WORKERS', 0)) or None
+
+# capacity of the minimax transposition table of each board configuration
+XO_TTABLE_SIZE_MB = int(os.environ.get('XO_TTABLE_SIZE_MB', 16))
+
+# 'local' for a transposition table per worker or 'shared' for one table 
+# on a memory-mapped file in XO_TTABLE_SHARED_DIR for all the workers,
+# defaults to /dev/shm or the temp directory
+XO_TTABLE_BACKEND = os.environ.get('XO_TTABLE_BACKEND', 'local')
+XO_TTABLE_SHARED_DIR = os.environ.get('XO_TTABLE_SHARED_DIR', None)
+
+# transposition table snapshots written by the dump_ttable command and
+# mapped read-only by every worker at start
+XO_TTABLE_SNAPSHOT_DIR = os.environ.get('XO_TTABLE_SNAPSHOT_DIR', 
+                                        os.path.join(BASE_DIR, 'data', 'ttables'))
+
+# solved positions written by the build_tablebase command, the players
+# answer from them on the configurations they cover
+XO_TABLEBASE_DIR = os.environ.get('XO_TABLEBASE_DIR',
+                                  os.path.join(BASE_DIR, 'data', 'tablebases'))
+
+# search the likely replies of the human while they think, at most
+# XO_PONDER_DUTY_CYCLE of the time and XO_PONDER_TIME_LIMIT seconds per
+# reply
+XO_PONDER = os.environ.get('XO_PONDER', '') == '1'
+XO_PONDER_DUTY_CYCLE = float(os.environ.get('XO_PONDER_DUTY_CYCLE', 0.5))
+XO_PONDER_TIME_LIMIT = float(os.environ.get('XO_PONDER_TIME_LIMIT', 10))
+
+# MCTS trees kept between the moves of a game for the most recent games
+# up to XO_MCTS_TREE_CACHE_MB megabytes per worker, 0 to start every
+# search from scratch
+XO_MCTS_TREE_CACHE_MB = float(os.environ.get('XO_MCTS_TREE_CACHE_MB', 64))